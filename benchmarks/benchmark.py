@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+# Measure the speed of tabletext readers, writers and scripts.
+
+"""
+Measure the speed of tabletext readers, writers and scripts.
+
+Synthetic tables of several shapes and sizes are generated in memory as
+CSV text and as tab-delimited text (table.Delim).  Each case reads or
+writes one table and records:
+
+    rows_per_sec    rows of the table processed per second
+    mb_per_sec      megabytes of text processed per second
+    peak_kb         peak memory allocated while processing, measured
+                        with tracemalloc in a separate run
+
+The shapes are:
+
+    narrow          5 columns: integer, float, nullable string, string,
+                        boolean
+    wide            200 columns of short integers and strings
+    text            4 columns of long strings containing delimiters,
+                        quotes and spaces
+    demo_02         5 columns of strings with the converters of
+                        examples/demo_02.py, which gencolumndef also
+                        produces
+    schema          no table: column definitions of 100, 1000 or 10000
+                        columns (for the small, medium and large sizes)
+
+Cases cover Column.ListInput, DictInput and NamedInput, Column.ListOutput,
+DictOutput and NamedOutput, each with CSV and Delim text, and the
+engines of fields.py, fieldstrip.py and headings.py.  Schema cases
+cover creating a Column, chains of the column operators, and creating
+readers and writers; their rows/sec counts columns (or operations) per
+second, with no text.
+
+Results can be saved as JSON and compared with a saved baseline.  A case
+is reported as a regression when its rows/sec falls below the baseline
+by more than a threshold (default 10%).
+"""
+
+# Python 3
+import sys
+import collections
+import csv
+import getopt
+import io
+import json
+import platform
+import random
+import time
+import tracemalloc
+
+# application
+from tabletext import table
+from tabletext import fields
+from tabletext import fieldstrip
+from tabletext import headings
+
+
+class Benchmark(object):
+    """
+    Generate synthetic tables and time the tabletext readers, writers and
+    scripts.
+    """
+
+    # number of rows for each size
+    sizes = collections.OrderedDict([("small", 1000),
+                                     ("medium", 10000),
+                                     ("large", 100000)])
+
+    # number of columns of the schema shape for each size
+    widths = collections.OrderedDict([("small", 100),
+                                      ("medium", 1000),
+                                      ("large", 10000)])
+
+    # schema shape: most operations in one chain of operators
+    chainlength = 1000
+
+    shapes = ["narrow", "wide", "text", "demo_02", "schema"]
+
+    formats = ["csv", "delim"]
+
+    def __init__(self, repeat=3, memory=True, seed=0):
+        """
+        repeat is the number of timed runs of each case, the fastest is
+        recorded.  memory specifies whether peak memory is measured.
+        """
+        self._repeat = repeat
+        self._memory = memory
+        self._seed = seed
+
+    def columndef(self, shape):
+        """
+        Return the four-item column descriptions for a shape.
+        """
+        nullint = ["lambda x: None if x == '' else int(x)",
+                    "lambda x: '' if x is None else str(x)"]
+        nullfloat = ["lambda x: None if x == '' else float(x)",
+                    "lambda x: '' if x is None else str(x)"]
+        nullstr = ["lambda x: None if x == '' else x",
+                    "lambda x: '' if x is None else x"]
+        string = ["lambda x: x",
+                    "lambda x: '' if x is None else str(x)"]
+        boolean = ["lambda x: None if x == '' else x == 'True'",
+                    "lambda x: '' if x is None else str(x)"]
+        if shape == "narrow":
+            kinds = [nullint, nullfloat, nullstr, string, boolean]
+        elif shape == "schema":
+            kinds = [nullint, string] * (max(self.widths.values()) // 2)
+        elif shape == "wide":
+            kinds = [nullint, string] * 100
+        elif shape == "text":
+            kinds = [string] * 4
+        elif shape == "demo_02":
+            kinds = [["lambda x: x",
+                        "lambda x: '' if x is None else str(x)"]] * 5
+        else:
+            raise ValueError("Unknown shape: " + repr(shape))
+        return [["Column " + str(n), f[0], f[1], "column_" + str(n)]
+                    for (n, f) in enumerate(kinds)]
+
+    def values(self, shape, rows):
+        """
+        Return a list of rows of typed values for a shape.
+        """
+        rand = random.Random(self._seed)
+        words = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta",
+                    "eta, theta", 'iota "kappa"', " lambda "]
+        data = list()
+        for n in range(rows):
+            if shape == "narrow":
+                data.append([rand.randint(-10**6, 10**6),
+                            rand.random() * 1000.0,
+                            None if rand.random() < 0.2
+                                else rand.choice(words).strip(),
+                            rand.choice(words).strip(),
+                            rand.random() < 0.5])
+            elif shape == "wide":
+                row = list()
+                for j in range(100):
+                    row.append(rand.randint(0, 999))
+                    row.append(rand.choice(words).strip())
+                data.append(row)
+            elif shape == "demo_02":
+                data.append([''.join(["R", str(n + 1), "-C", str(k)])
+                                for k in range(5)])
+            else:
+                data.append([' '.join(rand.choice(words)
+                                for j in range(rand.randint(10, 40)))
+                                for k in range(4)])
+        return data
+
+    def text(self, column, data, textformat):
+        """
+        Return data (with headings) as CSV or tab-delimited text.
+        """
+        output = io.StringIO(newline='')
+        if textformat == "csv":
+            column.ListOutput(csv.writer(output)).writerows(data)
+        else:
+            column.ListOutput(table.Delim('\t').writer(output)).writerows(data)
+        return output.getvalue()
+
+    def rowreader(self, text, textformat):
+        """
+        Return a row reader for text held in memory.
+        """
+        source = io.StringIO(text, newline='')
+        if textformat == "csv":
+            return csv.reader(source)
+        return table.Delim('\t').reader(source)
+
+    def rowwriter(self, textformat):
+        """
+        Return a row writer to text held in memory.
+        """
+        output = io.StringIO(newline='')
+        if textformat == "csv":
+            return csv.writer(output)
+        return table.Delim('\t').writer(output)
+
+    def _measure(self, function):
+        """
+        Run function repeatedly, return (best seconds, peak kilobytes).
+        """
+        times = list()
+        for n in range(self._repeat):
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+        peak = None
+        if self._memory:
+            tracemalloc.start()
+            function()
+            peak = tracemalloc.get_traced_memory()[1] // 1024
+            tracemalloc.stop()
+        return (min(times), peak)
+
+    def cases(self, shape, rows):
+        """
+        Return a list of (name, rows, bytes of text, function) for one
+        table, where calling function performs one run of the case.
+        """
+        column = table.Column(self.columndef(shape))
+        data = self.values(shape, rows)
+        dictdata = [collections.OrderedDict(zip(column.names, row))
+                        for row in data]
+        nameddata = [column.NamedRow._make(row) for row in data]
+        cases = list()
+        for textformat in self.formats:
+            text = self.text(column, data, textformat)
+            size = len(text.encode('utf-8'))
+            prefix = ''.join([shape, ".", str(rows), ".", textformat, "."])
+
+            def reader(method, text=text, textformat=textformat):
+                return lambda: collections.deque(
+                        getattr(column, method)(
+                            self.rowreader(text, textformat)), maxlen=0)
+
+            def writer(method, values, textformat=textformat):
+                return lambda: getattr(column, method)(
+                            self.rowwriter(textformat)).writerows(values)
+
+            cases.append((prefix + "ListInput", rows, size,
+                            reader("ListInput")))
+            cases.append((prefix + "DictInput", rows, size,
+                            reader("DictInput")))
+            cases.append((prefix + "NamedInput", rows, size,
+                            reader("NamedInput")))
+            cases.append((prefix + "ListOutput", rows, size,
+                            writer("ListOutput", data)))
+            cases.append((prefix + "DictOutput", rows, size,
+                            writer("DictOutput", dictdata)))
+            cases.append((prefix + "NamedOutput", rows, size,
+                            writer("NamedOutput", nameddata)))
+            cases.append((prefix + "fields", rows, size,
+                    lambda text=text, textformat=textformat:
+                        fields.Fields().addrows(
+                            self.rowreader(text, textformat))))
+            if textformat == "csv":
+                cases.append((prefix + "fieldstrip", rows, size,
+                        lambda text=text: fieldstrip.FieldStrip.stripbatch(
+                            self.rowreader(text, "csv"),
+                            self.rowwriter("csv"))))
+            else:
+                cases.append((prefix + "fieldstrip", rows, size,
+                        lambda text=text: fieldstrip.FieldStrip.stripdelimited(
+                            io.StringIO(text, newline=''), io.StringIO(),
+                            '\t')))
+            cases.append((prefix + "headings.sniff", rows, size,
+                    lambda text=text: headings.Headings().sniff(
+                            io.StringIO(text, newline=''))))
+        return cases
+
+    def schemacases(self, width):
+        """
+        Return a list of (name, count, 0, function) for column
+        definitions of width columns, where count is the number of
+        columns or operations in one run of the case.
+        """
+        columndef = self.columndef("schema")[:width]
+        column = table.Column(columndef)
+        singles = [table.Column([item]) for item in columndef]
+        names = column.names
+        operations = min(width, self.chainlength)
+        policy = table.Column.Policy.NO_HEADING
+        prefix = ''.join(["schema.", str(width), "."])
+
+        def appendchain():
+            result = singles[0]
+            for single in singles[1:]:
+                result = result.append(single)
+
+        def headingchain():
+            result = column
+            for name in names[:operations]:
+                result = result.changeheadings([(name, name.upper())])
+
+        def renamechain():
+            result = column
+            for name in names[:operations]:
+                result = result.rename([(name, name + "_r")])
+
+        return [(prefix + "construct", width, 0,
+                    lambda: table.Column(columndef)),
+                (prefix + "append", width, 0, appendchain),
+                (prefix + "changeheadings", operations, 0, headingchain),
+                (prefix + "rename", operations, 0, renamechain),
+                (prefix + "select", width, 0,
+                    lambda: column.select(names[::-1])),
+                (prefix + "remove", width, 0,
+                    lambda: column.remove(names[::2])),
+                (prefix + "index", width, 0,
+                    lambda: [column.index(name) for name in names]),
+                (prefix + "ListInput", width * 10, 0,
+                    lambda: [column.ListInput(iter(()), headingpolicy=policy)
+                                for n in range(10)]),
+                (prefix + "ListOutput", width * 10, 0,
+                    lambda: [column.ListOutput(None, policy)
+                                for n in range(10)])]
+
+    def run(self, shapes=None, sizes=None, match=None, log=None):
+        """
+        Run the cases for each shape and size and return the results as
+        an ordered dictionary keyed by case name.
+
+        match is an optional string, only cases with names containing
+        that string are run.  log is an optional function that accepts
+        a line of progress text.
+        """
+        results = collections.OrderedDict()
+        for shape in (shapes or self.shapes):
+            for size in (sizes or self.sizes.keys()):
+                if shape == "schema":
+                    cases = self.schemacases(self.widths[size])
+                else:
+                    cases = self.cases(shape, self.sizes[size])
+                for (name, rows, textsize, function) in cases:
+                    if match and not match in name:
+                        continue
+                    (seconds, peak) = self._measure(function)
+                    seconds = max(seconds, 1e-9)
+                    results[name] = collections.OrderedDict([
+                            ("rows_per_sec", rows / seconds),
+                            ("mb_per_sec", textsize / seconds / 1e6),
+                            ("peak_kb", peak)])
+                    if log:
+                        log(self.format(name, results[name]))
+        return results
+
+    def format(self, name, result):
+        """
+        Format one result as a line of text.
+        """
+        return "{0:40s} {1:12.0f} rows/sec {2:8.2f} MB/sec {3:>10s} KB".format(
+                    name, result["rows_per_sec"], result["mb_per_sec"],
+                    "-" if result["peak_kb"] is None
+                        else str(result["peak_kb"]))
+
+    @classmethod
+    def compare(cls, results, baseline, threshold=0.10):
+        """
+        Return a list of (name, rate, baseline rate) for each case that
+        is slower than the baseline by more than threshold.
+
+        results and baseline are dictionaries as returned by run().
+        Cases missing from either are ignored.
+        """
+        regressions = list()
+        for (name, result) in results.items():
+            if not name in baseline:
+                continue
+            before = baseline[name]["rows_per_sec"]
+            if result["rows_per_sec"] < before * (1.0 - threshold):
+                regressions.append((name, result["rows_per_sec"], before))
+        return regressions
+
+    @classmethod
+    def environment(cls):
+        """
+        Describe the environment of a run, saved with the results.
+        """
+        return collections.OrderedDict([
+                    ("python", platform.python_version()),
+                    ("implementation", platform.python_implementation()),
+                    ("platform", platform.platform()),
+                    ("time", time.strftime("%Y-%m-%dT%H:%M:%S"))])
+
+
+if __name__ == "__main__":
+    """
+    Run as a script if invoked from shell command line.
+    """
+
+    def printlog(text):
+        print(text, file=sys.stderr)
+
+    # Get the processing options.
+    optarg = getopt.getopt(sys.argv[1:],
+                            "h",
+                            ["help", "shapes=", "sizes=", "match=",
+                             "repeat=", "nomemory", "save=", "baseline=",
+                             "threshold="])
+    opt = collections.OrderedDict(optarg[0])
+    arg = optarg[1]
+    if "-h" in opt or "--help" in opt or len(arg) > 0:
+        printlog(" ".join(["Usage: ", sys.argv[0],
+                        "[-h|--help]",
+                        "[--shapes=narrow,wide,text,demo_02,schema]",
+                        "[--sizes=small,medium,large]",
+                        "[--match=text]",
+                        "[--repeat=N]",
+                        "[--nomemory]",
+                        "[--save=results.json]",
+                        "[--baseline=baseline.json]",
+                        "[--threshold=0.10]"]))
+        printlog("       Measure speed of tabletext readers, writers, scripts")
+        printlog("       -h|--help     print this message")
+        printlog("       --shapes=     table shapes to generate")
+        printlog("       --sizes=      table sizes to generate")
+        printlog("       --match=      only run cases with names containing")
+        printlog("                     this text")
+        printlog("       --repeat=     timed runs of each case (default 3)")
+        printlog("       --nomemory    do not measure peak memory")
+        printlog("       --save=       write results as JSON")
+        printlog("       --baseline=   compare with results saved earlier,")
+        printlog("                     exit status 1 if any case is slower")
+        printlog("       --threshold=  fraction slower that is a regression")
+        printlog("       See script for details")
+        exit(code=2)
+
+    benchmark = Benchmark(repeat=int(opt.get("--repeat", "3")),
+                            memory=not "--nomemory" in opt)
+    shapes = opt["--shapes"].split(",") if "--shapes" in opt else None
+    sizes = opt["--sizes"].split(",") if "--sizes" in opt else None
+    results = benchmark.run(shapes, sizes, opt.get("--match"),
+                            log=lambda text: print(text, flush=True))
+
+    if "--save" in opt:
+        with open(opt["--save"], 'w') as f:
+            json.dump(collections.OrderedDict([
+                            ("environment", Benchmark.environment()),
+                            ("results", results)]), f, indent=1)
+
+    if "--baseline" in opt:
+        with open(opt["--baseline"]) as f:
+            baseline = json.load(f)["results"]
+        regressions = Benchmark.compare(results, baseline,
+                                float(opt.get("--threshold", "0.10")))
+        for (name, rate, before) in regressions:
+            printlog("{0}: {1:.0f} rows/sec, baseline {2:.0f} rows/sec".format(
+                        name, rate, before))
+        if regressions:
+            printlog(str(len(regressions)) + " regressions")
+            exit(code=1)
@@ -0,0 +1,565 @@
+#!/usr/bin/env python3
+# Keep the converted rows of text tables in binary files for reuse.
+
+"""
+Keep the converted rows of text tables in binary files for reuse.
+
+Reading a large table with the same Column again and again repeats the
+same parsing and conversion.  A ParsedCache keeps the typed values
+produced by Column.ListInput in a binary file (a snapshot) in a cache
+directory, and later reads of the same file with the same Column load
+the values from the snapshot instead of the text.
+
+A snapshot is identified by:
+
+    the real path, size and modification time of the text file
+    the fingerprint of the Column spec (see table.Column.fingerprint)
+    the text format (CSV, table.Delim or table.FixedWidth and its
+        options), the heading policy and shortrowsallowed
+
+so a changed file, Column or format is never read from an old snapshot.
+
+Snapshots are columnar.  The rows are stored in groups, and each column
+of a group is stored according to the types of its values, with the
+same encoding as Column.BinaryOutput:
+
+    int             64-bit integers
+    float           64-bit floats
+    bool            one byte for each value
+    str             UTF-8 text of all the values, with an array of the
+                        offset of each value in the text
+    None            nothing
+    other           a pickled list of the values
+
+with a bitmap of the None values when a column has any.  A footer
+describes the groups.  Snapshots are read through mmap, one group at a
+time.
+
+The cache directory is limited by total size and by age.  Snapshots
+not used for 'maxage' seconds are removed, and then the least recently
+used snapshots are removed until the total size is at most 'maxbytes'.
+
+Usage:
+    cache = ParsedCache("/var/cache/tables")
+    with cache.ListInput(column, "reference.csv") as reader:
+        for values in reader:
+            do_something(values)
+
+The first read converts the text and writes a snapshot when the reader
+reaches the end of the input.  A reader that is closed before the end
+does not write a snapshot.
+"""
+
+# Python 3
+import sys
+import collections
+import csv
+import hashlib
+import json
+import mmap
+import os
+import struct
+import time
+
+# application
+from tabletext import table
+from tabletext import textio
+
+
+# start and end of every snapshot
+_MAGIC = b"TTCACHE2"
+
+# snapshot format version, part of the key
+_FORMAT = 2
+
+# length of the footer, then _MAGIC, at the end of a snapshot
+_TRAILER = struct.Struct("<Q8s")
+
+
+class _Snapshot(object):
+    """
+    Read the groups of rows of a snapshot through mmap.
+    """
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                                    access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        try:
+            size = len(self._map)
+            if size < len(_MAGIC) + _TRAILER.size:
+                raise ValueError("Snapshot too short: " + repr(path))
+            (length, magic) = _TRAILER.unpack_from(self._map,
+                                                    size - _TRAILER.size)
+            if magic != _MAGIC or self._map[:len(_MAGIC)] != _MAGIC:
+                raise ValueError("Not a snapshot: " + repr(path))
+            end = size - _TRAILER.size
+            self.footer = json.loads(self._map[end - length:end])
+        except Exception:
+            self.close()
+            raise
+
+    def groups(self):
+        """
+        Generate the rows of each group as a list of lists of values.
+        """
+        for group in self.footer["groups"]:
+            with memoryview(self._map) as view:
+                part = lambda segment: view[segment[0]:sum(segment)]
+                columns = [table._decodecolumn(description["kind"],
+                                None if description["nulls"] is None
+                                    else part(description["nulls"]),
+                                [part(segment)
+                                    for segment in description["segments"]],
+                                group["rows"])
+                            for description in group["columns"]]
+            if columns:
+                yield [list(row) for row in zip(*columns)]
+            else:
+                yield [list() for n in range(group["rows"])]
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+
+class _SnapshotWriter(object):
+    """
+    Write groups of rows to a temporary file that becomes a snapshot.
+    """
+    def __init__(self, path):
+        self._path = path
+        self._temppath = ''.join([path, ".", str(os.getpid()), ".tmp"])
+        self._file = open(self._temppath, 'wb')
+        self._file.write(_MAGIC)
+        self._offset = len(_MAGIC)
+        self._groups = list()
+
+    def _write(self, data):
+        """
+        Write bytes aligned to 8 bytes, return [offset, length].
+        """
+        padding = -self._offset % 8
+        if padding:
+            self._file.write(b"\0" * padding)
+            self._offset += padding
+        self._file.write(data)
+        segment = [self._offset, len(data)]
+        self._offset += len(data)
+        return segment
+
+    def writegroup(self, rows, width):
+        """
+        Write a group of rows, each a list of width values.
+        """
+        columns = list()
+        for values in (zip(*rows) if width else list()):
+            (kind, nulls, segments) = table._encodecolumn(list(values))
+            columns.append({
+                "kind": kind,
+                "segments": [self._write(data) for data in segments],
+                "nulls": None if nulls is None else self._write(nulls)})
+        self._groups.append({"rows": len(rows), "columns": columns})
+
+    def commit(self, footer):
+        """
+        Write the footer and replace any existing snapshot.
+        """
+        footer = dict(footer, groups=self._groups)
+        data = json.dumps(footer, separators=(',', ':')).encode('utf-8')
+        self._file.write(data)
+        self._file.write(_TRAILER.pack(len(data), _MAGIC))
+        self._file.close()
+        os.replace(self._temppath, self._path)
+
+    def discard(self):
+        if not self._file.closed:
+            self._file.close()
+        try:
+            os.remove(self._temppath)
+        except FileNotFoundError:
+            pass
+
+
+class ParsedCache(object):
+    """
+    Directory of snapshots of the converted rows of text tables.
+    """
+
+    # number of rows in each group of a snapshot
+    groupsize = 65536
+
+    # file name extension of snapshots
+    extension = ".tcache"
+
+    def __init__(self, directory, maxbytes=1 << 32, maxage=7 * 24 * 3600):
+        """
+        directory is the cache directory, created when needed.
+
+        maxbytes is the limit of the total size of the snapshots, maxage
+        the number of seconds a snapshot is kept after it was last used.
+        None is no limit.
+        """
+        super().__init__()
+        self.directory = directory
+        self.maxbytes = maxbytes
+        self.maxage = maxage
+        # for reporting
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def textformat(cls, layout):
+        """
+        Return a description of a text format for the key of a snapshot.
+
+        layout is None for CSV, or a table.Delim or table.FixedWidth
+        instance.
+        """
+        if layout is None:
+            return ["csv"]
+        if isinstance(layout, table.Delim):
+            return ["delim", layout.delimread]
+        if isinstance(layout, table.FixedWidth):
+            return ["fixedwidth", layout.offsets, layout.widths,
+                    layout.strip, layout.binary, layout.encoding]
+        raise ValueError("Unknown text format: " + repr(layout))
+
+    def key(self, column, path, layout=None, shortrowsallowed=False,
+            headingpolicy=None):
+        """
+        Return the key of the snapshot of a file as a dictionary.
+        """
+        status = os.stat(path)
+        if headingpolicy is None:
+            headingpolicy = column.headingpolicy
+        return collections.OrderedDict([
+                ("format", _FORMAT),
+                ("path", os.path.realpath(path)),
+                ("size", status.st_size),
+                ("mtime_ns", status.st_mtime_ns),
+                ("column", column.fingerprint),
+                ("text", self.textformat(layout)),
+                ("shortrowsallowed", bool(shortrowsallowed)),
+                ("headingpolicy", headingpolicy.name)])
+
+    def snapshotpath(self, key):
+        """
+        Return the path of the snapshot for a key.
+        """
+        text = json.dumps(key, separators=(',', ':'))
+        return os.path.join(self.directory, ''.join([
+                            hashlib.sha256(text.encode('utf-8')).hexdigest(),
+                            self.extension]))
+
+    def ListInput(self, column, path, layout=None, shortrowsallowed=False,
+                    headingpolicy=None):
+        """
+        Create a reader of lists of typed values from the text file at
+        path, like column.ListInput(), that reads a snapshot when there
+        is one and otherwise writes one.
+
+        layout is None for CSV text, or a table.Delim or
+        table.FixedWidth instance.  Compressed files are read through
+        textio.open_text().  shortrowsallowed and headingpolicy are as
+        for Column.ListInput().
+
+        The reader has the line_num and headingrow attributes of
+        ListInput and a close() method, and can be used as a context
+        manager.
+        """
+        key = self.key(column, path, layout, shortrowsallowed, headingpolicy)
+        snapshotpath = self.snapshotpath(key)
+        try:
+            snapshot = _Snapshot(snapshotpath)
+        except (OSError, ValueError):
+            snapshot = None
+        if snapshot is not None:
+            if snapshot.footer.get("key") == key:
+                self.hits += 1
+                # age is counted from the last use
+                os.utime(snapshotpath)
+                return _SnapshotInput(snapshot)
+            snapshot.close()
+        self.misses += 1
+        return _RecordingInput(self, key, snapshotpath, column, path, layout,
+                                shortrowsallowed, headingpolicy)
+
+    def DictInput(self, column, path, layout=None, shortrowsallowed=False,
+                    headingpolicy=None):
+        """
+        As ListInput(), but each row is an ordered dictionary keyed by
+        column name.
+        """
+        return _MappedInput(self.ListInput(column, path, layout,
+                                shortrowsallowed, headingpolicy),
+                            lambda values, names=column.names:
+                                collections.OrderedDict(zip(names, values)))
+
+    def NamedInput(self, column, path, layout=None, shortrowsallowed=False,
+                    headingpolicy=None):
+        """
+        As ListInput(), but each row is a named tuple (see
+        Column.NamedRow).
+        """
+        return _MappedInput(self.ListInput(column, path, layout,
+                                shortrowsallowed, headingpolicy),
+                            column.NamedRow._make)
+
+    def snapshots(self):
+        """
+        Return a list of (path, size, mtime) of the snapshots, least
+        recently used first.
+        """
+        result = list()
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return result
+        for name in names:
+            if not name.endswith(self.extension):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                status = os.stat(path)
+            except FileNotFoundError:
+                continue
+            result.append((path, status.st_size, status.st_mtime))
+        result.sort(key=lambda item: item[2])
+        return result
+
+    def evict(self):
+        """
+        Remove snapshots older than maxage, then the least recently used
+        snapshots until the total size is at most maxbytes.  Returns the
+        number of snapshots removed.
+        """
+        snapshots = self.snapshots()
+        keep = list()
+        removed = 0
+        now = time.time()
+        for (path, size, mtime) in snapshots:
+            if self.maxage is not None and now - mtime > self.maxage:
+                removed += self._remove(path)
+            else:
+                keep.append((path, size, mtime))
+        if self.maxbytes is not None:
+            total = sum(size for (path, size, mtime) in keep)
+            for (path, size, mtime) in keep:
+                if total <= self.maxbytes:
+                    break
+                removed += self._remove(path)
+                total -= size
+        return removed
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            return 1
+        except FileNotFoundError:
+            return 0
+
+    def clear(self):
+        """
+        Remove all snapshots.
+        """
+        for (path, size, mtime) in self.snapshots():
+            self._remove(path)
+
+
+class _SnapshotInput(object):
+    """
+    Reader of lists of typed values from a snapshot.
+    """
+    def __init__(self, snapshot):
+        self._snapshot = snapshot
+        self._headingrow = snapshot.footer["headingrow"]
+        if self._headingrow is not None:
+            self._headingrow = tuple(self._headingrow)
+        self._line_num = snapshot.footer["headinglines"]
+        self._groups = snapshot.groups()
+        self._rows = iter(())
+
+    @property
+    def line_num(self):
+        """
+        Number of rows read, including any heading row, as for
+        Column.ListInput.
+        """
+        return self._line_num
+
+    @property
+    def headingrow(self):
+        """
+        Headings as read from the text, or None.
+        """
+        return self._headingrow
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while True:
+            for row in self._rows:
+                self._line_num += 1
+                return row
+            if self._snapshot is None:
+                raise StopIteration
+            try:
+                self._rows = iter(next(self._groups))
+            except StopIteration:
+                self.close()
+                raise
+
+    def close(self):
+        if self._snapshot is not None:
+            self._groups.close()
+            self._snapshot.close()
+            self._snapshot = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class _RecordingInput(object):
+    """
+    Reader of lists of typed values from text, which writes a snapshot
+    when it reaches the end of the text.
+    """
+    def __init__(self, cache, key, snapshotpath, column, path, layout,
+                    shortrowsallowed, headingpolicy):
+        self._cache = cache
+        self._key = key
+        self._snapshotpath = snapshotpath
+        self._width = len(column)
+        binary = getattr(layout, "binary", False)
+        self._textsource = (open(path, 'rb') if binary
+                                else textio.open_text(path))
+        self._writer = None
+        try:
+            if layout is None:
+                rowreader = csv.reader(self._textsource)
+            else:
+                rowreader = layout.reader(self._textsource)
+            self._reader = column.ListInput(rowreader, shortrowsallowed,
+                                            headingpolicy)
+            self._headinglines = self._reader.line_num
+            os.makedirs(cache.directory, exist_ok=True)
+            self._writer = _SnapshotWriter(snapshotpath)
+        except Exception:
+            self.close()
+            raise
+        self._group = list()
+
+    @property
+    def line_num(self):
+        return self._reader.line_num
+
+    @property
+    def headingrow(self):
+        return self._reader.headingrow
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._writer is None:
+            raise StopIteration
+        try:
+            values = next(self._reader)
+        except StopIteration:
+            self._commit()
+            raise
+        except Exception:
+            self.close()
+            raise
+        self._group.append(values)
+        if len(self._group) >= self._cache.groupsize:
+            self._writer.writegroup(self._group, self._width)
+            self._group = list()
+        # a copy, so that changes by the caller are not recorded
+        return list(values)
+
+    def _commit(self):
+        """
+        Complete the snapshot and apply the limits of the cache.
+        """
+        try:
+            if self._group:
+                self._writer.writegroup(self._group, self._width)
+                self._group = list()
+            headingrow = self._reader.headingrow
+            self._writer.commit({
+                    "key": self._key,
+                    "rows": self._reader.line_num - self._headinglines,
+                    "headinglines": self._headinglines,
+                    "headingrow": (None if headingrow is None
+                                    else list(headingrow))})
+            self._writer = None
+        finally:
+            self.close()
+        self._cache.evict()
+
+    def close(self):
+        """
+        Close the text file, discarding an incomplete snapshot.
+        """
+        if self._writer is not None:
+            self._writer.discard()
+            self._writer = None
+        if not self._textsource.closed:
+            self._textsource.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class _MappedInput(object):
+    """
+    Reader that applies a function to each list of values of another
+    reader.
+    """
+    def __init__(self, reader, function):
+        self._reader = reader
+        self._function = function
+
+    @property
+    def line_num(self):
+        return self._reader.line_num
+
+    @property
+    def headingrow(self):
+        return self._reader.headingrow
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self._function(next(self._reader))
+
+    def close(self):
+        self._reader.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+if __name__ == "__main__":
+    """Run as a script when invoked from shell command line."""
+
+    raise NotImplementedError("'" + sys.argv[0]
+                        + "' does not currently run as a standalone script")
@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+# Remove duplicate rows from a table with bounded memory.
+
+"""
+Remove duplicate rows from a table with bounded memory.
+
+Dedup passes through the first row with each key and drops the rows
+that follow with the same key.  The key is the values of named columns
+of a table.Column, or the whole row.  Rows can come from any reader:
+the Column readers (lists, dictionaries or named tuples of typed
+values), or csv.reader and table.Delim readers (lists of text).
+
+There are two modes:
+
+    exact       Keys are held in a set until there are 'maxkeys' of
+                    them.  After that, the keys seen so far and the
+                    remaining rows are divided among 'partitions'
+                    temporary files by the hash of the key, each file is
+                    deduplicated in turn with a set for that file only,
+                    and the surviving rows are merged back into their
+                    original order.  A file with more than 'maxkeys'
+                    keys is divided again by another hash of the key,
+                    so at most 'maxkeys' keys are held at once.  After
+                    'maxdepth' divisions (only reached when many keys
+                    have the same hash), a file is deduplicated with
+                    one set whatever its size.
+    bloom       Keys are added to a Bloom filter, a bit array of fixed
+                    size.  Memory is bounded by the size of the filter,
+                    and no temporary files are used, but a row with a
+                    new key is dropped with a small probability (a false
+                    positive).  The size is chosen from the expected
+                    number of rows and the false positive rate, limited
+                    by 'maxbytes'.
+
+Rows are passed through in their original order in both modes.  In the
+exact mode, rows after the spill begins are held back until the end of
+the input.
+
+Usage:
+    dedup = Dedup(column, keys=["customer_id", "date"])
+    for values in dedup.filter(column.ListInput(csv.reader(f))):
+        do_something(values)
+
+When the module file is invoked as a script from the command line, the
+rows of one or more CSV (or other delimited) files are deduplicated by
+their text and written to stdout.
+"""
+
+# Python 3
+import sys
+import collections
+import collections.abc
+import csv
+import getopt
+import hashlib
+import heapq
+import math
+import os
+import pickle
+import tempfile
+
+# application
+from tabletext import table
+from tabletext import textio
+
+
+class BloomFilter(object):
+    """
+    Set of byte strings that can answer 'possibly present' for a string
+    that was never added, with a bounded probability.
+    """
+
+    def __init__(self, expected, fprate=0.001, maxbytes=None):
+        """
+        expected is the expected number of distinct strings, fprate the
+        required false positive rate at that number.  maxbytes limits
+        the size of the bit array, which raises the false positive rate
+        when the limit applies.
+        """
+        super().__init__()
+        if expected < 1 or not 0.0 < fprate < 1.0:
+            raise ValueError("Invalid expected count or false positive rate")
+        bits = math.ceil(-expected * math.log(fprate) / math.log(2) ** 2)
+        if maxbytes is not None:
+            bits = min(bits, maxbytes * 8)
+        self.size = max(bits, 8)                    # number of bits
+        self.hashes = max(1, round(self.size / expected * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0                              # strings added
+
+    @property
+    def nbytes(self):
+        """
+        Size of the bit array in bytes.
+        """
+        return len(self._bits)
+
+    @property
+    def fprate(self):
+        """
+        Estimated false positive rate for the strings added so far.
+        """
+        return (1.0 - math.exp(-self.hashes * self.count / self.size)
+                ) ** self.hashes
+
+    def add(self, data):
+        """
+        Add a byte string.  Return True if it was possibly added before,
+        False if it was certainly not.
+        """
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        bits = self._bits
+        size = self.size
+        present = True
+        for n in range(self.hashes):
+            position = (first + n * second) % size
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                present = False
+                bits[position >> 3] |= mask
+        if not present:
+            self.count += 1
+        return present
+
+
+class Dedup(object):
+    """
+    Remove rows with duplicate keys from the rows of a reader.
+    """
+
+    # exact mode: number of keys held in memory before spilling
+    maxkeys = 1000000
+
+    # exact mode: number of temporary files after spilling, and number
+    # of files a partition is divided into when it has too many keys
+    partitions = 64
+
+    # exact mode: number of times a partition can be divided again
+    maxdepth = 8
+
+    def __init__(self, column=None, keys=None, bloom=False, fprate=0.001,
+                    expected=10000000, maxbytes=None, tempdir=None):
+        """
+        column is the table.Column of the rows, required when keys is
+        given.  keys is a list of column names; None is the whole row.
+
+        bloom selects the Bloom filter mode, with false positive rate
+        fprate at the expected number of distinct keys, and a filter of
+        at most maxbytes bytes.
+
+        tempdir is the directory for temporary files in exact mode
+        (default the system temporary directory).
+        """
+        super().__init__()
+        if keys is not None:
+            if column is None:
+                raise ValueError("Key columns require a Column")
+            if isinstance(keys, str):
+                raise ValueError("keys must be an iterable of str")
+            keys = list(keys)
+            for name in keys:
+                column.index(name)      # raises ValueError if missing
+        self._column = column
+        self._keys = keys
+        self._bloom = bloom
+        self._fprate = fprate
+        self._expected = expected
+        self._maxbytes = maxbytes
+        self._tempdir = tempdir
+        # for reporting
+        self.rows = 0           # rows read
+        self.duplicates = 0     # rows dropped
+        self.spilled = False    # exact mode wrote temporary files
+        self.bloomfilter = None # BloomFilter of the last run, bloom mode
+
+    def _keyfunction(self, row):
+        """
+        Return a function that returns the key of a row like row, as a
+        hashable value.
+        """
+        if self._keys is None:
+            if isinstance(row, collections.abc.Mapping):
+                names = list(row.keys())
+                return lambda row: tuple(row[name] for name in names)
+            return tuple
+        if isinstance(row, collections.abc.Mapping):
+            names = self._keys
+            return lambda row: tuple(row[name] for name in names)
+        indexes = [self._column.index(name) for name in self._keys]
+        return lambda row: tuple(row[n] for n in indexes)
+
+    def filter(self, rows):
+        """
+        Generate the rows of an iterable of rows, without the rows whose
+        keys are the same as the key of an earlier row.
+        """
+        self.rows = 0
+        self.duplicates = 0
+        self.spilled = False
+        rows = iter(rows)
+        for first in rows:
+            break
+        else:
+            return
+        keyfunction = self._keyfunction(first)
+        try:
+            hash(keyfunction(first))
+        except TypeError:
+            # unhashable values, such as lists, are compared as text
+            function = keyfunction
+            keyfunction = lambda row: repr(function(row))
+        rows = self._prepend(first, rows)
+        if self._bloom:
+            yield from self._filterbloom(rows, keyfunction)
+        else:
+            yield from self._filterexact(rows, keyfunction)
+
+    @staticmethod
+    def _prepend(first, rows):
+        yield first
+        yield from rows
+
+    def _filterbloom(self, rows, keyfunction):
+        bloom = BloomFilter(self._expected, self._fprate, self._maxbytes)
+        self.bloomfilter = bloom
+        for row in rows:
+            self.rows += 1
+            key = repr(keyfunction(row)).encode('utf-8', 'surrogatepass')
+            if bloom.add(key):
+                self.duplicates += 1
+            else:
+                yield row
+
+    def _filterexact(self, rows, keyfunction):
+        seen = set()
+        for row in rows:
+            self.rows += 1
+            key = keyfunction(row)
+            if key in seen:
+                self.duplicates += 1
+                continue
+            seen.add(key)
+            yield row
+            if len(seen) >= self.maxkeys:
+                break
+        else:
+            return
+        self.spilled = True
+        with tempfile.TemporaryDirectory(dir=self._tempdir,
+                                            prefix="dedup") as directory:
+            yield from self._spill(directory, seen, rows, keyfunction)
+
+    def _spill(self, directory, seen, rows, keyfunction):
+        """
+        Divide the keys seen and the remaining rows among partition
+        files, deduplicate each partition, and merge the survivors in
+        their original order.
+        """
+        count = self.partitions
+        paths = [os.path.join(directory, "partition." + str(n))
+                    for n in range(count)]
+        files = [open(path, 'wb') for path in paths]
+        try:
+            # keys seen before the spill have sequence number -1
+            for key in seen:
+                pickle.dump((-1, key, None), files[hash(key) % count],
+                            pickle.HIGHEST_PROTOCOL)
+            seen.clear()
+            for (sequence, row) in enumerate(rows):
+                self.rows += 1
+                key = keyfunction(row)
+                pickle.dump((sequence, key, row), files[hash(key) % count],
+                            pickle.HIGHEST_PROTOCOL)
+        finally:
+            for f in files:
+                f.close()
+        # survivors of each partition, in order of sequence number
+        survivorpaths = [self._deduppartition(path, 0) for path in paths]
+        yield from (row for (sequence, row)
+                        in self._mergesurvivors(survivorpaths))
+
+    def _deduppartition(self, path, depth):
+        """
+        Deduplicate the (sequence, key, row) items of a partition file,
+        write the surviving (sequence, row) items to another file in
+        order of sequence number, and return the path of that file.
+
+        A partition with more than maxkeys keys is divided into
+        partitions by another hash of the key, which are deduplicated
+        in turn and merged, unless depth has reached maxdepth.
+        """
+        survivorpath = path + ".survivors"
+        keys = set()
+        duplicates = 0
+        with open(path, 'rb') as f, open(survivorpath, 'wb') as g:
+            for (sequence, key, row) in self._load(f):
+                if key in keys:
+                    if sequence >= 0:
+                        duplicates += 1
+                    continue
+                if len(keys) >= self.maxkeys and depth < self.maxdepth:
+                    break
+                keys.add(key)
+                if sequence >= 0:
+                    pickle.dump((sequence, row), g, pickle.HIGHEST_PROTOCOL)
+            else:
+                keys = None
+        if keys is None:
+            os.remove(path)
+            self.duplicates += duplicates
+            return survivorpath
+        # too many keys: divide the partition again
+        keys.clear()
+        count = self.partitions
+        paths = [path + "." + str(n) for n in range(count)]
+        files = [open(subpath, 'wb') for subpath in paths]
+        try:
+            with open(path, 'rb') as f:
+                for item in self._load(f):
+                    pickle.dump(item, files[hash((depth, item[1])) % count],
+                                pickle.HIGHEST_PROTOCOL)
+        finally:
+            for f in files:
+                f.close()
+        os.remove(path)
+        survivorpaths = [self._deduppartition(subpath, depth + 1)
+                            for subpath in paths]
+        with open(survivorpath, 'wb') as g:
+            for item in self._mergesurvivors(survivorpaths):
+                pickle.dump(item, g, pickle.HIGHEST_PROTOCOL)
+        for subpath in survivorpaths:
+            os.remove(subpath)
+        return survivorpath
+
+    def _mergesurvivors(self, paths):
+        """
+        Generate the (sequence, row) items of several files of
+        survivors in order of sequence number.
+        """
+        files = [open(path, 'rb') for path in paths]
+        try:
+            yield from heapq.merge(*[self._load(f) for f in files],
+                                    key=lambda item: item[0])
+        finally:
+            for f in files:
+                f.close()
+
+    @staticmethod
+    def _load(f):
+        """
+        Generate the objects pickled one after another in a file.
+        """
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+if __name__ == "__main__":
+    """
+    Run as a script if invoked from shell command line.
+
+    Input from files or stdin, output to stdout.
+    """
+
+    def printlog(text):
+        print(text, file=sys.stderr)
+
+    # Get the processing options and the file names.
+    optarg = getopt.getopt(sys.argv[1:],
+                            "h",
+                            ["help", "columndef=", "keys=", "bloom",
+                             "fprate=", "expected=", "maxbytes=", "maxkeys=",
+                             "tempdir=", "defdelim=", "delim=", "noheading",
+                             "progress"])
+    opt = collections.OrderedDict(optarg[0])
+    arg = textio.paths(optarg[1])      # expand globs and directories
+    if ("-h" in opt or "--help" in opt
+            or ("--keys" in opt and not "--columndef" in opt)):
+        printlog(" ".join(["Usage: ", sys.argv[0],
+                        "[-h|--help]",
+                        "[--columndef=file --keys=a,b,...]",
+                        "[--bloom]",
+                        "[--fprate=0.001]",
+                        "[--expected=N]",
+                        "[--maxbytes=N]",
+                        "[--maxkeys=N]",
+                        "[--tempdir=directory]",
+                        "[--defdelim='w']",
+                        "[--delim='x']",
+                        "[--noheading]",
+                        "[--progress]",
+                        "[filename ...]"]))
+        printlog("       Remove rows with duplicate keys, first row kept")
+        printlog("       -h|--help     print this message")
+        printlog("       --columndef=  column definition, for --keys")
+        printlog("       --keys=       key column names (default whole row)")
+        printlog("       --bloom       approximate, with a Bloom filter")
+        printlog("       --fprate=     Bloom false positive rate")
+        printlog("       --expected=   Bloom expected number of keys")
+        printlog("       --maxbytes=   Bloom maximum size of filter")
+        printlog("       --maxkeys=    exact keys in memory before spilling")
+        printlog("       --tempdir=    exact directory for spilled rows")
+        printlog("       --defdelim=   column definition field delimiter")
+        printlog("       --delim=      table field delimiter")
+        printlog("       --noheading   first row is data, not headings")
+        printlog("       --progress    report progress on stderr")
+        printlog("       keys compare the text of the fields")
+        printlog("       several files are deduplicated together, the")
+        printlog("       headings of the first file are written")
+        printlog("       zero-length delimiters cause special handling")
+        printlog("       omit delimiters to specify CSV formatted text")
+        printlog("       See script for details")
+        exit(code=2)
+
+    if "--delim" in opt:
+        delim = opt["--delim"]
+        layout = table.Delim(delim if delim else None)
+        (rowreader, rowwriter) = (layout.reader, layout.writer)
+    else:
+        (rowreader, rowwriter) = (csv.reader, csv.writer)
+
+    column = None
+    if "--columndef" in opt:
+        if "--defdelim" in opt:
+            defdelim = opt["--defdelim"]
+            defreader = table.Delim(defdelim if defdelim else None).reader
+        else:
+            defreader = csv.reader
+        with textio.open_text(opt["--columndef"]) as textsource:
+            column = table.Column(defreader(textsource))
+
+    keys = opt["--keys"].split(",") if opt.get("--keys") else None
+    dedup = Dedup(column, keys, bloom="--bloom" in opt,
+                    fprate=float(opt.get("--fprate", "0.001")),
+                    expected=int(opt.get("--expected", "10000000")),
+                    maxbytes=(int(opt["--maxbytes"]) if "--maxbytes" in opt
+                                else None),
+                    tempdir=opt.get("--tempdir"))
+    if "--maxkeys" in opt:
+        dedup.maxkeys = int(opt["--maxkeys"])
+
+    meter = None
+    if "--progress" in opt:
+        meter = table.Meter.progress()
+        if arg and not any(textio.codec(path) for path in arg):
+            meter.total = sum(os.path.getsize(path) for path in arg) or None
+
+    def inputrows():
+        """
+        Rows of text of every input file, without headings.
+        """
+        for (n, path) in enumerate(arg or [None]):
+            if path is not None:
+                textsource = textio.open_text(path)
+            else:
+                textsource = sys.stdin
+            try:
+                source = textsource
+                if meter is not None:
+                    source = meter.textreader(textsource)
+                reader = rowreader(source)
+                if not "--noheading" in opt:
+                    for row in reader:
+                        if n == 0:
+                            writer.writerow(row)
+                        break
+                yield from reader
+            finally:
+                if not textsource is sys.stdin:
+                    textsource.close()
+
+    writer = rowwriter(sys.stdout)
+    writer.writerows(dedup.filter(inputrows()))
+    if meter is not None:
+        meter.finish()
+    printlog(''.join([str(dedup.rows), " rows, ", str(dedup.duplicates),
+                        " duplicates removed"]))
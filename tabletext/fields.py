@@ -14,9 +14,17 @@ import sys
 import collections
 import getopt
 import csv
+import hashlib
+import io
+import itertools
+import json
+import locale
+import multiprocessing
+import os
 
 # Application
 from tabletext import table
+from tabletext import textio
 
 
 class Fields(object):
@@ -37,10 +45,16 @@ class Fields(object):
     the number of lines containing that field value.  Each dictionary is
     in order by the first occurrence of each field value.
     """
+    # number of rows counted together by addrows()
+    batchsize = 4096
+
+    # fills the gaps in short rows when a batch is transposed
+    _MISSING = object()
+
     def __init__(self, maxcolumns=None):
         # dictionary keyed by column count, value=number of occurrences,
         # one entry for each different line length as measured in columns
-        self._columns = collections.OrderedDict()
+        self._columns = collections.Counter()
         # dictionaries keyed by field value, value=number of occurrences,
         # one dictionary for each column
         self._fieldvalues = list()
@@ -55,27 +69,73 @@ class Fields(object):
         Row is a list or tuble of strings.
         """
         data = [r for r in row]     # convert iterator or generator to list
-        # add an entry for the row length if necessary
-        if not len(data) in self._columns:
-            self._columns.setdefault(len(data), int(0))
         # add this row to the count for rows of the same length
         self._columns[len(data)] += 1
+        self.rowcount += 1
         if self._maxcolumns and self._maxcolumns < len(data):
-            raise ValueError("Row " + str(rowcount) + ": row length="
-                            + len(data) + " exceeds maximum length="
+            raise ValueError("Row " + str(self.rowcount) + ": row length="
+                            + str(len(data)) + " exceeds maximum length="
                             + str(self._maxcolumns))
         # add more columns if necessary
         for i in range(len(self._fieldvalues), len(data)):
-            self._fieldvalues.append(collections.OrderedDict())
+            self._fieldvalues.append(collections.Counter())
         # add each column value to the count for the same value in that column
         for (val, column) in zip(data, self._fieldvalues):
-            if not val in column:
-                column.setdefault(val, int(0))
             column[val] += 1
 
+    def addbatch(self, batch):
+        """
+        Include a list of data rows in the summary.
+
+        The rows are transposed so that each column is counted by a
+        single Counter.update().  The result is the same as calling
+        addrow() for each row in turn, including the order of first
+        occurrence and the handling of rows of different lengths.
+        """
+        try:
+            lengths = [len(row) for row in batch]
+        except TypeError:
+            # some rows are iterators or generators
+            batch = [[r for r in row] for row in batch]
+            lengths = [len(row) for row in batch]
+        if not lengths:
+            return
+        longest = max(lengths)
+        if self._maxcolumns and self._maxcolumns < longest:
+            # count row by row to stop at the row that is too long
+            for row in batch:
+                self.addrow(row)
+            return
+        self._columns.update(lengths)
+        self.rowcount += len(batch)
+        for i in range(len(self._fieldvalues), longest):
+            self._fieldvalues.append(collections.Counter())
+        if min(lengths) == longest:
+            for (values, column) in zip(zip(*batch), self._fieldvalues):
+                column.update(values)
+        else:
+            # short rows are padded for the transpose, padding not counted
+            missing = self._MISSING
+            for (values, column) in zip(
+                    itertools.zip_longest(*batch, fillvalue=missing),
+                    self._fieldvalues):
+                column.update(values)
+                if missing in column:
+                    del column[missing]
+
     def addrows(self, rowreader):
-        for row in rowreader:
-            self.addrow(row)
+        """
+        Include every row from rowreader in the summary.
+
+        Rows are taken in batches of self.batchsize and counted with
+        addbatch().
+        """
+        rowreader = iter(rowreader)
+        while True:
+            batch = list(itertools.islice(rowreader, self.batchsize))
+            if not batch:
+                break
+            self.addbatch(batch)
 
     @property
     def columns(self):
@@ -100,6 +160,244 @@ class Fields(object):
         """
         return self._fieldvalues
 
+    def merge(self, other):
+        """
+        Include the counts of another Fields summary in this summary.
+
+        The result is the same as if the rows summarized by other had
+        been added after the rows summarized by this summary, including
+        the order of first occurrence.
+        """
+        if self._maxcolumns and other._fieldvalues and (
+                self._maxcolumns < len(other._fieldvalues)):
+            raise ValueError("Summary has " + str(len(other._fieldvalues))
+                            + " columns, exceeds maximum length="
+                            + str(self._maxcolumns))
+        self._columns.update(other._columns)
+        self.rowcount += other.rowcount
+        for i in range(len(self._fieldvalues), len(other._fieldvalues)):
+            self._fieldvalues.append(collections.Counter())
+        for (column, othercolumn) in zip(self._fieldvalues,
+                                            other._fieldvalues):
+            column.update(othercolumn)
+
+    @classmethod
+    def _summarizepath(cls, task):
+        """
+        Return the state of a summary of one file.  Runs in a worker
+        process.
+        """
+        (path, delim, maxcolumns) = task
+        summary = cls(maxcolumns=maxcolumns)
+        with textio.open_text(path) as textsource:
+            if delim is False:
+                summary.addrows(csv.reader(textsource))
+            else:
+                summary.addrows(table.Delim(delim).reader(textsource))
+        return summary.getstate()
+
+    @classmethod
+    def summarizepaths(cls, paths, delim=False, maxcolumns=None, jobs=None,
+                        meter=None):
+        """
+        Return one summary of several files, each summarized by a pool
+        of 'jobs' processes (default os.cpu_count()).
+
+        delim is False for CSV text, otherwise the delimiter given to
+        table.Delim().  The summaries are merged in the order of paths,
+        so the result does not depend on the number of processes.
+        Files compressed with gzip, bzip2 or xz are decompressed.
+
+        meter is an optional table.Meter that counts the files done.
+        """
+        summary = cls(maxcolumns=maxcolumns)
+        tasks = [(path, delim, maxcolumns) for path in paths]
+        with multiprocessing.Pool(jobs) as pool:
+            for state in pool.imap(cls._summarizepath, tasks):
+                part = cls()
+                part.setstate(state)
+                summary.merge(part)
+                if meter is not None:
+                    meter.update()
+        return summary
+
+    def getstate(self):
+        """
+        Return the summary as a dictionary of lists, suitable for JSON.
+
+        Dictionaries are stored as lists of [key, count] pairs so that
+        integer keys and the order of first occurrence are preserved.
+        """
+        return {"maxcolumns": self._maxcolumns,
+                "rowcount": self.rowcount,
+                "columns": [[k, v] for (k, v) in self._columns.items()],
+                "fieldvalues": [[[k, v] for (k, v) in d.items()]
+                                    for d in self._fieldvalues]}
+
+    def setstate(self, state):
+        """
+        Replace the summary by one previously returned by getstate().
+        """
+        self._maxcolumns = state["maxcolumns"]
+        self.rowcount = state["rowcount"]
+        self._columns = collections.Counter(
+                                    {k: v for (k, v) in state["columns"]})
+        self._fieldvalues = [collections.Counter({k: v for (k, v) in d})
+                                for d in state["fieldvalues"]]
+
+
+class _BoundedReader(io.RawIOBase):
+    """
+    Raw binary stream of the bytes of a binary file from its current
+    position up to an offset.
+    """
+    def __init__(self, binaryfile, end):
+        super().__init__()
+        self._binaryfile = binaryfile
+        self._remaining = end - binaryfile.tell()
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = min(len(b), self._remaining)
+        if n <= 0:
+            return 0
+        n = self._binaryfile.readinto(memoryview(b)[:n])
+        self._remaining -= n
+        return n
+
+
+class FieldsProfile(object):
+    """
+    A Fields summary of an append-only file, persisted between runs.
+
+    The summary is saved to a state file together with the byte offset
+    reached in the text file and a checksum of a prefix of the text.
+    On the next run only the bytes appended since the previous run are
+    read, and the saved counts are updated.
+
+    If the text file is shorter than the saved offset, or the prefix no
+    longer matches the saved checksum, the file has been rewritten
+    rather than appended and the summary is rebuilt from scratch.
+
+    Only complete lines (ending in a line end) are summarized.  A
+    partial last line is left for the next run.  CSV values containing
+    line ends are only supported when the file is never read while a
+    record is partly written.
+    """
+
+    # number of leading bytes covered by the checksum
+    prefixsize = 65536
+
+    def __init__(self, statepath, maxcolumns=None, encoding=None):
+        """
+        statepath is the path of the state file, which need not exist.
+
+        encoding is the text encoding of the file, default is the
+        encoding that open() would use.
+        """
+        self._statepath = statepath
+        self._maxcolumns = maxcolumns
+        if encoding:
+            self._encoding = encoding
+        else:
+            self._encoding = locale.getpreferredencoding(False)
+        self.fields = Fields(maxcolumns=maxcolumns)
+        self.offset = 0
+        self.checksum = None
+        # True if the last update() discarded the saved state
+        self.rebuilt = False
+
+    def _prefixchecksum(self, binaryfile, length):
+        """
+        Return hex checksum of the first 'length' bytes of binaryfile.
+        """
+        binaryfile.seek(0)
+        return hashlib.sha256(binaryfile.read(length)).hexdigest()
+
+    def load(self):
+        """
+        Load the saved state, return False if there is no state file.
+        """
+        try:
+            with open(self._statepath, 'r') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return False
+        self.offset = state["offset"]
+        self.checksum = state["checksum"]
+        self.fields = Fields()
+        self.fields.setstate(state["fields"])
+        return True
+
+    def save(self):
+        """
+        Write the state file, replacing any previous state atomically.
+        """
+        state = {"offset": self.offset,
+                 "checksum": self.checksum,
+                 "fields": self.fields.getstate()}
+        temppath = self._statepath + ".tmp"
+        with open(temppath, 'w') as f:
+            json.dump(state, f, separators=(',', ':'))
+        os.replace(temppath, self._statepath)
+
+    @staticmethod
+    def _lastlineend(binaryfile, start, end):
+        """
+        Return the offset just after the last b'\\n' between offsets
+        start and end of binaryfile, or start if there is none.
+        """
+        while end > start:
+            blockstart = max(start, end - 65536)
+            binaryfile.seek(blockstart)
+            i = binaryfile.read(end - blockstart).rfind(b'\n')
+            if i >= 0:
+                return blockstart + i + 1
+            end = blockstart
+        return start
+
+    def update(self, filepath, rowreader, meter=None):
+        """
+        Bring the summary up to date with the text in filepath.
+
+        rowreader is a factory (like csv.reader) that accepts an
+        iterator of text lines.
+
+        meter is an optional table.Meter that counts the text read,
+        its total is set to the number of bytes to be read.
+
+        Returns the updated Fields instance.  The state file is
+        rewritten.
+        """
+        self.load()
+        self.rebuilt = False
+        with open(filepath, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            checklength = min(self.offset, self.prefixsize)
+            if (size < self.offset or self.checksum is None
+                    or self._prefixchecksum(f, checklength) != self.checksum):
+                # rewritten, not appended: start again
+                self.fields = Fields(maxcolumns=self._maxcolumns)
+                self.offset = 0
+                self.rebuilt = True
+            # keep partial last line for later
+            end = self._lastlineend(f, self.offset, size)
+            f.seek(self.offset)
+            lines = io.TextIOWrapper(
+                        io.BufferedReader(_BoundedReader(f, end)),
+                        encoding=self._encoding, newline='')
+            if meter is not None:
+                meter.total = end - self.offset
+                lines = meter.textreader(lines)
+            self.fields.addrows(rowreader(lines))
+            self.offset = end
+            self.checksum = self._prefixchecksum(
+                                f, min(self.offset, self.prefixsize))
+        self.save()
+        return self.fields
+
 
 if __name__ == "__main__":
     """Run as a script if invoked from shell command line."""
@@ -110,21 +408,34 @@ if __name__ == "__main__":
     # Get the processing options and the optional file name.
     optarg = getopt.getopt(sys.argv[1:],
                             "h",
-                            ["help", "outdir=", "indelim=", "outdelim="])
+                            ["help", "outdir=", "indelim=", "outdelim=",
+                             "state=", "progress", "jobs="])
     opt = collections.OrderedDict(optarg[0])
-    arg = optarg[1]
-    if "-h" in opt or "--help" in opt or len(arg) > 1:
+    arg = textio.paths(optarg[1])      # expand globs and directories
+    if ("-h" in opt or "--help" in opt
+            or ("--state" in opt and len(arg) != 1)):
         printlog(" ".join(["Usage: ", sys.argv[0],
                         "[-h|--help]",
                         "[--outdir=directory]",
                         "[--indelim='x']",
                         "[--outdelim='y']",
-                        "[filename]"]))
+                        "[--state=statefile]",
+                        "[--progress]",
+                        "[--jobs=N]",
+                        "[filename ...]"]))
         printlog("       Extract first line as headings")
         printlog("       -h|--help     print this message")
         printlog("       --outdir=     output directory (instead of current)")
         printlog("       --indelim=    input field delimiter")
         printlog("       --outdelim=   output field delimiter")
+        printlog("       --state=      saved summary, only read appended text")
+        printlog("                     (requires one filename)")
+        printlog("       --progress    report progress on stderr")
+        printlog("       --jobs=       number of processes for several files")
+        printlog("       several files, glob patterns or directories are")
+        printlog("       summarized together")
+        printlog("       files ending .gz, .bz2 or .xz are decompressed")
+        printlog("       (not with --state)")
         printlog("       zero-length delimiters cause special handling")
         printlog("       omit delimiters to specify CSV formatted text")
         printlog("       See script for details")
@@ -156,18 +467,38 @@ if __name__ == "__main__":
     else:
         dir = ""
 
-    # Define an input data source
-    if len(arg) > 0:
-        textsource = open(arg[0], newline='')   # no line-end translation
-    else:
-        textsource = sys.stdin
-
     columndist = "columns.txt"
     prefix = "column_"
     numformat = lambda x: '{0:03d}'.format(x)
 
-    summary = Fields(maxcolumns=100)
-    summary.addrows(rowreader(textsource))
+    meter = None
+    if "--progress" in opt:
+        meter = table.Meter.progress(
+                arg[0] if len(arg) == 1 and not textio.codec(arg[0]) else None)
+
+    if len(arg) > 1:
+        # files in parallel, summaries merged in order of file names
+        summary = Fields.summarizepaths(arg,
+                        indelim if "--indelim" in opt else False,
+                        maxcolumns=100, jobs=int(opt.get("--jobs", "0")) or None,
+                        meter=meter)
+    elif "--state" in opt:
+        # summary of earlier text from state file, read only appended text
+        summary = FieldsProfile(opt["--state"], maxcolumns=100).update(
+                                                arg[0], rowreader, meter)
+    else:
+        # Define an input data source
+        if len(arg) > 0:
+            textsource = textio.open_text(arg[0])   # no line-end translation
+        else:
+            textsource = sys.stdin
+        summary = Fields(maxcolumns=100)
+        if meter is not None:
+            summary.addrows(rowreader(meter.textreader(textsource)))
+        else:
+            summary.addrows(rowreader(textsource))
+    if meter is not None:
+        meter.finish()
 
     # Write text summary to a file
     # list field counts and number of lines for each count
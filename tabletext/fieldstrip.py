@@ -12,15 +12,43 @@ import sys
 import collections
 import csv
 import getopt
+import io
+import itertools
+import locale
+import multiprocessing
+import os
 import traceback
 
 # application
 from tabletext import table
+from tabletext import textio
 
 class FieldStrip():
     """
     Trim leading and trailing spaces from every field of delimited text.
+
+    strip() works one row at a time with any reader and writer.  There
+    are faster alternatives for particular formats:
+
+        stripbatch()        CSV or other readers and writers, rows
+                                written in batches
+        stripdelimited()    Delim text, processed in large blocks of
+                                text
+        stripfile()         a file of CSV or Delim text, split on
+                                record boundaries and processed by
+                                several processes, output in the
+                                original order
     """
+
+    # number of rows written together by stripbatch()
+    batchsize = 4096
+
+    # approximate number of characters in each block of Delim text
+    blocksize = 1 << 20
+
+    # approximate number of bytes in each piece of a file for stripfile()
+    piecesize = 1 << 22
+
     def __init__(self):
         pass
 
@@ -40,11 +68,214 @@ class FieldStrip():
         for row in rowreader:
             rowwriter.writerow(r.strip() for r in row)
 
+    @classmethod
+    def stripbatch(cls, rowreader, rowwriter):
+        """
+        Same as strip(), but rows are passed to rowwriter.writerows()
+        in batches of cls.batchsize rows.
+        """
+        rowreader = iter(rowreader)
+        while True:
+            batch = [[r.strip() for r in row]
+                        for row in itertools.islice(rowreader, cls.batchsize)]
+            if not batch:
+                break
+            rowwriter.writerows(batch)
+
+    @classmethod
+    def isblocksupported(cls, delim):
+        """
+        Indicate whether Delim text with this delimiter can be processed
+        in blocks.
+
+        Delimiters that are empty or contain a line end must be
+        processed row by row.
+        """
+        if delim is None:
+            return True
+        return delim != '' and not '\r' in delim and not '\n' in delim
+
+    @classmethod
+    def stripblock(cls, text, delim):
+        """
+        Strip every field in a block of complete lines of Delim text.
+
+        The result is the same as reading the text with
+        table.Delim(delim).reader, stripping each field and writing
+        with table.Delim(delim).writer: every line, including the last,
+        ends with '\n'.
+        """
+        if not text:
+            return text
+        # line ends as recognized by a file opened with newline=''
+        if '\r' in text:
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+        lines = text.split('\n')
+        if not lines[-1]:
+            del lines[-1]           # text ends with a line end
+        if delim is None:
+            # fields separated by any run of whitespace, output one space
+            lines = [' '.join(line.split()) for line in lines]
+        else:
+            strip = str.strip
+            lines = [delim.join(map(strip, line.split(delim)))
+                        for line in lines]
+        lines.append('')
+        return '\n'.join(lines)
+
+    @classmethod
+    def stripdelimited(cls, textsource, textwriter, delim):
+        """
+        Strip every field of Delim text, reading large blocks of text.
+
+        textsource is a text file (opened with newline='' to keep line
+        ends), textwriter is an object with a write() method.  delim is
+        the delimiter that would be given to table.Delim().
+
+        Falls back to strip() when the delimiter is not supported by
+        isblocksupported().
+        """
+        if not cls.isblocksupported(delim):
+            cls.strip(table.Delim(delim).reader(textsource),
+                      table.Delim(delim).writer(textwriter))
+            return
+        while True:
+            block = textsource.read(cls.blocksize)
+            if not block:
+                break
+            block += textsource.readline()      # finish the last line
+            textwriter.write(cls.stripblock(block, delim))
+
+    @classmethod
+    def _recordboundaries(cls, binaryfile, piecesize, quotechar=None):
+        """
+        Return a list of (start, end) byte offsets that divide a file
+        into pieces of about piecesize bytes.
+
+        Each piece ends just after b'\\n'.  When quotechar is given (CSV
+        text), a line end is only a record boundary when an even number
+        of quote characters precede it, so a piece never divides a
+        multi-line value.
+        """
+        quote = quotechar.encode('ascii') if quotechar else None
+        bounds = [0]
+        target = piecesize
+        offset = 0
+        quotes = 0
+        binaryfile.seek(0)
+        while True:
+            block = binaryfile.read(1 << 20)
+            if not block:
+                break
+            pos = 0
+            counted = 0         # quotes of the block counted up to here
+            while offset + len(block) > target:
+                i = block.find(b'\n', max(target - offset, pos))
+                if i < 0:
+                    break
+                pos = i + 1
+                if quote:
+                    quotes += block.count(quote, counted, i)
+                    counted = i
+                if quotes % 2 == 0:
+                    bounds.append(offset + pos)
+                    target = offset + pos + piecesize
+                else:
+                    target = offset + pos
+            if quote:
+                quotes += block.count(quote, counted)
+            offset += len(block)
+        if bounds[-1] != offset:
+            bounds.append(offset)
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    @classmethod
+    def _strippiece(cls, task):
+        """
+        Return stripped text for one piece of a file.  Runs in a worker
+        process.
+        """
+        (path, start, end, delim, csvformat, encoding) = task
+        if start is None:
+            # compressed file, not divided
+            with textio.open_text(path, encoding=encoding) as f:
+                text = f.read()
+        else:
+            with open(path, 'rb') as f:
+                f.seek(start)
+                text = f.read(end - start).decode(encoding)
+        if not csvformat and cls.isblocksupported(delim):
+            return cls.stripblock(text, delim)
+        output = io.StringIO()
+        if csvformat:
+            cls.stripbatch(csv.reader(io.StringIO(text, newline='')),
+                           csv.writer(output))
+        else:
+            cls.strip(table.Delim(delim).reader(io.StringIO(text, newline='')),
+                      table.Delim(delim).writer(output))
+        return output.getvalue()
+
+    @classmethod
+    def stripfile(cls, path, textwriter, delim=None, csvformat=True,
+                    jobs=None, encoding=None, meter=None):
+        """
+        Strip every field of a file of CSV or Delim text using several
+        processes.
+
+        The file is divided on record boundaries into pieces of about
+        cls.piecesize bytes.  Pieces are processed by a pool of 'jobs'
+        processes (default os.cpu_count()) and written to textwriter in
+        the original order.
+
+        CSV output is written as by csv.writer() with the default
+        dialect, Delim output as by table.Delim(delim).writer().
+
+        encoding defaults to the encoding that open() would use.  The
+        encoding must represent '\\n' as the single byte b'\\n' (like
+        UTF-8 and other ASCII-compatible encodings).
+
+        meter is an optional table.Meter, updated with the lines written
+        and the bytes of input as each piece is written.
+        """
+        cls.stripfiles([path], textwriter, delim, csvformat, jobs, encoding,
+                        meter)
+
+    @classmethod
+    def stripfiles(cls, paths, textwriter, delim=None, csvformat=True,
+                    jobs=None, encoding=None, meter=None):
+        """
+        Strip every field of several files, as by stripfile(), with the
+        pieces of all the files shared by one pool of processes.
+
+        The output of each file follows the output of the previous file
+        in the order of paths.  A file compressed with gzip, bzip2 or
+        xz cannot be divided, so it is one piece, held in memory.
+        """
+        if not encoding:
+            encoding = locale.getpreferredencoding(False)
+        tasks = list()
+        for path in paths:
+            if textio.codec(path):
+                tasks.append((path, None, os.path.getsize(path), delim,
+                                csvformat, encoding))
+                continue
+            with open(path, 'rb') as f:
+                pieces = cls._recordboundaries(f, cls.piecesize,
+                                                '"' if csvformat else None)
+            tasks.extend((path, start, end, delim, csvformat, encoding)
+                            for (start, end) in pieces)
+        with multiprocessing.Pool(jobs) as pool:
+            for (task, text) in zip(tasks, pool.imap(cls._strippiece, tasks)):
+                textwriter.write(text)
+                if meter is not None:
+                    meter.update(text.count('\n'), task[2] - (task[1] or 0))
+
+
 if __name__ == "__main__":
     """
     Run as a script if invoked from shell command line.
     
-    Input from stdin or a single file, output to stdout as an
+    Input from stdin or files, output to stdout as an
     enumerated list of heads, one head per line.
 
     Note that multi-line values are only supported for CSV input and
@@ -54,21 +285,30 @@ if __name__ == "__main__":
     def printlog(text):
         print(text, file=sys.stderr)
 
-    # Get the processing options and the optional file name.
+    # Get the processing options and the optional file names.
     optarg = getopt.getopt(sys.argv[1:],
                             '-h',
-                            ["help", "delim="])
+                            ["help", "delim=", "jobs=", "progress"])
     opt = collections.OrderedDict(optarg[0])
-    arg = optarg[1]
-    if "-h" in opt or "--help" in opt or len(arg) > 1:
+    arg = textio.paths(optarg[1])      # expand globs and directories
+    if ("-h" in opt or "--help" in opt
+            or ("--jobs" in opt and len(arg) == 0)):
         printlog(" ".join(["Usage: ", sys.argv[0],
                         "[-h|--help]",
                         "[--delim='x']",
-                        "[filename]"]))
+                        "[--jobs=N]",
+                        "[--progress]",
+                        "[filename ...]"]))
         printlog("       Strip leading and trailing spaces from each field of"
                 + " delimited text")
         printlog("       -h|--help     print this message")
         printlog("       --delim=      field delimiter")
+        printlog("       --jobs=       number of processes (requires filename)")
+        printlog("       --progress    report progress on stderr")
+        printlog("       files ending .gz, .bz2 or .xz are decompressed")
+        printlog("       (each in one process)")
+        printlog("       several files, glob patterns or directories are")
+        printlog("       stripped in turn, output in order")
         printlog("       zero-length delimiter causes special handling")
         printlog("       omit delimiter to specify CSV formatted text")
         printlog("       See script for details")
@@ -81,22 +321,46 @@ if __name__ == "__main__":
             # input delimiter is any string of consecutive spaces
             # output delimiter is a single space
             delim = None      # Delimiter is any string of consecutive spaces
-        rowreader = table.Delim(delim).reader
-        rowwriter = table.Delim(delim).writer
+        csvformat = False
     else:
-        rowreader = csv.reader
-        rowwriter = csv.writer
+        delim = None
+        csvformat = True
 
-    # Input data source
-    if len(arg) > 0:
-        textsource = open(arg[0], newline='')   # no line-end translation
-    else:
-        textsource = sys.stdin
-
-    try:
-        writer = rowwriter(sys.stdout)
-        reader = rowreader(textsource)
-        FieldStrip().strip(reader, writer)
-    finally:
-        if not textsource is sys.stdin:
-            textsource.close()
+    meter = None
+    if "--progress" in opt:
+        meter = table.Meter.progress()
+
+    if "--jobs" in opt and (len(arg) > 1 or not textio.codec(arg[0])):
+        # a single compressed file cannot be divided, it is read below
+        if meter is not None:
+            meter.total = sum(os.path.getsize(path) for path in arg)
+        FieldStrip.stripfiles(arg, sys.stdout, delim=delim,
+                             csvformat=csvformat, jobs=int(opt["--jobs"]),
+                             meter=meter)
+        if meter is not None:
+            meter.finish()
+        exit(code=0)
+
+    if meter is not None and not any(textio.codec(path) for path in arg):
+        meter.total = sum(os.path.getsize(path) for path in arg) or None
+
+    # Input data sources, in turn
+    for path in (arg or [None]):
+        if path is not None:
+            textsource = textio.open_text(path)   # no line-end translation
+        else:
+            textsource = sys.stdin
+        try:
+            source = textsource
+            if meter is not None:
+                source = meter.textreader(textsource)
+            if csvformat:
+                FieldStrip.stripbatch(csv.reader(source),
+                                        csv.writer(sys.stdout))
+            else:
+                FieldStrip.stripdelimited(source, sys.stdout, delim)
+        finally:
+            if not textsource is sys.stdin:
+                textsource.close()
+    if meter is not None:
+        meter.finish()
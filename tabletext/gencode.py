@@ -17,16 +17,27 @@ delimiter is specified on the command line.
 
 Note that multi-line values are only supported for CSV input and
 CSV output.
+
+GenCode.writemodule() creates a complete Python module for one table,
+with the input and output functions inlined in code that is specialized
+for the table.
 """
 
 # Python 3
 import sys
+import ast
+import builtins
 import collections
+import concurrent.futures
 import csv
 import getopt
+import io
+import keyword
+import tokenize
 
 # application
 from tabletext import table
+from tabletext import textio
 
 
 class GenCode(object):
@@ -101,7 +112,7 @@ class GenCode(object):
         columndef = list()
         namedict = dict()
         row_num = 0
-        for row in reader:
+        for row in rowreader:
             if not isinstance(row, list):
                 raise ValueError("rowreader must produce list")
             for i in range(len(row), 4):    # Convert missing values to empty.
@@ -163,6 +174,439 @@ class GenCode(object):
             groupsep = ',\n'    # comma, newline between the inside lists
         writer.write('\n    ]\n')
 
+    @classmethod
+    def writecolumndefs(cls, paths, rowreader, writer, maxworkers=None,
+                        meter=None):
+        """
+        Write the column definition of each of several files, each
+        preceded by a comment line with the path of the file.
+
+        rowreader is a factory (like csv.reader) that accepts a text
+        file.  Files are read by a pool of up to maxworkers threads and
+        written in the order of paths.  Compressed files are
+        decompressed (see textio.open_text()).
+
+        meter is an optional table.Meter that counts the files done.
+        """
+        def generate(path):
+            output = io.StringIO()
+            with textio.open_text(path) as textsource:
+                cls(rowreader(textsource)).writecolumndef(output)
+            return output.getvalue()
+
+        with concurrent.futures.ThreadPoolExecutor(maxworkers) as executor:
+            for (path, text) in zip(paths, executor.map(generate, paths)):
+                writer.write(''.join(["# ", path, "\n", text]))
+                if meter is not None:
+                    meter.update()
+
+    # Calls that depend on the local variables of the lambda function, so
+    # the function body cannot be inlined in other code.
+    _scopecalls = frozenset(["eval", "exec", "locals", "vars", "dir",
+                                "globals"])
+
+    # Modules imported by the module written by writemodule().  Lambda
+    # functions are compiled in the globals of table.py, so a body that
+    # uses any other name (other than a builtin) is not inlined.
+    _moduleimports = ("sys", "ast", "csv", "re", "time")
+
+    def _inlinelambda(self, source, argname):
+        """
+        Return the body of a lambda function as an expression in which
+        the parameter is replaced by argname, or None if the body
+        cannot safely be inlined.
+
+        The parameter is renamed token by token so that the text of the
+        body is otherwise unchanged.
+        """
+        try:
+            tree = ast.parse(source.strip(), mode='eval').body
+        except SyntaxError:
+            return None
+        if (not isinstance(tree, ast.Lambda) or len(tree.args.args) != 1
+                or tree.args.vararg or tree.args.kwarg
+                or tree.args.kwonlyargs or tree.args.defaults):
+            return None
+        param = tree.args.args[0].arg
+        bound = set([param])
+        for node in ast.walk(tree.body):
+            if isinstance(node, ast.Name) and not isinstance(node.ctx,
+                                                                ast.Load):
+                bound.add(node.id)
+            elif isinstance(node, ast.arg):
+                bound.add(node.arg)
+        for node in ast.walk(tree.body):
+            if (isinstance(node, ast.Name) and not node.id in bound
+                    and not node.id in self._moduleimports
+                    and not hasattr(builtins, node.id)):
+                return None     # name not defined in the module
+            if isinstance(node, ast.Name) and node.id == argname:
+                return None     # name is already used
+            if isinstance(node, (ast.keyword, ast.arg)) and (
+                    node.arg == param or node.arg == argname):
+                return None     # keyword or parameter has the same name
+            if isinstance(node, ast.JoinedStr):
+                return None     # f-string names are not separate tokens
+            if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+                    and node.func.id in self._scopecalls):
+                return None
+        # find the ':' that ends the parameter list, rename after it
+        tokens = list(tokenize.generate_tokens(
+                                    io.StringIO(source.strip()).readline))
+        lines = source.strip().splitlines(True)
+        starts = [0]
+        for line in lines:
+            starts.append(starts[-1] + len(line))
+        text = ''.join(lines)
+        offset = lambda position: starts[position[0] - 1] + position[1]
+        body = None
+        pieces = list()
+        previous = None
+        for tok in tokens:
+            if body is None:
+                if tok.type == tokenize.OP and tok.string == ':':
+                    body = offset(tok.end)
+                    position = body
+                continue
+            if (tok.type == tokenize.NAME and tok.string == param
+                    and not (previous and previous.string == '.')):
+                pieces.append(text[position:offset(tok.start)])
+                pieces.append(argname)
+                position = offset(tok.end)
+            elif tok.type == tokenize.COMMENT:
+                pieces.append(text[position:offset(tok.start)])
+                position = offset(tok.end)
+            if tok.type not in (tokenize.NL, tokenize.NEWLINE,
+                                tokenize.COMMENT):
+                previous = tok
+        if body is None:
+            return None
+        pieces.append(text[position:])
+        return ''.join(["(", ' '.join(''.join(pieces).split('\n')).strip(),
+                        ")"])
+
+    def writemodule(self, writer, headingpolicy="HEADING_EXACT_CHECK"):
+        """
+        Write a Python module specialized for the table.
+
+        The module contains:
+            COLUMNDEF       the column descriptions, as for
+                                table.Column()
+            Row             class with __slots__, one attribute per
+                                column
+            parse_row()     convert a list of strings to a list of
+                                typed values
+            parse_record()  convert a list of strings to a Row
+            format_row()    convert a list (or Row) of typed values to a
+                                list of strings
+            Reader          same interface as table.Column.ListInput
+            RowReader       same as Reader, but returns Row instances,
+                                like table.Column.NamedInput
+            Writer          same interface as table.Column.ListOutput
+            benchmark()     compare Reader and Writer with the generic
+                                table.Column readers and writers; runs
+                                when the module is invoked as a script
+
+        The bodies of the input and output functions are inlined in
+        parse_row(), parse_record() and format_row().  A function that
+        cannot be safely inlined (for example, one that calls eval(), or
+        uses a module that the generated module does not import) is
+        called instead.
+
+        headingpolicy is the name of the default heading policy, as in
+        table.Column.Policy.
+        """
+        names = [d[3] for d in self._columndef]
+        for name in names:
+            if keyword.iskeyword(name):
+                raise ValueError("Column name is a Python keyword: "
+                                    + repr(name))
+        if not hasattr(table.Column.Policy, headingpolicy):
+            raise ValueError("Invalid heading policy: " + repr(headingpolicy))
+        local = ["_v" + str(n) for n in range(len(names))]
+        unpack = ''.join(["    (", ', '.join(local),
+                            ",) = " if len(local) == 1 else ") = "])
+        infuncs = list()
+        outfuncs = list()
+        instatements = list()
+        for (n, description) in enumerate(self._columndef):
+            expression = self._inlinelambda(description[1], local[n])
+            if expression is None:
+                instatements.append(''.join(["_in", str(n),
+                        " = table.Column.eval_lambda_function(COLUMNDEF[",
+                        str(n), "][1])\n"]))
+                expression = ''.join(["_in", str(n), "(", local[n], ")"])
+            infuncs.append(expression)
+            expression = self._inlinelambda(description[2], local[n])
+            if expression is None:
+                instatements.append(''.join(["_out", str(n),
+                        " = table.Column.eval_lambda_function(COLUMNDEF[",
+                        str(n), "][2])\n"]))
+                expression = ''.join(["_out", str(n), "(", local[n], ")"])
+            outfuncs.append(expression)
+        writer.write(''.join([
+                "#!/usr/bin/env python3\n",
+                "# Reader and writer for one table, ",
+                "generated by tabletext/gencode.py\n",
+                "\n",
+                '"""\n',
+                "Reader and writer specialized for a table of ",
+                str(len(names)), " columns.\n",
+                "\n",
+                "Generated by tabletext/gencode.py.  The input and output ",
+                "functions of\n",
+                "the column definition are inlined in parse_row(), ",
+                "parse_record() and\n",
+                "format_row().\n",
+                "\n",
+                "Run as a script to compare speed with table.Column.\n",
+                '"""\n',
+                "\n",
+                "# Python 3\n",
+                ''.join("import " + name + "\n"
+                            for name in self._moduleimports),
+                "\n",
+                "# application\n",
+                "from tabletext import table\n",
+                "\n",
+                "COLUMNDEF = "]))
+        self.writecolumndef(writer)
+        writer.write(''.join([
+                "\n",
+                "NAMES = ", repr(tuple(names)), "\n",
+                "HEADINGS = ", repr(tuple(d[0] for d in self._columndef)),
+                "\n",
+                "NCOLUMNS = ", str(len(names)), "\n",
+                "POLICY = table.Column.Policy.", headingpolicy, "\n",
+                "\n"]))
+        writer.write(''.join(instatements))
+        writer.write(''.join([
+                "\n",
+                "\n",
+                "class Row(object):\n",
+                '    """\n',
+                "    Typed values of one row, one attribute per column.\n",
+                '    """\n',
+                "    __slots__ = NAMES\n",
+                "\n",
+                "    def __init__(self, ", ', '.join(names), "):\n",
+                ''.join(''.join(["        self.", name, " = ", name, "\n"])
+                            for name in names),
+                "\n",
+                "    def __iter__(self):\n",
+                "        return iter((",
+                ', '.join("self." + name for name in names),
+                ",))\n" if len(names) == 1 else "))\n",
+                "\n",
+                "    def __eq__(self, other):\n",
+                "        return (isinstance(other, Row)\n",
+                "                and tuple(self) == tuple(other))\n",
+                "\n",
+                "    def __repr__(self):\n",
+                "        return ''.join(['Row(', ', '.join(\n",
+                "                n + '=' + repr(v) for (n, v) in ",
+                "zip(NAMES, self)), ')'])\n",
+                "\n",
+                "\n",
+                "def parse_row(fields):\n",
+                '    """\n',
+                "    Convert a list of strings to a list of typed values.\n",
+                "    Fields after the last column are ignored, as by ",
+                "table.Column.ListInput.\n",
+                '    """\n',
+                unpack, "fields[:NCOLUMNS]\n",
+                "    return [\n",
+                ',\n'.join("        " + e for e in infuncs), "]\n",
+                "\n",
+                "\n",
+                "def parse_record(fields):\n",
+                '    """\n',
+                "    Convert a list of strings to a Row.\n",
+                '    """\n',
+                unpack, "fields[:NCOLUMNS]\n",
+                "    return Row(\n",
+                ',\n'.join("        " + e for e in infuncs), ")\n",
+                "\n",
+                "\n",
+                "def format_row(row):\n",
+                '    """\n',
+                "    Convert a list (or Row) of typed values to a list of ",
+                "strings.\n",
+                '    """\n',
+                unpack, "row\n",
+                "    return [\n",
+                ',\n'.join("        " + e for e in outfuncs), "]\n",
+                "\n",
+                _MODULE_CLASSES]))
+
+
+# Reader, Writer and benchmark for a module written by writemodule().
+_MODULE_CLASSES = '''
+class Reader(object):
+    """
+    Reader to input lists of typed values, like table.Column.ListInput.
+    """
+    _re_whitespace = re.compile(r"\\s+")
+    _parse = staticmethod(parse_row)
+
+    def __init__(self, rowreader, shortrowsallowed=False, headingpolicy=None):
+        self._rowreader = rowreader
+        self._shortrowsallowed = shortrowsallowed
+        self._line_num = 0
+        self._headingrow = None
+        policy = POLICY if headingpolicy is None else headingpolicy
+        if policy == table.Column.Policy.NO_HEADING:
+            return
+        for row in self._rowreader:
+            self._headingrow = tuple(row)
+            if policy == table.Column.Policy.HEADING_EASY_CHECK:
+                compress = lambda h: tuple(
+                        self._re_whitespace.sub(' ', j).strip() for j in h)
+                ok = compress(self._headingrow) == compress(HEADINGS)
+            elif policy == table.Column.Policy.HEADING_EXACT_CHECK:
+                ok = self._headingrow == HEADINGS
+            else:
+                ok = True
+            if not ok:
+                raise ValueError(''.join([
+                            "Input line 0: Error reading headings\\nExpected ",
+                            repr(list(HEADINGS)), "\\nReceived ",
+                            repr(list(self._headingrow))]))
+            self._line_num += 1
+            break
+
+    @property
+    def line_num(self):
+        return self._line_num
+
+    @property
+    def headingrow(self):
+        return self._headingrow
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = next(self._rowreader)
+        try:
+            if self._shortrowsallowed and len(row) < NCOLUMNS:
+                row = list(row) + [None] * (NCOLUMNS - len(row))
+            values = self._parse(row)
+        except Exception as e:
+            raise RuntimeError(''.join(["Input line ", str(self._line_num),
+                                        ": Error reading data."])) from e
+        self._line_num += 1
+        return values
+
+
+class RowReader(Reader):
+    """
+    Reader to input Row instances, like table.Column.NamedInput.
+    """
+    _parse = staticmethod(parse_record)
+
+
+class Writer(object):
+    """
+    Writer to output lists of typed values, like table.Column.ListOutput.
+    """
+    def __init__(self, rowwriter, headingpolicy=None):
+        self._rowwriter = rowwriter
+        self._line_num = 0
+        if headingpolicy != table.Column.Policy.NO_HEADING:
+            self._rowwriter.writerow(list(HEADINGS))
+            self._line_num += 1
+
+    def writerow(self, row):
+        try:
+            if isinstance(row, str):
+                raise ValueError("Row data must not be str")
+            self._rowwriter.writerow(format_row(row))
+        except Exception as e:
+            raise RuntimeError(''.join(["Output line ", str(self._line_num),
+                                        ": Error writing data."])) from e
+        self._line_num += 1
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+
+class _NullWriter(object):
+    """
+    Row writer that discards its input.
+    """
+    def writerow(self, row):
+        pass
+
+    def writerows(self, rows):
+        for row in rows:
+            pass
+
+
+def benchmark(rows, headingpolicy=None, repeat=3):
+    """
+    Compare Reader and Writer with table.Column.ListInput and
+    table.Column.ListOutput on rows (lists of strings) held in memory.
+
+    Returns a list of (description, rows per second) pairs.
+    """
+    column = table.Column(COLUMNDEF, POLICY)
+    count = len(rows) - (0 if headingpolicy == table.Column.Policy.NO_HEADING
+                            else 1)
+    results = list()
+
+    def best(function):
+        times = list()
+        for n in range(repeat):
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+        return count / max(min(times), 1e-9)
+
+    generic = list(column.ListInput(iter(rows), headingpolicy=headingpolicy))
+    specialized = list(Reader(iter(rows), headingpolicy=headingpolicy))
+    if generic != specialized:
+        raise RuntimeError("Reader results differ from table.Column")
+    results.append(("Column.ListInput", best(lambda: list(
+            column.ListInput(iter(rows), headingpolicy=headingpolicy)))))
+    results.append(("Reader", best(lambda: list(
+            Reader(iter(rows), headingpolicy=headingpolicy)))))
+    named = [tuple(row) for row in
+                column.NamedInput(iter(rows), headingpolicy=headingpolicy)]
+    records = [tuple(row) for row in
+                RowReader(iter(rows), headingpolicy=headingpolicy)]
+    if named != records:
+        raise RuntimeError("RowReader results differ from table.Column")
+    results.append(("Column.NamedInput", best(lambda: list(
+            column.NamedInput(iter(rows), headingpolicy=headingpolicy)))))
+    results.append(("RowReader", best(lambda: list(
+            RowReader(iter(rows), headingpolicy=headingpolicy)))))
+    results.append(("Column.ListOutput", best(lambda:
+            column.ListOutput(_NullWriter()).writerows(generic))))
+    results.append(("Writer", best(lambda:
+            Writer(_NullWriter()).writerows(generic))))
+    return results
+
+
+if __name__ == "__main__":
+    """
+    Benchmark with CSV text from a file or stdin.
+    """
+    if len(sys.argv) > 2 or "-h" in sys.argv or "--help" in sys.argv:
+        print("Usage: " + sys.argv[0] + " [filename]", file=sys.stderr)
+        print("       compare speed with table.Column", file=sys.stderr)
+        exit(code=2)
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], newline='') as textsource:
+            rows = list(csv.reader(textsource))
+    else:
+        rows = list(csv.reader(sys.stdin))
+    for (description, rate) in benchmark(rows):
+        print("{0:20s} {1:12.0f} rows/sec".format(description, rate))
+'''
+
+
 if __name__ == "__main__":
     """
     Run as a script if invoked from shell command line.
@@ -177,24 +621,42 @@ if __name__ == "__main__":
     # Get the processing options and the optional file name.
     optarg = getopt.getopt(sys.argv[1:],
                             "h",
-                            ["help", "indelim=", "outdelim="])
+                            ["help", "indelim=", "outdelim=", "module",
+                             "progress"])
     opt = collections.OrderedDict(optarg[0])
-    arg = optarg[1]
-    if "-h" in opt or "--help" in opt or len(arg) > 1:
+    arg = textio.paths(optarg[1])      # expand globs and directories
+    if ("-h" in opt or "--help" in opt
+            or ("--module" in opt and len(arg) > 1)):
         print(" ".join(["Usage: ", sys.argv[0],
                         "[-h|--help]",
                         "[--indelim='x']",
                         "[--outdelim='y']",
-                        "[filename]"]),
+                        "[--module]",
+                        "[--progress]",
+                        "[filename ...]"]),
                 file=sys.stderr)
         print("       Generate column initializer from column definition",
                 file=sys.stderr)
         print("       -h|--help     print this message",
                 file=sys.stderr)
+        print("       --module      generate a complete module with a",
+                file=sys.stderr)
+        print("                     specialized reader and writer",
+                file=sys.stderr)
+        print("                     (one filename only)",
+                file=sys.stderr)
         print("       --indelim=    input field delimiter",
                 file=sys.stderr)
         print("       --outdelim=   output field delimiter",
                 file=sys.stderr)
+        print("       --progress    report progress on stderr",
+                file=sys.stderr)
+        print("       files ending .gz, .bz2 or .xz are decompressed",
+                file=sys.stderr)
+        print("       several files, glob patterns or directories are",
+                file=sys.stderr)
+        print("       written in turn, each after a comment with its name",
+                file=sys.stderr)
         print("       zero-length delimiters cause special handling",
                 file=sys.stderr)
         print("       omit delimiters to specify CSV formatted text",
@@ -223,17 +685,37 @@ if __name__ == "__main__":
         # CSV, use CSV default format
         rowwriter = csv.writer
 
+    if len(arg) > 1:
+        meter = None
+        if "--progress" in opt:
+            meter = table.Meter.progress()
+        GenCode.writecolumndefs(arg, rowreader, sys.stdout, meter=meter)
+        if meter is not None:
+            meter.finish()
+        exit(code=0)
+
     # Input data source
     if len(arg) > 0:
-        textsource = open(arg[0], newline='')   # no line-end translation
+        textsource = textio.open_text(arg[0])   # no line-end translation
     else:
         textsource = sys.stdin
 
     # Output a lists of lists that decribe the columns of a table.
     try:
         writer = rowwriter(sys.stdout)
-        reader = rowreader(textsource)
-        GenCode(reader).writecolumndef(sys.stdout)
+        meter = None
+        if "--progress" in opt:
+            meter = table.Meter.progress(
+                arg[0] if len(arg) > 0 and not textio.codec(arg[0]) else None)
+            reader = rowreader(meter.textreader(textsource))
+        else:
+            reader = rowreader(textsource)
+        if "--module" in opt:
+            GenCode(reader).writemodule(sys.stdout)
+        else:
+            GenCode(reader).writecolumndef(sys.stdout)
+        if meter is not None:
+            meter.finish()
     finally:
         if not textsource is sys.stdin:
             textsource.close()
@@ -18,11 +18,14 @@ delimited text formats.
 # python3
 import sys
 import collections
+import concurrent.futures
 import csv
 import getopt
+import io
 
 # application
 from tabletext import table
+from tabletext import textio
 
 class GenColumnDef(object):
 
@@ -76,7 +79,7 @@ class GenColumnDef(object):
         headings (first column).
         """
         names = dict()
-        for row in reader:
+        for row in rowreader:
             try:
                 if not isinstance(row, list):
                     raise ValueError("rowreader must produce list")
@@ -119,6 +122,39 @@ class GenColumnDef(object):
             except Exception as e:
                 raise RuntimeError("At input: " + repr(row)) from e
 
+    def setdefaultspaths(self, paths, rowreader, rowwriter, writer,
+                            maxworkers=None, meter=None):
+        """
+        Apply setdefaults() to each of several files, writing the
+        definition of each file to writer in the order of paths, each
+        preceded by a comment line with the path of the file (as by
+        gencode.GenCode.writecolumndefs()).  Each definition is checked
+        on its own, so the same name may appear in several files.
+
+        rowreader is a factory (like csv.reader) that accepts a text
+        file, rowwriter a factory (like csv.writer) that accepts a text
+        file, and writer a text file.  Compressed files are decompressed
+        (see textio.open_text()).
+
+        Files are read by a pool of up to maxworkers threads, which
+        overlap reading and decompression; the definitions themselves
+        are generated one at a time (the files are short lists of
+        headings).
+
+        meter is an optional table.Meter that counts the files done.
+        """
+        def generate(path):
+            output = io.StringIO()
+            with textio.open_text(path) as textsource:
+                self.setdefaults(rowreader(textsource), rowwriter(output))
+            return output.getvalue()
+
+        with concurrent.futures.ThreadPoolExecutor(maxworkers) as executor:
+            for (path, text) in zip(paths, executor.map(generate, paths)):
+                writer.write(''.join(["# ", path, "\n", text]))
+                if meter is not None:
+                    meter.update()
+
 if __name__ == "__main__":
     """
     Run as a script if invoked from shell command line.
@@ -133,15 +169,16 @@ if __name__ == "__main__":
     # Get the processing options and the optional file name.
     optarg = getopt.getopt(sys.argv[1:],
                             "h",
-                            ["help", "indelim=", "outdelim="])
+                            ["help", "indelim=", "outdelim=", "progress"])
     opt = collections.OrderedDict(optarg[0])
-    arg = optarg[1]
-    if "-h" in opt or "--help" in opt or len(arg) > 1:
+    arg = textio.paths(optarg[1])      # expand globs and directories
+    if "-h" in opt or "--help" in opt:
         print(" ".join(["Usage: ", sys.argv[0],
                         "[-h|--help]",
                         "[--indelim='x']",
                         "[--outdelim='y']",
-                        "[filename]"]),
+                        "[--progress]",
+                        "[filename ...]"]),
                 file=sys.stderr)
         print("       Extract first line as headings",
                 file=sys.stderr)
@@ -151,9 +188,17 @@ if __name__ == "__main__":
                 file=sys.stderr)
         print("       --outdelim=   output field delimiter (CSV if omitted)",
                 file=sys.stderr)
+        print("       --progress    report progress on stderr",
+                file=sys.stderr)
         print("       --skip=       "
                     + "mumber of leading columns to skip (default 0)",
                 file=sys.stderr)
+        print("       files ending .gz, .bz2 or .xz are decompressed",
+                file=sys.stderr)
+        print("       several files, glob patterns or directories are",
+                file=sys.stderr)
+        print("       written in turn, each after a comment with its name",
+                file=sys.stderr)
         print("       omitted delimiters specify CSV formatted text",
                 file=sys.stderr)
         print("       See script for details",
@@ -178,9 +223,19 @@ if __name__ == "__main__":
     else:
         rowwriter = csv.writer
 
+    if len(arg) > 1:
+        meter = None
+        if "--progress" in opt:
+            meter = table.Meter.progress()
+        GenColumnDef().setdefaultspaths(arg, rowreader, rowwriter,
+                                        sys.stdout, meter=meter)
+        if meter is not None:
+            meter.finish()
+        exit(code=0)
+
     # Input data source
     if len(arg) > 0:
-        textsource = open(arg[0], newline='')   # no line-end translation
+        textsource = textio.open_text(arg[0])   # no line-end translation
     else:
         textsource = sys.stdin
 
@@ -189,8 +244,16 @@ if __name__ == "__main__":
     # Extract and enumerate headings, one heading per output row.
     try:
         writer = rowwriter(sys.stdout)
-        reader = rowreader(textsource)
+        meter = None
+        if "--progress" in opt:
+            meter = table.Meter.progress(
+                arg[0] if len(arg) > 0 and not textio.codec(arg[0]) else None)
+            reader = rowreader(meter.textreader(textsource))
+        else:
+            reader = rowreader(textsource)
         GenColumnDef().setdefaults(reader, writer)
+        if meter is not None:
+            meter.finish()
     finally:
         if not textsource is sys.stdin:
             textsource.close()
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# Generate synthetic table data from a column definition.
+
+"""
+Generate synthetic table data from a column definition.
+
+Rows of typed values are generated for each column of a table.Column and
+written through Column.ListOutput, so the text has the same format as
+the text an application would write.
+
+The values of each column are controlled by a distribution, a
+dictionary of options:
+
+    "kind"          "int", "float", "bool", "str" or "choice".  When
+                        omitted, the kind is guessed by applying the
+                        column's input function to sample text.  The
+                        guess is "bool" for an input function that
+                        calls eval() (which accepts "True"), even for a
+                        column of lists or other types; give such a
+                        column a kind, such as "choice" with "values"
+                        like [[1, 2], [3]] for a column of lists.
+    "nullrate"      fraction of values that are None (default 0.0)
+    "min", "max"    range of int and float values
+                        (default 0 to 1000000)
+    "minlength", "maxlength"
+                    range of lengths of str values (default 1 to 12)
+    "cardinality"   number of distinct values; values are drawn from a
+                        pool of that many values (default no limit)
+    "values"        list of values for kind "choice"
+
+Output is deterministic for a given seed.  Rows are generated in chunks
+and each chunk has its own random generator, so the text is the same
+whether it is produced by one process or by several.
+
+When the module file is invoked as a script from the command line, the
+column definition comes from a CSV (or other delimited) file like
+'examples/demo_01.columndef.csv', distributions from an optional JSON
+file keyed by column name, and output goes to stdout.
+"""
+
+# Python 3
+import sys
+import collections
+import csv
+import getopt
+import io
+import json
+import multiprocessing
+import os
+import random
+import string
+
+# application
+from tabletext import table
+
+
+class GenData(object):
+    """
+    Generate synthetic rows of typed values for a table.Column.
+    """
+
+    # number of rows generated with one random generator
+    chunksize = 10000
+
+    # characters of generated str values
+    _letters = string.ascii_letters + string.digits + " "
+
+    def __init__(self, column, distributions=None, seed=0):
+        """
+        column is a table.Column instance.
+
+        distributions is a dictionary keyed by column name, each value a
+        dictionary of options (see the module docstring).  Columns that
+        are not included have default distributions.
+
+        seed is an int that determines all generated values.
+        """
+        super().__init__()
+        if distributions is None:
+            distributions = dict()
+        for name in distributions:
+            column.index(name)          # raises ValueError if missing
+        self._column = column
+        self._seed = seed
+        self._distributions = list()
+        for name in column.names:
+            options = dict(distributions.get(name, dict()))
+            if not "kind" in options:
+                options["kind"] = self.guesskind(column, name)
+            if not options["kind"] in ["int", "float", "bool", "str",
+                                        "choice"]:
+                raise ValueError(''.join(["Column ", repr(name),
+                                    ": invalid kind: ",
+                                    repr(options["kind"])]))
+            if options["kind"] == "choice" and not options.get("values"):
+                raise ValueError(''.join(["Column ", repr(name),
+                                    ": kind 'choice' requires 'values'"]))
+            options.setdefault("nullrate", 0.0)
+            options.setdefault("min", 0)
+            options.setdefault("max", 1000000)
+            options.setdefault("minlength", 1)
+            options.setdefault("maxlength", 12)
+            if options.get("cardinality"):
+                # same pool in every process
+                rand = random.Random(''.join([str(seed), ":pool:", name]))
+                options["pool"] = [self._value(rand, options)
+                                    for n in range(options["cardinality"])]
+            self._distributions.append(options)
+
+    @classmethod
+    def guesskind(cls, column, name):
+        """
+        Guess the kind of values of a column from the results of its
+        input function applied to sample text.
+
+        An input function that calls eval() returns True for "True",
+        so its kind is guessed as "bool" whatever type the column holds.
+        """
+        infunc = column._infunc(name)
+        for (sample, kind) in [("True", "bool"), ("12", "int"),
+                                ("1.5", "float")]:
+            try:
+                if type(infunc(sample)).__name__ == kind:
+                    return kind
+            except Exception:
+                pass
+        return "str"
+
+    def _value(self, rand, options):
+        """
+        Return one value (never None) for a distribution.
+        """
+        kind = options["kind"]
+        if kind == "int":
+            return rand.randint(options["min"], options["max"])
+        if kind == "float":
+            return rand.uniform(options["min"], options["max"])
+        if kind == "bool":
+            return rand.random() < 0.5
+        if kind == "choice":
+            return rand.choice(options["values"])
+        length = rand.randint(options["minlength"], options["maxlength"])
+        return ''.join(rand.choice(self._letters)
+                        for n in range(length)).strip() or "x"
+
+    def chunk(self, number, rows=None):
+        """
+        Return a list of rows of typed values for one chunk.
+
+        number is the chunk number, counting from 0.  rows is the number
+        of rows, default self.chunksize.
+        """
+        if rows is None:
+            rows = self.chunksize
+        rand = random.Random(''.join([str(self._seed), ":", str(number)]))
+        data = list()
+        for n in range(rows):
+            row = list()
+            for options in self._distributions:
+                if options["nullrate"] and rand.random() < options["nullrate"]:
+                    row.append(None)
+                elif "pool" in options:
+                    row.append(rand.choice(options["pool"]))
+                else:
+                    row.append(self._value(rand, options))
+            data.append(row)
+        return data
+
+    def _chunks(self, rows):
+        """
+        Return a list of (chunk number, rows) covering rows rows.
+        """
+        return [(n, min(self.chunksize, rows - n * self.chunksize))
+                    for n in range((rows + self.chunksize - 1)
+                                    // self.chunksize)]
+
+    def rows(self, rows):
+        """
+        Generate rows rows of typed values.
+        """
+        for (number, count) in self._chunks(rows):
+            for row in self.chunk(number, count):
+                yield row
+
+    def write(self, rowwriter, rows, headingpolicy=None):
+        """
+        Write rows rows through Column.ListOutput to rowwriter.
+        """
+        self._column.ListOutput(rowwriter, headingpolicy).writerows(
+                                                        self.rows(rows))
+
+    def _chunktext(self, task):
+        """
+        Return one chunk as text, without headings.  Runs in a worker
+        process.
+        """
+        (number, count, delim) = task
+        output = io.StringIO(newline='')
+        if delim is False:
+            rowwriter = csv.writer(output)
+        else:
+            rowwriter = table.Delim(delim).writer(output)
+        self._column.ListOutput(rowwriter, self._column.Policy.NO_HEADING
+                                ).writerows(self.chunk(number, count))
+        return output.getvalue()
+
+    def writetext(self, textwriter, rows, delim=False, headingpolicy=None,
+                    jobs=None):
+        """
+        Write rows rows as text using a pool of 'jobs' processes (default
+        os.cpu_count()).
+
+        delim is False for CSV text, otherwise the delimiter given to
+        table.Delim().  textwriter is an object with a write() method.
+        Chunks are written in order, so the text does not depend on the
+        number of processes.  At most two chunks for each process are
+        in progress or waiting to be written, so the processes wait for
+        a slow textwriter instead of using more memory.
+        """
+        if delim is False:
+            rowwriter = csv.writer(textwriter)
+        else:
+            rowwriter = table.Delim(delim).writer(textwriter)
+        # headings, if any, from the parent process
+        self._column.ListOutput(rowwriter, headingpolicy)
+        if not jobs:
+            jobs = os.cpu_count() or 1
+        window = collections.deque()
+        with multiprocessing.Pool(jobs) as pool:
+            for (number, count) in self._chunks(rows):
+                if len(window) >= 2 * jobs:
+                    textwriter.write(window.popleft().get())
+                window.append(pool.apply_async(self._chunktext,
+                                                ((number, count, delim),)))
+            while window:
+                textwriter.write(window.popleft().get())
+
+
+if __name__ == "__main__":
+    """
+    Run as a script if invoked from shell command line.
+
+    Column definition from a file, output to stdout.
+    """
+
+    def printlog(text):
+        print(text, file=sys.stderr)
+
+    # Get the processing options and the column definition file name.
+    optarg = getopt.getopt(sys.argv[1:],
+                            "h",
+                            ["help", "rows=", "seed=", "jobs=", "config=",
+                             "indelim=", "outdelim=", "noheading"])
+    opt = collections.OrderedDict(optarg[0])
+    arg = optarg[1]
+    if "-h" in opt or "--help" in opt or len(arg) != 1:
+        printlog(" ".join(["Usage: ", sys.argv[0],
+                        "[-h|--help]",
+                        "[--rows=N]",
+                        "[--seed=N]",
+                        "[--jobs=N]",
+                        "[--config=distributions.json]",
+                        "[--indelim='x']",
+                        "[--outdelim='y']",
+                        "[--noheading]",
+                        "columndef"]))
+        printlog("       Generate synthetic data from a column definition")
+        printlog("       -h|--help     print this message")
+        printlog("       --rows=       number of rows (default 1000)")
+        printlog("       --seed=       random seed (default 0)")
+        printlog("       --jobs=       number of processes (default 1)")
+        printlog("       --config=     JSON distributions keyed by column name")
+        printlog("       --indelim=    column definition field delimiter")
+        printlog("       --outdelim=   output field delimiter")
+        printlog("       --noheading   do not write column headings")
+        printlog("       zero-length delimiters cause special handling")
+        printlog("       omit delimiters to specify CSV formatted text")
+        printlog("       See script for details")
+        exit(code=2)
+
+    # row reader factory for the column definition
+    if "--indelim" in opt:
+        indelim = opt["--indelim"]
+        if len(indelim) == 0:
+            indelim = None      # Delimiter is any string of consecutive spaces
+        rowreader = table.Delim(indelim).reader
+    else:
+        rowreader = csv.reader
+
+    # output delimiter, False for CSV
+    if "--outdelim" in opt:
+        outdelim = opt["--outdelim"]
+        if len(outdelim) == 0:
+            outdelim = None     # Delimiter is a single space
+    else:
+        outdelim = False
+
+    with open(arg[0], newline='') as textsource:
+        column = table.Column(rowreader(textsource))
+
+    distributions = None
+    if "--config" in opt:
+        with open(opt["--config"]) as f:
+            distributions = json.load(f)
+
+    if "--noheading" in opt:
+        headingpolicy = table.Column.Policy.NO_HEADING
+    else:
+        headingpolicy = None
+
+    generator = GenData(column, distributions, int(opt.get("--seed", "0")))
+    rows = int(opt.get("--rows", "1000"))
+    jobs = int(opt.get("--jobs", "1"))
+    if jobs > 1:
+        generator.writetext(sys.stdout, rows, outdelim, headingpolicy, jobs)
+    elif outdelim is False:
+        generator.write(csv.writer(sys.stdout), rows, headingpolicy)
+    else:
+        generator.write(table.Delim(outdelim).writer(sys.stdout), rows,
+                        headingpolicy)
@@ -13,14 +13,36 @@ Script outputs heads as an enumerated list of strings.
 Input and Output can be in CSV format or other column- or field-
 oriented delimited text data.  Multiline values are only supported
 when reading CSV and outputting CSV.
+
+When the format is not known, Headings.sniff() guesses the format from
+a bounded prefix of the text, and Headings.sniffpaths() does the same
+for a list of files using a pool of threads.
+
+Headings.readpaths() reads the headings of a list of files using a pool
+of threads, and Headings.groups() finds the files whose headings
+disagree.
 """
 
 import sys
 import csv
 import collections
+import concurrent.futures
 import getopt
+import io
 
 from tabletext import table
+from tabletext import textio
+
+# Result of Headings.sniff()
+#   csvformat   True for CSV text, False for Delim text
+#   dialect     csv dialect when csvformat is True, otherwise None
+#   delimiter   field delimiter, None for Delim text separated by any
+#                   sequence of spaces
+#   hasheading  True if the first row appears to be headings
+#   headings    list of headings, or None when hasheading is False
+Sniffed = collections.namedtuple("Sniffed", ["csvformat", "dialect",
+                                    "delimiter", "hasheading", "headings"])
+
 
 class Headings(object):
     """
@@ -53,6 +75,201 @@ class Headings(object):
             break
         return heads
 
+    # default size of the text prefix examined by sniff()
+    prefixsize = 65536
+
+    # delimiters considered by sniff(), in order of preference; a space
+    # is only considered when none of the others is consistent
+    delimiters = ",\t;|"
+
+    def sniff(self, textsource, prefixsize=None):
+        """
+        Guess the format of text and return its headings, reading no
+        more than a bounded prefix of the text.
+
+        textsource is a text file or other object with a read() method.
+        At most prefixsize characters (default self.prefixsize) are
+        read.  When the prefix does not contain all of the text, a
+        partial last line is ignored.
+
+        Returns a Sniffed tuple.  The text is CSV when the delimiter is a
+        comma or the text contains quote characters, otherwise it is
+        Delim text.  A space delimiter is reported as None (any
+        sequence of spaces).  Text with no consistent delimiter is
+        treated as CSV with a single column.
+
+        See hasheading() for the guess whether there are headings.
+        """
+        if prefixsize is None:
+            prefixsize = self.prefixsize
+        text = textsource.read(prefixsize)
+        if len(text) == prefixsize:
+            end = max(text.rfind('\n'), text.rfind('\r')) + 1
+            if end > 0:
+                text = text[:end]       # complete lines only
+        if not text.strip():
+            return Sniffed(True, csv.excel, ',', False, None)
+        sniffer = csv.Sniffer()
+        dialect = None
+        for delimiters in [self.delimiters, ' ']:
+            try:
+                dialect = sniffer.sniff(text, delimiters)
+                break
+            except csv.Error:
+                pass
+        if dialect is None:
+            # no consistent delimiter, probably a single column
+            dialect = csv.excel
+        delimiter = dialect.delimiter
+        if delimiter == ',' or '"' in text:
+            csvformat = True
+            rows = list(csv.reader(io.StringIO(text, newline=''), dialect))
+        else:
+            csvformat = False
+            dialect = None
+            if delimiter == ' ':
+                delimiter = None
+            rows = list(table.Delim(delimiter).reader(
+                                            io.StringIO(text, newline='')))
+        # has_header() examines CSV text, so present the rows as CSV
+        sample = io.StringIO()
+        csv.writer(sample).writerows(rows)
+        try:
+            likely = sniffer.has_header(sample.getvalue())
+        except csv.Error:
+            likely = False
+        hasheading = self.hasheading(rows, likely)
+        headings = rows[0] if hasheading else None
+        return Sniffed(csvformat, dialect, delimiter, hasheading, headings)
+
+    def hasheading(self, rows, likely=False):
+        """
+        Guess whether the first of a list of rows is headings.
+
+        likely is an earlier guess, such as the result of
+        csv.Sniffer.has_header().
+
+        The first row is not headings if any of its nonblank values
+        appears again in the same column.  Otherwise it is headings if
+        likely is True, or if its values are nonblank, non-numeric and
+        unique while other rows have numeric or blank values.
+        """
+        if not rows or not rows[0]:
+            return False
+        first = rows[0]
+        data = rows[1:]
+        for (i, head) in enumerate(first):
+            if head != '' and any(len(r) > i and r[i] == head for r in data):
+                return False
+        if likely:
+            return True
+
+        def isnumeric(text):
+            try:
+                float(text)
+                return True
+            except ValueError:
+                return False
+
+        if (any(h.strip() == '' or isnumeric(h) for h in first)
+                or len(set(first)) != len(first)):
+            return False
+        if not data:
+            return True
+        return any(v.strip() == '' or isnumeric(v) for r in data for v in r)
+
+    def readpath(self, path, rowreader):
+        """
+        Open a file and return the result of read().
+
+        rowreader is a factory (like csv.reader) that accepts a text
+        file.  Compressed files are decompressed (see
+        textio.open_text()).
+        """
+        with textio.open_text(path) as textsource:
+            return self.read(rowreader(textsource))
+
+    def readpaths(self, paths, rowreader, maxworkers=None, meter=None):
+        """
+        Apply readpath() to each of a list of files, using a pool of up
+        to maxworkers threads.
+
+        Returns a list of (path, result) pairs in the same order as
+        paths.  The result is a list of headings, or the exception
+        raised while reading the file.
+
+        meter is an optional table.Meter that counts the files done.
+        """
+        def readone(path):
+            try:
+                return (path, self.readpath(path, rowreader))
+            except Exception as e:
+                return (path, e)
+
+        with concurrent.futures.ThreadPoolExecutor(maxworkers) as executor:
+            results = list()
+            for result in executor.map(readone, paths):
+                results.append(result)
+                if meter is not None:
+                    meter.update()
+            return results
+
+    @classmethod
+    def groups(cls, results):
+        """
+        Group files by their headings.
+
+        results is a list of (path, headings) pairs, where headings is a
+        list of strings, a Sniffed tuple, or an exception.  Files with
+        exceptions are left out.
+
+        Returns an ordered dictionary keyed by tuple of headings, each
+        value the list of paths with those headings, in order of first
+        occurrence.  The files agree when there is only one key.
+        """
+        groups = collections.OrderedDict()
+        for (path, headings) in results:
+            if isinstance(headings, Exception):
+                continue
+            if isinstance(headings, Sniffed):
+                headings = headings.headings or []
+            groups.setdefault(tuple(headings), list()).append(path)
+        return groups
+
+    def sniffpath(self, path, prefixsize=None):
+        """
+        Open a file and return the result of sniff().  Compressed
+        files are decompressed (see textio.open_text()).
+        """
+        with textio.open_text(path) as textsource:
+            return self.sniff(textsource, prefixsize)
+
+    def sniffpaths(self, paths, prefixsize=None, maxworkers=None,
+                    meter=None):
+        """
+        Apply sniffpath() to each of a list of files, using a pool of
+        up to maxworkers threads.
+
+        Returns a list of (path, result) pairs in the same order as
+        paths.  The result is a Sniffed tuple, or the exception raised
+        while reading the file.
+
+        meter is an optional table.Meter that counts the files done.
+        """
+        def sniffone(path):
+            try:
+                return (path, self.sniffpath(path, prefixsize))
+            except Exception as e:
+                return (path, e)
+
+        with concurrent.futures.ThreadPoolExecutor(maxworkers) as executor:
+            results = list()
+            for result in executor.map(sniffone, paths):
+                results.append(result)
+                if meter is not None:
+                    meter.update()
+            return results
+
 
 if __name__ == "__main__":
     """
@@ -71,21 +288,31 @@ if __name__ == "__main__":
     # Get the processing options and the optional file name.
     optarg = getopt.getopt(sys.argv[1:],
                             "h",
-                            ["help", "noenum", "indelim=", "outdelim="])
+                            ["help", "noenum", "indelim=", "outdelim=",
+                             "sniff", "progress"])
     opt = collections.OrderedDict(optarg[0])
-    arg = optarg[1]
-    if "-h" in opt or "--help" in opt or len(arg) > 1:
+    arg = textio.paths(optarg[1])      # expand globs and directories
+    if ("-h" in opt or "--help" in opt
+            or ("--sniff" in opt and "--indelim" in opt)):
         printlog(" ".join(["Usage: ", sys.argv[0],
                         "[-h|--help]",
                         "[--noenum]",
-                        "[--indelim='x']",
+                        "[--indelim='x'|--sniff]",
                         "[--outdelim='y']",
-                        "[filename]"]))
+                        "[--progress]",
+                        "[filename ...]"]))
         printlog("       Extract first line as headings")
         printlog("       -h|--help     print this message")
         printlog("       --noenum      do not enumerate the headings")
         printlog("       --indelim=    input field delimiter")
+        printlog("       --sniff       guess input format and whether there")
+        printlog("                     are headings")
         printlog("       --outdelim=   output field delimiter")
+        printlog("       --progress    report progress on stderr")
+        printlog("                     (files, for several files)")
+        printlog("       several files, glob patterns or directories are")
+        printlog("       listed by file, files that disagree are reported")
+        printlog("       files ending .gz, .bz2 or .xz are decompressed")
         printlog("       zero-length delimiters cause special handling")
         printlog("       omit delimiters to specify CSV formatted text")
         printlog("       See script for details")
@@ -109,9 +336,61 @@ if __name__ == "__main__":
     else:
         rowwriter = csv.writer
 
+    meter = None
+    if "--progress" in opt:
+        if "--sniff" in opt or len(arg) > 1:
+            meter = table.Meter.progress()
+        else:
+            meter = table.Meter.progress(
+                arg[0] if len(arg) > 0 and not textio.codec(arg[0]) else None)
+
+    if "--sniff" in opt or len(arg) > 1:
+        # each named file, or each file of each directory, or stdin
+        if "--sniff" in opt and len(arg) > 0:
+            results = Headings().sniffpaths(arg, meter=meter)
+        elif "--sniff" in opt:
+            results = [("-", Headings().sniff(sys.stdin))]
+        else:
+            results = Headings().readpaths(arg, rowreader, meter=meter)
+        if meter is not None:
+            meter.finish()
+        writer = rowwriter(sys.stdout)
+        if not "--noenum" in opt:
+            writer.writerow(["File", "Column", "Heading"])
+        failed = False
+        for (path, result) in results:
+            if isinstance(result, Exception):
+                printlog(path + ": " + repr(result))
+                failed = True
+                continue
+            if "--sniff" in opt:
+                printlog(''.join([path, ": ",
+                                "CSV" if result.csvformat else "Delim",
+                                " delimiter=", repr(result.delimiter),
+                                "" if result.hasheading else ", no headings"]))
+                heads = result.headings or []
+            else:
+                heads = result
+            for (n, head) in enumerate(heads):
+                if "--noenum" in opt:
+                    writer.writerow([path, head])
+                else:
+                    writer.writerow([path, n, head])
+        # files that disagree, grouped by headings
+        groups = Headings.groups(results)
+        if len(groups) > 1:
+            printlog("Headings differ in " + str(len(groups)) + " groups:")
+            for (n, (heads, paths)) in enumerate(groups.items()):
+                printlog(''.join(["  Group ", str(n), ": ",
+                                str(len(paths)), " files, headings ",
+                                repr(list(heads))]))
+                for path in paths:
+                    printlog("    " + path)
+        exit(code=1 if failed else 0)
+
     # Input data source
     if len(arg) > 0:
-        textsource = open(arg[0], newline='')   # no line-end translation
+        textsource = textio.open_text(arg[0])   # no line-end translation
     else:
         textsource = sys.stdin
 
@@ -119,7 +398,12 @@ if __name__ == "__main__":
     try:
         writer = rowwriter(sys.stdout)
         reader = rowreader(textsource)
-        heads = Headings().read(rowreader(textsource))
+        source = textsource
+        if meter is not None:
+            source = meter.textreader(textsource)
+        heads = Headings().read(rowreader(source))
+        if meter is not None:
+            meter.finish()
         if "--noenum" in opt:
             # bare text headings, single column, no column heads in output
             for head in heads:
@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+# Write the rows of a table to a file for each value of a key.
+
+"""
+Write the rows of a table to a file for each value of a key.
+
+A PartitionedOutput takes lists of typed values, like Column.ListOutput,
+and routes each row by a key (a named column or a function of the row)
+to the output file of that key's partition, such as a file for each
+customer or each date.  Each file is written through its own
+Column.ListOutput, so each file has its own headings.
+
+Rows are collected in a buffer for each partition and written
+'buffersize' rows at a time, or all buffers together when 'maxbuffered'
+rows are waiting.  At most 'maxopen' files are open at once; the file
+used least recently is closed to open another, and reopened for append
+(without headings) when its partition has more rows.  Each file is
+replaced when first opened.
+
+With 'processes', the partitions are divided among worker processes,
+each of which owns the files of its partitions and has its own pool of
+open files.  The calling process only computes keys and sends batches of
+rows; rows are converted to text and written in the workers.  The
+Column is sent to the processes as a spec (see table.Column.to_spec()),
+and the path function, row writer factory and rows must be picklable.
+Processes help when output conversion or compression is slower than
+sending the rows to the workers.
+
+Usage:
+    with PartitionedOutput(column, "customer_id",
+                            "out/customer_{}.csv") as output:
+        output.writerows(column.ListInput(csv.reader(f)))
+"""
+
+# Python 3
+import sys
+import collections
+import csv
+import multiprocessing
+import queue
+
+# application
+from tabletext import table
+from tabletext import textio
+
+
+class _Failure(object):
+    """
+    An exception passed from a worker process.
+    """
+    def __init__(self, exception):
+        self.exception = exception
+
+
+def _partitionworker(spec, path, rowwriter, headingpolicy, settings,
+                        rowqueue, resultqueue):
+    """
+    Write the batches of (partition, rows) from a queue until None, then
+    put the paths written on the result queue.
+    """
+    try:
+        column = table.Column.from_spec(spec)
+        output = PartitionedOutput(column, None, path, rowwriter,
+                                    headingpolicy)
+        for (name, value) in settings.items():
+            setattr(output, name, value)
+        with output:
+            while True:
+                item = rowqueue.get()
+                if item is None:
+                    break
+                for (partition, rows) in item:
+                    output._add(partition, rows)
+        resultqueue.put((output.rowcount, output.paths))
+    except Exception as e:
+        # the exception may not survive pickling, so it is described
+        cause = e.__cause__ if e.__cause__ is not None else e
+        resultqueue.put(_Failure(RuntimeError(''.join([
+                        "Error writing partitions: ", str(e), " ",
+                        repr(cause)]))))
+
+
+class PartitionedOutput(object):
+    """
+    Write lists of values to a file for each partition, through
+    Column.ListOutput.
+    """
+
+    # number of files open at once
+    maxopen = 64
+
+    # rows buffered for one partition before they are written
+    buffersize = 1024
+
+    # rows buffered for all partitions before every buffer is written
+    maxbuffered = 262144
+
+    # process mode: rows sent to the workers together
+    batchsize = 16384
+
+    # process mode: number of batches waiting for each worker
+    queuesize = 8
+
+    def __init__(self, column, key, path, rowwriter=csv.writer,
+                    headingpolicy=None, processes=None):
+        """
+        column is the table.Column instance that describes the rows.
+
+        key is the name of the column whose value selects the partition,
+        or a function that returns the partition of a list of values.
+
+        path is a str with a format field, like "out/{}.csv", that is
+        formatted with the partition, or a function that returns the
+        path of a partition.  Files with names ending in '.gz', '.bz2'
+        or '.xz' are compressed (see textio.open_text()).
+
+        rowwriter is a function (like csv.writer or table.Delim.writer)
+        that returns a row writer for a text file.  headingpolicy is as
+        for Column.ListOutput(), for each file.
+
+        processes is the number of worker processes, or None to write
+        in the calling process.
+        """
+        super().__init__()
+        if isinstance(key, str):
+            index = column.index(key)   # raises ValueError if missing
+            key = lambda values: values[index]
+        if isinstance(path, str):
+            path = path.format
+        self._column = column
+        self._key = key
+        self._path = path
+        self._rowwriter = rowwriter
+        self._headingpolicy = headingpolicy
+        self._processes = processes
+        self._partitionpaths = dict()       # partition --> path
+        self._buffers = dict()              # path --> list of rows
+        self._buffered = 0
+        self._files = collections.OrderedDict() # path --> (file, writer)
+        self._lines = dict()                # path --> lines written
+        self._workers = None
+        self._closed = False
+        self.rowcount = 0
+
+    @property
+    def paths(self):
+        """
+        List of the paths of the files written, in the order first used.
+        """
+        return list(self._lines.keys())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._abandon()
+        return False
+
+    def writerow(self, values):
+        """
+        Add a list of values to the buffer of its partition.
+        """
+        self.writerows((values,))
+
+    def writerows(self, rows):
+        """
+        Add lists of values to the buffers of their partitions.
+        """
+        if self._closed:
+            raise ValueError("Output is closed")
+        if self._processes:
+            self._sendrows(rows)
+            return
+        key = self._key
+        partitionpaths = self._partitionpaths
+        buffers = self._buffers
+        buffersize = self.buffersize
+        for values in rows:
+            partition = key(values)
+            path = partitionpaths.get(partition)
+            if path is None:
+                path = self._pathof(partition)
+            buffer = buffers.get(path)
+            if buffer is None:
+                buffer = buffers[path] = list()
+            buffer.append(values)
+            self._buffered += 1
+            if len(buffer) >= buffersize:
+                self._flush(path)
+            if self._buffered >= self.maxbuffered:
+                self.flush()
+
+    def _pathof(self, partition):
+        path = self._path(partition)
+        self._partitionpaths[partition] = path
+        return path
+
+    def _add(self, partition, rows):
+        """
+        Add rows of one partition, in a worker process.
+        """
+        path = self._partitionpaths.get(partition)
+        if path is None:
+            path = self._pathof(partition)
+        buffer = self._buffers.setdefault(path, list())
+        buffer.extend(rows)
+        self._buffered += len(rows)
+        if len(buffer) >= self.buffersize:
+            self._flush(path)
+        if self._buffered >= self.maxbuffered:
+            self.flush()
+
+    def _writer(self, path):
+        """
+        Return the ListOutput of a path, opening its file if necessary
+        and closing the file used least recently if too many are open.
+        """
+        item = self._files.get(path)
+        if item is not None:
+            self._files.move_to_end(path)
+            return item[1]
+        while len(self._files) >= max(self.maxopen, 1):
+            (oldpath, (oldfile, oldwriter)) = self._files.popitem(last=False)
+            oldfile.close()
+        if path in self._lines:
+            textfile = textio.open_text(path, 'a')
+            writer = self._column.ListOutput(self._rowwriter(textfile),
+                                            self._column.Policy.NO_HEADING)
+            writer._line_num = self._lines[path]
+        else:
+            textfile = textio.open_text(path, 'w')
+            writer = self._column.ListOutput(self._rowwriter(textfile),
+                                            self._headingpolicy)
+        self._files[path] = (textfile, writer)
+        return writer
+
+    def _flush(self, path):
+        """
+        Write the buffered rows of one path.
+        """
+        rows = self._buffers.pop(path)
+        try:
+            writer = self._writer(path)
+            writer.writerows(rows)
+        except Exception as e:
+            raise RuntimeError("Error writing " + repr(path)) from e
+        self._lines[path] = writer._line_num
+        self._buffered -= len(rows)
+        self.rowcount += len(rows)
+
+    def flush(self):
+        """
+        Write every buffered row.
+        """
+        if self._processes:
+            self._sendbatches()
+            return
+        for path in list(self._buffers.keys()):
+            self._flush(path)
+        for (textfile, writer) in self._files.values():
+            textfile.flush()
+
+    def close(self):
+        """
+        Write every buffered row and close the files.  In process mode,
+        wait for the workers to finish.
+        """
+        if self._closed:
+            return
+        if self._processes:
+            self._finishworkers()
+            self._closed = True
+            return
+        try:
+            for path in list(self._buffers.keys()):
+                self._flush(path)
+        finally:
+            self._closed = True
+            while self._files:
+                (path, (textfile, writer)) = self._files.popitem(last=False)
+                textfile.close()
+
+    def _abandon(self):
+        """
+        Close files and stop workers without writing buffered rows.
+        """
+        self._closed = True
+        self._buffers.clear()
+        while self._files:
+            (path, (textfile, writer)) = self._files.popitem(last=False)
+            textfile.close()
+        if self._workers is not None:
+            for process in self._workers[0]:
+                process.terminate()
+                process.join()
+
+    # process mode
+
+    def _startworkers(self):
+        """
+        Start the worker processes.  Each worker owns the partitions
+        assigned to it, round-robin in the order first seen.
+        """
+        count = self._processes
+        settings = {"maxopen": max(1, self.maxopen // count),
+                    "buffersize": self.buffersize,
+                    "maxbuffered": max(1, self.maxbuffered // count)}
+        spec = self._column.to_spec()
+        resultqueue = multiprocessing.Queue()
+        rowqueues = [multiprocessing.Queue(self.queuesize)
+                        for n in range(count)]
+        processes = [multiprocessing.Process(target=_partitionworker,
+                                args=(spec, self._path, self._rowwriter,
+                                        self._headingpolicy, settings,
+                                        rowqueues[n], resultqueue),
+                                daemon=True)
+                        for n in range(count)]
+        for process in processes:
+            process.start()
+        # worker index --> partition --> rows
+        batches = [collections.OrderedDict() for n in range(count)]
+        self._workers = (processes, rowqueues, resultqueue, batches,
+                            dict())
+        self._results = list()
+
+    def _sendrows(self, rows):
+        """
+        Add rows to the batch of the worker that owns their partition.
+        """
+        if self._workers is None:
+            self._startworkers()
+        (processes, rowqueues, resultqueue, batches, owners) = self._workers
+        key = self._key
+        count = len(processes)
+        for values in rows:
+            partition = key(values)
+            owner = owners.get(partition)
+            if owner is None:
+                owner = owners[partition] = len(owners) % count
+            batch = batches[owner]
+            rowlist = batch.get(partition)
+            if rowlist is None:
+                rowlist = batch[partition] = list()
+            rowlist.append(values)
+            self._buffered += 1
+            if self._buffered >= self.batchsize:
+                self._sendbatches()
+
+    def _sendbatches(self):
+        """
+        Send every waiting batch to its worker.
+        """
+        if self._workers is None:
+            return
+        (processes, rowqueues, resultqueue, batches, owners) = self._workers
+        for (n, batch) in enumerate(batches):
+            if batch:
+                self._put(n, list(batch.items()))
+                self.rowcount += sum(len(rows) for rows in batch.values())
+                batch.clear()
+        self._buffered = 0
+
+    def _put(self, n, item):
+        """
+        Put an item on the queue of worker n, raising the exception of
+        any worker that has failed.
+        """
+        (processes, rowqueues, resultqueue, batches, owners) = self._workers
+        while True:
+            try:
+                rowqueues[n].put(item, timeout=0.1)
+                return
+            except queue.Full:
+                self._checkworkers()
+
+    def _checkworkers(self):
+        """
+        Collect results from the workers, raising the exception of a
+        worker that has failed or stopped.
+        """
+        (processes, rowqueues, resultqueue, batches, owners) = self._workers
+        while True:
+            try:
+                result = resultqueue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(result, _Failure):
+                self._abandon()
+                raise result.exception
+            self._results.append(result)
+        if any(not process.is_alive() for process in processes):
+            if len(self._results) < len(processes):
+                self._abandon()
+                raise RuntimeError("Partition worker process stopped")
+
+    def _finishworkers(self):
+        """
+        Send the remaining rows, stop the workers and collect the paths
+        they wrote.
+        """
+        if self._workers is None:
+            return
+        self._sendbatches()
+        (processes, rowqueues, resultqueue, batches, owners) = self._workers
+        for n in range(len(processes)):
+            self._put(n, None)
+        while len(self._results) < len(processes):
+            try:
+                result = resultqueue.get(timeout=0.1)
+            except queue.Empty:
+                self._checkworkers()
+                continue
+            if isinstance(result, _Failure):
+                self._abandon()
+                raise result.exception
+            self._results.append(result)
+        for process in processes:
+            process.join()
+        for (rowcount, paths) in self._results:
+            for path in paths:
+                self._lines.setdefault(path, None)
+
+
+if __name__ == "__main__":
+    """Run as a script when invoked from shell command line."""
+
+    raise NotImplementedError("'" + sys.argv[0]
+                        + "' does not currently run as a standalone script")
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# Read, convert and write a table in separate stages.
+
+"""
+Read, convert and write a table in separate stages.
+
+A Pipeline copies rows from a row reader (like csv.reader) to a row
+writer (like csv.writer), converting each row from text to typed values
+with the input functions of one table.Column, optionally transforming
+the typed values, and converting them back to text with the output
+functions of another (or the same) table.Column.
+
+The three stages run concurrently:
+
+    read        a thread that reads rows of text in batches
+    convert     a thread that converts each batch, or hands each batch
+                    to a pool of processes when the input and output
+                    functions are too slow for one thread
+    write       the calling thread, which writes the converted batches
+                    in their original order
+
+The stages are linked by queues that hold a bounded number of batches,
+so a fast stage waits for a slow one instead of using more memory.
+
+An exception in any stage stops the other stages and is raised by
+run().  Errors in the data are reported with the line number of the
+row in the input, counting from line 0 as the first line (including any
+heading row), as by the Column readers.
+
+Usage:
+    pipeline = Pipeline(incolumn, outcolumn, transform=adjust)
+    with open("in.csv", newline='') as f, open("out.csv", 'w') as g:
+        rows = pipeline.run(csv.reader(f), csv.writer(g))
+
+Processes only help when conversion is the slowest stage.  In process
+mode, transform must be a function that can be pickled (a function
+defined at the top level of a module), and the Columns are sent to the
+processes as specs (see table.Column.to_spec()).
+"""
+
+# Python 3
+import sys
+import collections
+import concurrent.futures
+import itertools
+import queue
+import threading
+
+# application
+from tabletext import table
+
+
+# Columns created from specs in a worker process, keyed by fingerprint
+_workercolumns = dict()
+
+
+class _Collector(object):
+    """
+    Row writer that keeps the rows in a list.
+    """
+    def __init__(self):
+        self.rows = list()
+        self.writerow = self.rows.append
+
+    def writerows(self, rows):
+        self.rows.extend(rows)
+
+
+class _Failure(object):
+    """
+    An exception passed from one stage to the next.
+    """
+    def __init__(self, exception):
+        self.exception = exception
+
+
+def _convertbatch(incolumn, outcolumn, transform, shortrowsallowed,
+                    line_num, rows):
+    """
+    Convert a batch of rows of text to typed values, apply transform,
+    and convert the results to rows of text.
+
+    line_num is the input line number of the first row.  Returns the
+    list of converted rows.
+    """
+    reader = incolumn.ListInput(iter(rows), shortrowsallowed,
+                                table.Column.Policy.NO_HEADING)
+    collector = _Collector()
+    writer = outcolumn.ListOutput(collector, table.Column.Policy.NO_HEADING)
+    # line of the row being converted; the reader counts a row once it
+    # has been read, before transform and writerow
+    current = line_num
+    try:
+        for values in reader:
+            current = line_num + reader.line_num - 1
+            if transform is not None:
+                values = transform(values)
+            if values is not None:
+                writer.writerow(values)
+            current = line_num + reader.line_num
+    except Exception as e:
+        # the cause may not survive the return from a worker process,
+        # so it is included in the message
+        cause = e.__cause__ if e.__cause__ is not None else e
+        raise RuntimeError(''.join([
+                        incolumn._inputlocation(current),
+                        " Error converting row: ", repr(cause)])) from e
+    return collector.rows
+
+
+def _convertspec(task):
+    """
+    Convert a batch in a worker process.  The Columns are created from
+    their specs once in each process.
+    """
+    (inspec, outspec, transform, shortrowsallowed, line_num, rows) = task
+    columns = list()
+    for spec in (inspec, outspec):
+        fingerprint = table.Column.specfingerprint(spec)
+        if not fingerprint in _workercolumns:
+            _workercolumns[fingerprint] = table.Column.from_spec(spec)
+        columns.append(_workercolumns[fingerprint])
+    return _convertbatch(columns[0], columns[1], transform,
+                            shortrowsallowed, line_num, rows)
+
+
+class Pipeline(object):
+    """
+    Copy a table from a row reader to a row writer, with reading,
+    conversion and writing in separate stages.
+    """
+
+    # number of rows in each batch
+    batchsize = 1000
+
+    # number of batches held between two stages
+    queuesize = 8
+
+    def __init__(self, incolumn, outcolumn=None, transform=None,
+                    shortrowsallowed=False, inheadingpolicy=None,
+                    outheadingpolicy=None, processes=None):
+        """
+        incolumn is the table.Column for input, outcolumn the
+        table.Column for output (default incolumn).
+
+        transform is an optional function that accepts a list of typed
+        values in the order of the columns of incolumn and returns a
+        list of typed values in the order of the columns of outcolumn,
+        or None to leave the row out of the output.
+
+        shortrowsallowed and inheadingpolicy are as for
+        Column.ListInput(), outheadingpolicy is as for
+        Column.ListOutput().
+
+        processes is the number of worker processes for conversion.
+        None or 0 converts in a thread.
+        """
+        self._incolumn = incolumn
+        self._outcolumn = incolumn if outcolumn is None else outcolumn
+        self._transform = transform
+        self._shortrowsallowed = shortrowsallowed
+        self._inheadingpolicy = inheadingpolicy
+        self._outheadingpolicy = outheadingpolicy
+        self._processes = processes
+        self._stop = threading.Event()
+        # for reporting
+        self.line_num = 0       # input lines read, including headings
+        self.rowcount = 0       # rows written, not including headings
+
+    def _put(self, destination, item):
+        """
+        Put an item in a queue, giving up if the pipeline has stopped.
+        """
+        while not self._stop.is_set():
+            try:
+                destination.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _get(self, source):
+        """
+        Get an item from a queue, or None if the pipeline has stopped.
+        """
+        while not self._stop.is_set():
+            try:
+                return source.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return None
+
+    def _read(self, rowreader, destination):
+        """
+        Read stage: check headings, then read batches of rows of text
+        and put (line number, rows) in the destination queue.  None
+        marks the end.
+        """
+        try:
+            # ListInput reads and checks the headings, if any
+            reader = self._incolumn.ListInput(rowreader,
+                                self._shortrowsallowed, self._inheadingpolicy)
+            self.line_num = reader.line_num
+            rowreader = iter(rowreader)
+            while not self._stop.is_set():
+                rows = list(itertools.islice(rowreader, self.batchsize))
+                if not rows:
+                    break
+                if not self._put(destination, (self.line_num, rows)):
+                    return
+                self.line_num += len(rows)
+            self._put(destination, None)
+        except BaseException as e:
+            self._put(destination, _Failure(e))
+
+    def _convert(self, source, destination):
+        """
+        Convert stage: convert each batch, in this thread or in a pool
+        of processes, and put the converted rows in the destination
+        queue in their original order.  None marks the end.
+        """
+        try:
+            if self._processes:
+                self._convertprocesses(source, destination)
+                return
+            while not self._stop.is_set():
+                item = self._get(source)
+                if item is None or isinstance(item, _Failure):
+                    self._put(destination, item)
+                    return
+                (line_num, rows) = item
+                if not self._put(destination, _convertbatch(self._incolumn,
+                                    self._outcolumn, self._transform,
+                                    self._shortrowsallowed, line_num, rows)):
+                    return
+        except BaseException as e:
+            self._put(destination, _Failure(e))
+
+    def _convertprocesses(self, source, destination):
+        """
+        Convert with a pool of processes, keeping a bounded number of
+        batches in progress.
+        """
+        inspec = self._incolumn.to_spec()
+        outspec = self._outcolumn.to_spec()
+        window = collections.deque()
+        with concurrent.futures.ProcessPoolExecutor(
+                                        self._processes) as executor:
+            try:
+                while not self._stop.is_set():
+                    item = self._get(source)
+                    if item is None or isinstance(item, _Failure):
+                        while window:
+                            if not self._put(destination,
+                                                window.popleft().result()):
+                                return
+                        self._put(destination, item)
+                        return
+                    (line_num, rows) = item
+                    window.append(executor.submit(_convertspec,
+                                    (inspec, outspec, self._transform,
+                                    self._shortrowsallowed, line_num, rows)))
+                    if len(window) >= 2 * self._processes:
+                        if not self._put(destination,
+                                            window.popleft().result()):
+                            return
+            finally:
+                for future in window:
+                    future.cancel()
+
+    def run(self, rowreader, rowwriter):
+        """
+        Copy every row from rowreader to rowwriter, return the number of
+        rows written (not including headings).
+
+        rowreader is an iterable (like csv.reader) that produces a list
+        of strings for each line of text.  rowwriter is an object (like
+        csv.writer) with writerow() and writerows() methods.
+        """
+        self._stop.clear()
+        self.line_num = 0
+        self.rowcount = 0
+        rawqueue = queue.Queue(self.queuesize)
+        convertedqueue = queue.Queue(self.queuesize)
+        threads = [threading.Thread(target=self._read,
+                                    args=(rowreader, rawqueue), daemon=True),
+                   threading.Thread(target=self._convert,
+                                    args=(rawqueue, convertedqueue),
+                                    daemon=True)]
+        for thread in threads:
+            thread.start()
+        try:
+            # ListOutput writes the headings, if any
+            writer = self._outcolumn.ListOutput(rowwriter,
+                                                self._outheadingpolicy)
+            while True:
+                item = convertedqueue.get()
+                if item is None:
+                    break
+                if isinstance(item, _Failure):
+                    raise item.exception
+                # line of the first row of the batch, before it is written
+                current = writer._line_num + self.rowcount
+                try:
+                    rowwriter.writerows(item)
+                except Exception as e:
+                    raise RuntimeError(''.join([
+                        self._outcolumn._outputlocation(current),
+                        " Error writing the batch of ", str(len(item)),
+                        " rows from this line."])) from e
+                self.rowcount += len(item)
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+        return self.rowcount
+
+
+if __name__ == "__main__":
+    """Run as a script when invoked from shell command line."""
+
+    raise NotImplementedError("'" + sys.argv[0]
+                        + "' does not currently run as a standalone script")
@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+# Load tables into SQLite databases and export query results as tables.
+
+"""
+Load tables into SQLite databases and export query results as tables.
+
+SQLiteLoader creates a database table from a table.Column definition and
+inserts the rows produced by any of the Column readers (ListInput,
+DictInput or NamedInput), in batches through executemany() and in large
+transactions, with PRAGMAs that favour speed while loading.
+
+The SQL type of each column is its storage:
+
+    "integer"       int values, SQL type INTEGER
+    "real"          float values, SQL type REAL
+    "boolean"       bool values, stored as 0 and 1, SQL type BOOLEAN
+    "text"          str values, SQL type TEXT
+    "encoded"       values of any other type, stored as the text
+                        produced by the column's output function and
+                        converted back by its input function on export
+
+Storage can be declared for each column by name.  Otherwise it is
+inferred from the types of the converted values in the first batch of
+rows: a column with values of one of the first four types has that
+storage, and other columns (values of other types, several types, or
+only None) are encoded.  None is stored as NULL in every column.
+
+The storage and the Column spec of each loaded table are recorded in a
+table named '_tabletext', so that a table can be exported with the same
+types it was loaded with.
+
+export() writes the result of a query through Column.ListOutput, with
+rows fetched in batches by fetchmany().
+
+Usage:
+    with sqlite3.connect("tables.db") as connection:
+        loader = SQLiteLoader(connection, column, "reference")
+        with open("reference.csv", newline='') as f:
+            loader.load(column.ListInput(csv.reader(f)))
+
+        export(connection, 'SELECT * FROM "reference"', column,
+                csv.writer(sys.stdout),
+                storage=tablestorage(connection, "reference"))
+
+When the module file is invoked as a script from the command line, a
+table is loaded from a file (or stdin) into a database, or a query
+result is exported to stdout.
+"""
+
+# Python 3
+import sys
+import collections
+import collections.abc
+import csv
+import getopt
+import itertools
+import json
+import sqlite3
+
+# application
+from tabletext import table
+from tabletext import textio
+
+
+# storage --> SQL type
+_SQLTYPES = collections.OrderedDict([("integer", "INTEGER"),
+                                     ("real", "REAL"),
+                                     ("boolean", "BOOLEAN"),
+                                     ("text", "TEXT"),
+                                     ("encoded", "TEXT")])
+
+# type of the values --> storage
+_STORAGE = {int: "integer", float: "real", bool: "boolean", str: "text"}
+
+
+def quote(name):
+    """
+    Return an SQL identifier quoted for SQLite.
+    """
+    return ''.join(['"', name.replace('"', '""'), '"'])
+
+
+def tablestorage(connection, tablename):
+    """
+    Return the list of the storage of each column of a table loaded by
+    SQLiteLoader, or None when the table was not loaded by SQLiteLoader.
+    """
+    try:
+        row = connection.execute(
+                    "SELECT storage FROM _tabletext WHERE tablename = ?",
+                    (tablename,)).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return None if row is None else json.loads(row[0])
+
+
+class SQLiteLoader(object):
+    """
+    Create an SQLite table for a table.Column and load rows into it.
+    """
+
+    # number of rows inserted by one executemany()
+    batchsize = 10000
+
+    # number of rows inserted in one transaction
+    transactionrows = 500000
+
+    # PRAGMAs set while loading, the previous values are restored after
+    pragmas = [("synchronous", "OFF"),
+               ("journal_mode", "MEMORY"),
+               ("temp_store", "MEMORY"),
+               ("cache_size", "-262144")]      # 256 MiB
+
+    def __init__(self, connection, column, tablename, storage=None):
+        """
+        connection is an sqlite3 connection.  column is the table.Column
+        of the rows, tablename the name of the SQL table.
+
+        storage is an optional dictionary of the storage ("integer",
+        "real", "boolean", "text" or "encoded") of columns by name.
+        The storage of other columns is inferred from the first batch
+        of rows.
+        """
+        super().__init__()
+        if storage is None:
+            storage = dict()
+        for (name, kind) in storage.items():
+            column.index(name)          # raises ValueError if missing
+            if not kind in _SQLTYPES:
+                raise ValueError(''.join(["Column ", repr(name),
+                                    ": invalid storage: ", repr(kind)]))
+        self._connection = connection
+        self._column = column
+        self.tablename = tablename
+        self._declared = dict(storage)
+        self.storage = None     # list, when the table is created
+
+    def inferstorage(self, rows):
+        """
+        Return the list of the storage of each column for a list of rows
+        of typed values, using the declared storage where there is one.
+        """
+        result = list()
+        for (n, name) in enumerate(self._column.names):
+            if name in self._declared:
+                result.append(self._declared[name])
+                continue
+            types = set(type(row[n]) for row in rows)
+            types.discard(type(None))
+            if len(types) == 1 and list(types)[0] in _STORAGE:
+                result.append(_STORAGE[list(types)[0]])
+            else:
+                result.append("encoded")
+        return result
+
+    def ddl(self, storage):
+        """
+        Return the CREATE TABLE statement for a list of storage.
+        """
+        return ''.join(["CREATE TABLE IF NOT EXISTS ", quote(self.tablename),
+                        " (", ", ".join(' '.join([quote(name),
+                                                    _SQLTYPES[kind]])
+                                for (name, kind) in zip(self._column.names,
+                                                        storage)),
+                        ")"])
+
+    def create(self, storage):
+        """
+        Create the table (if it does not exist) and record its storage
+        and Column spec in table _tabletext.
+        """
+        self._connection.execute(self.ddl(storage))
+        self._connection.execute(''.join([
+                        "CREATE TABLE IF NOT EXISTS _tabletext",
+                        " (tablename TEXT PRIMARY KEY, spec TEXT,",
+                        " storage TEXT)"]))
+        self._connection.execute(
+                        "INSERT OR REPLACE INTO _tabletext VALUES (?, ?, ?)",
+                        (self.tablename, json.dumps(self._column.to_spec()),
+                            json.dumps(storage)))
+        self.storage = storage
+
+    def _encoder(self):
+        """
+        Return a function that converts a row of typed values to the
+        values inserted, or None when the values are inserted as they
+        are.
+        """
+        encoded = [(n, self._column._outfunc(name))
+                    for (n, (name, kind)) in enumerate(zip(self._column.names,
+                                                            self.storage))
+                    if kind == "encoded"]
+        if not encoded:
+            return None
+
+        def encode(row):
+            row = list(row)
+            for (n, outfunc) in encoded:
+                if row[n] is not None:
+                    row[n] = outfunc(row[n])
+            return row
+        return encode
+
+    def _pragmas(self, settings):
+        """
+        Set PRAGMAs, return their previous values.
+        """
+        previous = list()
+        for (name, value) in settings:
+            previous.append((name, self._connection.execute(
+                                    "PRAGMA " + name).fetchone()[0]))
+            self._connection.execute(''.join(["PRAGMA ", name, " = ",
+                                                str(value)]))
+        return previous
+
+    def load(self, reader):
+        """
+        Insert the rows produced by reader, return the number of rows.
+
+        reader is a Column reader (or any iterable) that produces lists,
+        tuples, named tuples or dictionaries keyed by column name.  The
+        table is created from the first batch of rows if it has not been
+        created already; a table loaded before keeps its recorded
+        storage.
+        """
+        names = self._column.names
+        if self.storage is None:
+            # a table loaded before keeps its storage
+            self.storage = tablestorage(self._connection, self.tablename)
+        statement = ''.join(["INSERT INTO ", quote(self.tablename), " (",
+                            ", ".join(quote(name) for name in names),
+                            ") VALUES (",
+                            ", ".join("?" for name in names), ")"])
+        rows = iter(reader)
+        count = 0
+        intransaction = 0
+        # commit any open transaction before the PRAGMAs
+        self._connection.commit()
+        previous = self._pragmas(self.pragmas)
+        try:
+            getter = None
+            encode = None
+            while True:
+                batch = list(itertools.islice(rows, self.batchsize))
+                if not batch:
+                    break
+                if getter is None:
+                    if isinstance(batch[0], collections.abc.Mapping):
+                        getter = lambda row: [row[name] for name in names]
+                    else:
+                        getter = False
+                if getter:
+                    batch = [getter(row) for row in batch]
+                if self.storage is None:
+                    self.create(self.inferstorage(batch))
+                if encode is None:
+                    encode = self._encoder() or False
+                if encode:
+                    batch = [encode(row) for row in batch]
+                try:
+                    self._connection.executemany(statement, batch)
+                except Exception as e:
+                    location = ''
+                    if hasattr(reader, "line_num"):
+                        location = ''.join([" ",
+                                    self._column._inputlocation(
+                                        reader.line_num - len(batch)),
+                                    " to ", str(reader.line_num - 1)])
+                    raise RuntimeError(''.join(["Error inserting rows ",
+                                        str(count), " to ",
+                                        str(count + len(batch) - 1),
+                                        location])) from e
+                count += len(batch)
+                intransaction += len(batch)
+                if intransaction >= self.transactionrows:
+                    self._connection.commit()
+                    intransaction = 0
+            if self.storage is None:
+                # no rows: the declared storage, other columns encoded
+                self.create(self.inferstorage([]))
+            self._connection.commit()
+        except BaseException:
+            self._connection.rollback()
+            raise
+        finally:
+            self._pragmas(previous)
+        return count
+
+
+def export(connection, query, column, rowwriter, parameters=(),
+            storage=None, headingpolicy=None, batchsize=10000):
+    """
+    Write the result of a query through Column.ListOutput, return the
+    number of rows written (not including headings).
+
+    The query must produce one result column for each column of
+    column, in the same order.  storage is an optional list of the
+    storage of each column (see tablestorage()), used to convert
+    "boolean" and "encoded" values back to their types before the
+    output functions are applied.  headingpolicy is as for
+    Column.ListOutput().
+    """
+    writer = column.ListOutput(rowwriter, headingpolicy)
+    decoders = list()
+    if storage is not None:
+        if len(storage) != len(column):
+            raise ValueError(''.join(["Expected storage for ",
+                                str(len(column)), " columns, got ",
+                                str(len(storage))]))
+        for (n, (name, kind)) in enumerate(zip(column.names, storage)):
+            if kind == "boolean":
+                decoders.append((n, bool))
+            elif kind == "encoded":
+                decoders.append((n, column._infunc(name)))
+    cursor = connection.execute(query, parameters)
+    if len(cursor.description) != len(column):
+        raise ValueError(''.join(["Expected ", str(len(column)),
+                            " result columns, got ",
+                            str(len(cursor.description))]))
+    count = 0
+    while True:
+        batch = cursor.fetchmany(batchsize)
+        if not batch:
+            break
+        if decoders:
+            batch = [list(row) for row in batch]
+            for row in batch:
+                for (n, decode) in decoders:
+                    if row[n] is not None:
+                        row[n] = decode(row[n])
+        writer.writerows(batch)
+        count += len(batch)
+    return count
+
+
+if __name__ == "__main__":
+    """
+    Run as a script if invoked from shell command line.
+
+    Load a table from a file or stdin into a database, or export the
+    result of a query from a database to stdout.
+    """
+
+    def printlog(text):
+        print(text, file=sys.stderr)
+
+    # Get the processing options and the file names.
+    optarg = getopt.getopt(sys.argv[1:],
+                            "h",
+                            ["help", "table=", "export=", "storage=",
+                             "defdelim=", "delim=", "noheading", "progress"])
+    opt = collections.OrderedDict(optarg[0])
+    arg = optarg[1]
+    if ("-h" in opt or "--help" in opt or len(arg) < 2 or len(arg) > 3
+            or not ("--table" in opt or "--export" in opt)):
+        printlog(" ".join(["Usage: ", sys.argv[0],
+                        "[-h|--help]",
+                        "[--table=name]",
+                        "[--export=query]",
+                        "[--storage=name:kind,...]",
+                        "[--defdelim='w']",
+                        "[--delim='x']",
+                        "[--noheading]",
+                        "[--progress]",
+                        "columndef",
+                        "database",
+                        "[filename]"]))
+        printlog("       Load a table into an SQLite database, or export the")
+        printlog("       result of a query")
+        printlog("       -h|--help     print this message")
+        printlog("       --table=      load into this table (created when")
+        printlog("                     it does not exist)")
+        printlog("       --export=     write the result of this query to")
+        printlog("                     stdout, with the storage of the")
+        printlog("                     columns of --table if given")
+        printlog("       --storage=    storage of columns (integer, real,")
+        printlog("                     boolean, text or encoded), default")
+        printlog("                     inferred from the first rows")
+        printlog("       --defdelim=   column definition field delimiter")
+        printlog("       --delim=      table field delimiter")
+        printlog("       --noheading   no headings in input or output")
+        printlog("       --progress    report progress on stderr")
+        printlog("       zero-length delimiters cause special handling")
+        printlog("       omit delimiters to specify CSV formatted text")
+        printlog("       See script for details")
+        exit(code=2)
+
+    if "--defdelim" in opt:
+        defdelim = opt["--defdelim"]
+        defreader = table.Delim(defdelim if defdelim else None).reader
+    else:
+        defreader = csv.reader
+    if "--delim" in opt:
+        delim = opt["--delim"]
+        layout = table.Delim(delim if delim else None)
+        (rowreader, rowwriter) = (layout.reader, layout.writer)
+    else:
+        (rowreader, rowwriter) = (csv.reader, csv.writer)
+
+    with textio.open_text(arg[0]) as textsource:
+        column = table.Column(defreader(textsource))
+
+    if "--noheading" in opt:
+        headingpolicy = table.Column.Policy.NO_HEADING
+    else:
+        headingpolicy = None
+
+    meter = None
+    if "--progress" in opt:
+        meter = table.Meter.progress(arg[2] if len(arg) > 2
+                                        and not textio.codec(arg[2]) else None)
+
+    connection = sqlite3.connect(arg[1])
+    try:
+        if "--export" in opt:
+            storage = None
+            if "--table" in opt:
+                storage = tablestorage(connection, opt["--table"])
+            export(connection, opt["--export"], column,
+                    rowwriter(sys.stdout), storage=storage,
+                    headingpolicy=headingpolicy)
+        else:
+            storage = dict()
+            if opt.get("--storage"):
+                for item in opt["--storage"].split(","):
+                    (name, sep, kind) = item.partition(":")
+                    storage[name] = kind
+            loader = SQLiteLoader(connection, column, opt["--table"],
+                                    storage)
+            if len(arg) > 2:
+                textsource = textio.open_text(arg[2])
+            else:
+                textsource = sys.stdin
+            try:
+                source = textsource
+                if meter is not None:
+                    source = meter.textreader(textsource)
+                loader.load(column.ListInput(rowreader(source),
+                                            headingpolicy=headingpolicy))
+            finally:
+                if not textsource is sys.stdin:
+                    textsource.close()
+            if meter is not None:
+                meter.finish()
+    finally:
+        connection.close()
@@ -16,6 +16,7 @@ The features added by this module are:
         text.
     A 'Delim' class to support other forms of delimited text such as
         tab-separated fields
+    A 'FixedWidth' class to support text with fields in fixed columns
 
 The Column class supports input and output of the rows of a table that
 is defined in text as rows and columns.  Each row is delimited as fields
@@ -73,6 +74,12 @@ The output writers are:
     short rows).  Values can be set to None for any column with an
     output function that accepts None.
 
+For intermediate files that are written and read again by applications,
+Column.BinaryOutput and Column.BinaryInput write and read lists of typed
+values in a compact binary format, without the output and input
+functions, with the same heading and line number behaviour as the text
+writers and readers.
+
 The column operators, which create new instances, are:
 
     append(columns)         Append columns to the right
@@ -82,6 +89,28 @@ The column operators, which create new instances, are:
     remove(names)           Remove specified columns
     select(names)           Choose a subset of columns and specify order
 
+Column definitions can be saved as plain data with to_spec() and
+restored with from_spec(), which can also keep compiled input and
+output functions in a directory to avoid compiling them again.  Column
+instances can be pickled (for example, to send them to another
+process).
+
+Input and output functions that do nothing, or only exchange '' and
+None (like 'lambda x: x' and "lambda x: '' if x is None else str(x)"),
+are recognized when a column is defined (see Column.conversionkind()).
+The readers and writers do not call them, and rows where no column needs
+conversion pass through unchanged.
+
+The text readers accept filters: predicates on the text of named fields,
+or on the value of a single field converted alone.  Rows that fail are
+skipped before the rest of the row is converted, and are still counted
+by line_num.
+
+A ConversionProfile can be given to any reader or writer to find which
+columns' input or output functions are slow or fail.  A Meter can be
+given to any reader or writer, including Delim readers and writers, to
+count rows and report progress.
+
 Security
 
 This module uses run-time compilation with eval() to support flexible
@@ -91,12 +120,24 @@ only be used with code and data from trusted sources.
 
 # Python 3
 import sys
+import array
 import ast          # support for using ast.literal_eval() in lambda functions
 import collections
 import csv
 from enum import Enum
+import hashlib
+import importlib.util
+import itertools
+import json
 import keyword
+import marshal
+import operator
+import os
+import pickle
 import re
+import struct
+import threading
+import time
 import types
 
 class Column(object):
@@ -182,13 +223,28 @@ class Column(object):
             return False
         return False if cls._re_identifier.fullmatch(text) is None else True
 
+    # Class data: compiled lambda functions keyed by source text, shared by
+    # all instances and threads, least recently used entries discarded
+    # when there are more than lambdacachesize entries.
+    lambdacachesize = 1024
+    _lambdacache = collections.OrderedDict()
+    _lambdacachelock = threading.Lock()
+
     @classmethod
     def eval_lambda_function(cls, func_str):
         '''
         Evaluate and validate a lambda expression.
 \
         func_str is a string that should evaluate as a lambda funcition.
+
+        Functions are cached by source text, so evaluating the same
+        text again returns the same function object.
         '''
+        with cls._lambdacachelock:
+            func = cls._lambdacache.get(func_str)
+            if func is not None:
+                cls._lambdacache.move_to_end(func_str)
+                return func
         if not func_str.lstrip().startswith('lambda'):
             raise ValueError(''.join(["Not a lambda expression: ",
                                     repr(func_str)]))
@@ -201,8 +257,117 @@ class Column(object):
             raise ValueError(''.join(["Not valid source code for a Python",
                                 " lambda function: ", repr(func_str)])
                             ) from e
+        return cls._cachelambda(func_str, func)
+
+    @classmethod
+    def _cachelambda(cls, func_str, func):
+        '''
+        Add a function to the lambda cache, discarding the entries used
+        least recently when the cache is full.  Return the cached
+        function, which is an earlier one if another thread has added
+        the same text meanwhile.
+        '''
+        with cls._lambdacachelock:
+            func = cls._lambdacache.setdefault(func_str, func)
+            cls._lambdacache.move_to_end(func_str)
+            while len(cls._lambdacache) > cls.lambdacachesize:
+                cls._lambdacache.popitem(last=False)
         return func
 
+    @classmethod
+    def clearlambdacache(cls):
+        '''
+        Discard all cached lambda functions.
+        '''
+        with cls._lambdacachelock:
+            cls._lambdacache.clear()
+
+    # Class data: the kinds of conversion recognized by conversionkind(),
+    # each with the expressions equivalent to a function of that kind
+    # used as an input function and as an output function.  "{0}" is the
+    # argument of the function.  Input text is always str, so str(x) and
+    # the test for None reduce to the text itself on input.
+    _conversionkinds = {
+        "identity":     ("{0}", "{0}"),
+        "str":          ("{0}", "str({0})"),
+        "nullable":     ("({0} or None)", "(None if {0} == '' else {0})"),
+        "nullablestr":  ("({0} or None)",
+                            "(None if {0} == '' else str({0}))"),
+        "emptynull":    ("{0}", "('' if {0} is None else {0})"),
+        "emptynullstr": ("{0}", "('' if {0} is None else str({0}))"),
+    }
+
+    @classmethod
+    def conversionkind(cls, func_str):
+        '''
+        Return the kind of conversion done by the source text of a
+        lambda function, or None when the kind is not recognized.
+
+        The kinds are:
+            "identity"      lambda x: x
+            "str"           lambda x: str(x)
+            "nullable"      lambda x: None if x == '' else x
+            "nullablestr"   lambda x: None if x == '' else str(x)
+            "emptynull"     lambda x: '' if x is None else x
+            "emptynullstr"  lambda x: '' if x is None else str(x)
+        The comparisons can be written either way round, and 'is None'
+        as '== None'.
+        '''
+        try:
+            function = ast.parse(func_str.strip(), mode='eval').body
+        except (SyntaxError, ValueError):
+            return None
+        if not isinstance(function, ast.Lambda):
+            return None
+        arguments = function.args
+        if (len(arguments.args) != 1 or arguments.posonlyargs
+                or arguments.vararg or arguments.kwonlyargs
+                or arguments.kwarg or arguments.defaults):
+            return None
+        name = arguments.args[0].arg
+
+        def isargument(node):
+            return isinstance(node, ast.Name) and node.id == name
+
+        def isconstant(node, value):
+            return (isinstance(node, ast.Constant)
+                        and type(node.value) is type(value)
+                        and node.value == value)
+
+        def isstr(node):
+            return (isinstance(node, ast.Call)
+                        and isinstance(node.func, ast.Name)
+                        and node.func.id == "str" and len(node.args) == 1
+                        and not node.keywords and isargument(node.args[0]))
+
+        def istest(node, operators, value):
+            if not (isinstance(node, ast.Compare) and len(node.ops) == 1
+                        and isinstance(node.ops[0], operators)):
+                return False
+            (left, right) = (node.left, node.comparators[0])
+            return ((isargument(left) and isconstant(right, value))
+                        or (isconstant(left, value) and isargument(right)))
+
+        body = function.body
+        if isargument(body):
+            return "identity"
+        if isstr(body):
+            return "str"
+        if isinstance(body, ast.IfExp):
+            if (isconstant(body.body, None)
+                    and istest(body.test, ast.Eq, '')):
+                prefix = "nullable"
+            elif (isconstant(body.body, '')
+                    and istest(body.test, (ast.Is, ast.Eq), None)):
+                prefix = "emptynull"
+            else:
+                return None
+            if isargument(body.orelse):
+                return prefix
+            if isstr(body.orelse):
+                return prefix + "str"
+        return None
+
     # __class__._Policy - how headings should be managed.  Easy check strips
     # leading and trailing whiterspace, converts other sequences of whitespace
     # to a single space character before comparing headings.
@@ -211,6 +376,41 @@ class Column(object):
                                     "HEADING_EASY_CHECK",
                                     "HEADING_EXACT_CHECK"]))
 
+    # Class data: immutable properties of one column, a subclass of
+    # NamedTuple.  Entries are shared by instances created from other
+    # instances and by the column operators.
+    # inkind and outkind are the kinds of the input and output functions
+    # (see conversionkind()), or None.
+    _ColProperty = collections.namedtuple("_ColProperty",
+                    ["infunc", "outfunc", "heading", "insource", "outsource",
+                     "inkind", "outkind"], defaults=[None, None])
+
+    class _Definitions(object):
+        """
+        Column names and properties in order, and the position of each
+        name.
+
+        An instance uses the first _count entries.  Instances created
+        from other instances share the definitions.  append() extends
+        the lists in place when no entries follow the entries of the
+        instance and the lists are not shared with other definitions
+        (extendable), so a chain of appends does not copy them; every
+        other change is made to a copy of the lists it changes.
+        """
+        __slots__ = ("names", "properties", "positions", "extendable")
+
+        def __init__(self, names, properties, positions=None,
+                        extendable=True):
+            self.names = names
+            self.properties = properties
+            if positions is None:
+                positions = dict((name, n) for (n, name) in enumerate(names))
+            self.positions = positions
+            self.extendable = extendable
+
+    # Class data: lock for extending shared definitions in place
+    _definitionslock = threading.Lock()
+
     def __init__(self, columns, headingpolicy=None):
         """
         Create a Column instance from another object.
@@ -273,34 +473,107 @@ class Column(object):
         super().__init__()
         if headingpolicy and not isinstance(headingpolicy, __class__.Policy):
             raise ValueError("Invalid heading policy: " + repr(headingpolicy))
-        # Create a subclass of NamedTuple for properties of each column
-        # when invoked as a function, behaves like a class object
-        self._ColProperty = collections.namedtuple("_ColProperty",
-                    ["infunc", "outfunc", "heading"])
         # initialize from another instance or from an iterable of iterables
         if isinstance(columns,type(self)):
-            # from another instance - make deep copy to avoid shared data
-            self._column = collections.OrderedDict(columns._column.items())
+            # from another instance - the definitions are immutable, so
+            # they are shared, with the values cached from them
+            self._definitions = columns._definitions
+            self._count = columns._count
+            self._names = columns._names
+            self._NamedRow = columns._NamedRow
+            self._converters = columns._converters
+            self._lists = columns._lists
             if headingpolicy:
                 self._headingpolicy = headingpolicy
             else:
                 self._headingpolicy = columns._headingpolicy
         else:
             try:
-                self._column = self._columndictionary(columns)
+                column_dictionary = self._columndictionary(columns)
             except Exception as e:
                 raise RuntimeError(
                         "While initializing column definition") from e
+            self._setdefinitions(self._Definitions(
+                                    list(column_dictionary.keys()),
+                                    list(column_dictionary.values())),
+                                len(column_dictionary))
             if headingpolicy:
                 self._headingpolicy = headingpolicy
             else:
                 self._headingpolicy = self.Policy.HEADING_EXACT_CHECK
-        # attributes with cached values
-        # Some of the operators create an instance with no column definitions
-        # and then add definitions.  Attributes that depend on the column
-        # definitions must exist on first reference but cannot be set to final
-        # values until all of the column definitions exist.
+
+    def _setdefinitions(self, definitions, count):
+        """
+        Use the first count entries of definitions, and clear the values
+        cached from the previous definitions.
+        """
+        self._definitions = definitions
+        self._count = count
+        # attributes with cached values, set on first reference
+        self._names = None          # returned by self.names
         self._NamedRow = None       # returned by self.NamedRow()
+        self._converters = dict()   # returned by self._converter()
+        self._lists = None          # returned by self._propertylists()
+
+    def _copydefinitions(self):
+        """
+        Return a copy of the definitions used by this instance, which
+        can be changed.
+        """
+        definitions = self._definitions
+        count = self._count
+        if len(definitions.names) == count:
+            positions = dict(definitions.positions)
+        else:
+            positions = None
+        return self._Definitions(definitions.names[:count],
+                                    definitions.properties[:count], positions)
+
+    def _derive(self, definitions, count=None):
+        """
+        Return a new instance with the first count entries of definitions
+        (default every entry) and the heading policy of this instance.
+        """
+        new_instance = self.__class__(self)
+        if count is None:
+            count = len(definitions.names)
+        new_instance._setdefinitions(definitions, count)
+        return new_instance
+
+    def _has(self, name):
+        """
+        Return True if there is a column with the name.
+        """
+        return self._definitions.positions.get(name, self._count) < self._count
+
+    def _property(self, name):
+        """
+        Return the _ColProperty of the named column.  Raise KeyError if
+        there is no such column.
+        """
+        n = self._definitions.positions.get(name, self._count)
+        if n >= self._count:
+            raise KeyError(name)
+        return self._definitions.properties[n]
+
+    def _properties(self):
+        """
+        Return a list of the _ColProperty of each column, in order.
+        """
+        return self._definitions.properties[:self._count]
+
+    def _propertylists(self):
+        """
+        Return a tuple of lists (headings, input functions, output
+        functions) in column order, made on first use.  The lists are
+        shared and must not be changed.
+        """
+        if self._lists is None:
+            properties = self._properties()
+            self._lists = ([p.heading for p in properties],
+                            [p.infunc for p in properties],
+                            [p.outfunc for p in properties])
+        return self._lists
 
 
     def _columndictionary(self, initdata):
@@ -315,11 +588,13 @@ class Column(object):
             output function as text for a lambda function
             column name as text
         The corresponding dictionary entry is
-            columnname:[inputfunction, outputfunction, heading]
+            columnname:[inputfunction, outputfunction, heading,
+                        inputsource, outputsource]
         """
         if isinstance(initdata, str):
             raise ValueError("Intializer is type str")
         column_dictionary = collections.OrderedDict()
+        kinds = dict()                  # conversion kind by source text
         for init in initdata:           # for each column
             if isinstance(init, str):
                 raise ValueError("Column description is type str")
@@ -342,29 +617,210 @@ class Column(object):
                 raise ValueError("Duplicate column name: " + column_name)
             if not __class__.isvalidcolumnname(column_name):
                 raise ValueError("Invalid column name: " + column_name)
+            for source in item[1:3]:
+                if not source in kinds:
+                    kinds[source] = self.conversionkind(source)
             column_dictionary.setdefault(column_name,
                     self._ColProperty(infunc=infunc,
                                         outfunc=outfunc,
-                                        heading=column_heading))
+                                        heading=column_heading,
+                                        insource=item[1],
+                                        outsource=item[2],
+                                        inkind=kinds[item[1]],
+                                        outkind=kinds[item[2]]))
         return column_dictionary
 
     def __str__(self):
         """
         Names of columns.
         """
-        return (__class__.__name__ + ".names=" + repr(self.names()))
+        return (__class__.__name__ + ".names=" + repr(self.names))
 
     def __len__(self):
         """
         Number of columns.
         """
-        return len(self._column)
+        return self._count
+
+    def to_spec(self):
+        """
+        Return the column definitions and heading policy as plain data.
+
+        The result is a dictionary that can be pickled or written as
+        JSON:
+            "columns"           list of the four-item column
+                                    descriptions accepted by __init__
+            "headingpolicy"     name of the heading policy, like
+                                    "HEADING_EXACT_CHECK"
+        """
+        return {"columns": [[p.heading, p.insource, p.outsource, name]
+                                for (name, p) in zip(self.names,
+                                                    self._properties())],
+                "headingpolicy": self._headingpolicy.name}
+
+    @classmethod
+    def from_spec(cls, spec, cachedir=None):
+        """
+        Create an instance from the result of to_spec().
+
+        cachedir is an optional directory for compiled schemas.  The
+        code and default argument values of the input and output
+        functions are stored there with marshal, in a file named for the
+        fingerprint of spec, and are loaded instead of compiling the
+        source text when the same spec is used again by this version of
+        Python.  Specs with default values that marshal cannot store are
+        not kept.
+        """
+        policy = cls.Policy[spec["headingpolicy"]]
+        if cachedir is None:
+            return cls(spec["columns"], policy)
+        path = os.path.join(cachedir, ''.join([cls.specfingerprint(spec),
+                            ".", importlib.util.MAGIC_NUMBER.hex(),
+                            ".marshal"]))
+        try:
+            with open(path, 'rb') as f:
+                codes = marshal.load(f)
+            # place the functions in the lambda cache so that __init__
+            # does not compile the source text
+            if len(codes) != len(spec["columns"]):
+                raise ValueError("Wrong number of columns in " + repr(path))
+            funcs = dict()
+            for (item, code) in zip(spec["columns"], codes):
+                for (source, (c, defaults, kwdefaults)) in zip(item[1:3],
+                                                                code):
+                    func = types.FunctionType(c, globals(), None, defaults)
+                    func.__kwdefaults__ = kwdefaults
+                    funcs.setdefault(source, func)
+        except (OSError, EOFError, ValueError, TypeError):
+            funcs = None
+        if funcs is not None:
+            for (source, func) in funcs.items():
+                cls._cachelambda(source, func)
+            return cls(spec["columns"], policy)
+        instance = cls(spec["columns"], policy)
+        codes = [[(f.__code__, f.__defaults__, f.__kwdefaults__)
+                    for f in (p.infunc, p.outfunc)]
+                    for p in instance._properties()]
+        try:
+            data = marshal.dumps(codes)
+        except ValueError:
+            return instance             # default values marshal cannot store
+        os.makedirs(cachedir, exist_ok=True)
+        temppath = ''.join([path, ".", str(os.getpid()), ".tmp"])
+        with open(temppath, 'wb') as f:
+            f.write(data)
+        os.replace(temppath, path)
+        return instance
+
+    @classmethod
+    def specfingerprint(cls, spec):
+        """
+        Return a hex digest that identifies the result of to_spec().
+        """
+        text = json.dumps(spec, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    @property
+    def fingerprint(self):
+        """
+        Hex digest that identifies the column definitions and heading
+        policy.
+        """
+        return self.specfingerprint(self.to_spec())
+
+    def __reduce__(self):
+        """
+        Pickle as a spec, because the lambda functions cannot be
+        pickled.
+        """
+        return (self.__class__.from_spec, (self.to_spec(),))
 
     def _infunc(self, name):
-        return self._column[name].infunc
+        return self._property(name).infunc
 
     def _outfunc(self, name):
-        return self._column[name].outfunc
+        return self._property(name).outfunc
+
+    def _converter(self, output):
+        """
+        Return a function that converts a list of values, one for each
+        column, with the input functions (output False) or the output
+        functions (output True) and returns a new list.  Return None
+        when no column needs conversion.
+
+        Functions of a recognized kind (see conversionkind()) are
+        replaced by equivalent expressions in one compiled function,
+        so they cost no function call for each value.  Other functions
+        are called.  On input, the values must be str.
+        """
+        if output in self._converters:
+            return self._converters[output]
+        functions = list()
+        items = list()
+        identity = True
+        for (n, p) in enumerate(self._properties()):
+            kind = p.outkind if output else p.inkind
+            value = ''.join(["row[", str(n), "]"])
+            functions.append(p.outfunc if output else p.infunc)
+            if kind is None:
+                items.append(''.join(["f[", str(n), "](", value, ")"]))
+                identity = False
+            else:
+                expression = self._conversionkinds[kind][1 if output else 0]
+                items.append(expression.format(value))
+                identity = identity and expression == "{0}"
+        if identity:
+            converter = None
+        else:
+            converter = eval(''.join(["lambda row: [", ", ".join(items), "]"]),
+                                {"f": functions})
+        self._converters[output] = converter
+        return converter
+
+    def _filter(self, filters, valuefilters):
+        """
+        Return a function that returns True when a list of str, one for
+        each column, passes every predicate, or None when there are no
+        predicates.
+
+        filters and valuefilters are dictionaries (or iterables of pairs)
+        of column name and predicate.  A predicate of filters is given
+        the text of the field, a predicate of valuefilters the value
+        converted by the input function of that column alone.  The
+        predicates are tested in order, text first, and testing stops at
+        the first that fails.
+        """
+        predicates = list()
+        functions = list()
+        items = list()
+        for (converted, pairs) in ((False, filters), (True, valuefilters)):
+            if pairs is None:
+                continue
+            if hasattr(pairs, "items"):
+                pairs = pairs.items()
+            for (name, predicate) in pairs:
+                if not self._has(name):
+                    raise ValueError("Column does not exist: " + repr(name))
+                if not callable(predicate):
+                    raise ValueError("Filter is not callable: " + repr(name))
+                n = self.index(name)
+                value = ''.join(["row[", str(n), "]"])
+                if converted:
+                    p = self._property(name)
+                    if p.inkind is None:
+                        value = ''.join(["f[", str(len(functions)), "](",
+                                            value, ")"])
+                        functions.append(p.infunc)
+                    else:
+                        value = self._conversionkinds[p.inkind][0].format(
+                                                                        value)
+                items.append(''.join(["p[", str(len(predicates)), "](",
+                                        value, ")"]))
+                predicates.append(predicate)
+        if not items:
+            return None
+        return eval(''.join(["lambda row: bool(", " and ".join(items), ")"]),
+                    {"p": predicates, "f": functions})
 
     def _inputlocation(self, line_num):
         """
@@ -382,9 +838,27 @@ class Column(object):
     def names(self):
         """
         Column names as a list of strings.
+
+        The list is a copy, which may be changed by the caller.  To find
+        one column of a wide table, index() takes the same time for any
+        number of columns.
         """
-        return [name for name in self._column.keys()]
-    
+        if self._names is None:
+            self._names = self._definitions.names[:self._count]
+        return list(self._names)
+
+    def index(self, name):
+        """
+        Return the position of the named column, counting from 0.
+
+        Like list.index(), raises ValueError if there is no such column,
+        but takes the same time for any number of columns.
+        """
+        n = self._definitions.positions.get(name, self._count)
+        if n >= self._count:
+            raise ValueError("Column does not exist: " + repr(name))
+        return n
+
     def heading(self, name):
         """
         Return the heading of the named column.
@@ -392,7 +866,7 @@ class Column(object):
         Heading may be an empty string.  Two or more columns could have
         the same heading.
         """
-        return self._column[name].heading
+        return self._property(name).heading
 
     @property
     def headingpolicy(self):
@@ -445,11 +919,24 @@ class Column(object):
         A new column must not have the same name as an original
         column.
         """
-        new_instance = self.__class__(self)
-        for name in columns._column:
-            if name in self._column:
+        names = columns.names
+        for name in names:
+            if self._has(name):
                 raise ValueError("Duplicate column name: " + repr(name))
-            new_instance._column.setdefault(name, columns._column[name])
+        properties = columns._properties()
+        new_instance = self.__class__(self)
+        count = self._count
+        with self._definitionslock:
+            definitions = self._definitions
+            if len(definitions.names) != count or not definitions.extendable:
+                # another instance has extended the lists, or they are
+                # shared, use a copy
+                definitions = self._copydefinitions()
+            definitions.names.extend(names)
+            definitions.properties.extend(properties)
+            definitions.positions.update(
+                            (name, n) for (n, name) in enumerate(names, count))
+        new_instance._setdefinitions(definitions, count + len(names))
         return new_instance
 
     def changeheadings(self, name_heading_pairs):
@@ -469,24 +956,24 @@ class Column(object):
         if isinstance(name_heading_pairs, str):
             raise ValueError("Changes must be iterable of string pairs: "
                             + repr(name_heading_pairs))
-        new_instance = self.__class__([])
         change_dict = dict()
         for (name, newhead) in name_heading_pairs:
-            if not name in self._column:
+            if not self._has(name):
                 raise ValueError("Column name does not exist: " + repr(name))
             if not isinstance(newhead, str):
                 raise ValueError("New heading must be str: " + repr(newhead))
             change_dict.setdefault(name, newhead)
-        for (name, v) in self._column.items():
-            if name in change_dict:
-                new_instance._column.setdefault(name,
-                                new_instance._ColProperty(
-                                        infunc=v.infunc,
-                                        outfunc=v.outfunc,
-                                        heading=change_dict[name]))
-            else:
-                new_instance._column.setdefault(name, v)
-        return new_instance
+        # names and positions are shared, properties are copied
+        shared = self._definitions
+        with self._definitionslock:
+            shared.extendable = False
+        properties = self._properties()
+        for (name, newhead) in change_dict.items():
+            n = shared.positions[name]
+            properties[n] = properties[n]._replace(heading=newhead)
+        return self._derive(self._Definitions(shared.names, properties,
+                                                shared.positions, False),
+                            self._count)
 
     def remove(self, names):
         """
@@ -499,12 +986,16 @@ class Column(object):
         """
         if isinstance(names, str):
             raise ValueError("names must be an iterator of string")
-        new_instance = self.__class__(self)
+        removed = set()
         for name in names:
-            if not name in new_instance._column:
+            if not self._has(name) or name in removed:
                 raise ValueError("Heading not present: " + repr(name))
-            del new_instance._column[name]
-        return new_instance
+            removed.add(name)
+        kept = [(name, p) for (name, p) in zip(self.names, self._properties())
+                    if not name in removed]
+        return self._derive(self._Definitions(
+                                [name for (name, p) in kept],
+                                [p for (name, p) in kept]))
 
     def rename(self, name_pairs):
         """
@@ -529,24 +1020,39 @@ class Column(object):
         if isinstance(name_pairs, str):
             raise ValueError("Changes must be iterable of string pairs: "
                             + repr(name_pairs))
-        new_instance = self.__class__([])
         name_dict = dict()
         for (oldname, newname) in name_pairs:
-            if not oldname in self._column:
+            if not self._has(oldname):
                 raise ValueError("Column does not exist: " + repr(oldname))
             if not self.isvalidcolumnname(newname):
                 raise ValueError("New column name is invalid: "
                                 + repr(newname))
             name_dict.setdefault(oldname,newname)
-        for name in self.names:
-            if name in name_dict:
-                newname = name_dict[name]
-            else:
-                newname = name
-            if newname in new_instance._column:
-                raise ValueError("Duplicate new column name: " + repr(newname))
-            new_instance._column.setdefault(newname, self._column[name])
-        return new_instance
+        definitions = self._copydefinitions()
+        names = definitions.names
+        positions = definitions.positions
+        for oldname in name_dict:
+            del positions[oldname]
+        # positions of the columns with each new name, including a column
+        # that keeps that name; report the duplicate found first in column
+        # order
+        holders = dict()
+        for (oldname, newname) in name_dict.items():
+            holders.setdefault(newname, list()).append(self.index(oldname))
+        duplicates = list()
+        for (newname, columns) in holders.items():
+            if newname in positions:
+                columns = columns + [positions[newname]]
+            if len(columns) > 1:
+                duplicates.append((sorted(columns)[1], newname))
+        if duplicates:
+            raise ValueError("Duplicate new column name: "
+                            + repr(min(duplicates)[1]))
+        for (oldname, newname) in name_dict.items():
+            n = self.index(oldname)
+            names[n] = newname
+            positions[newname] = n
+        return self._derive(definitions)
 
     def select(self, names):
         """
@@ -561,18 +1067,23 @@ class Column(object):
         """
         if isinstance(names, str):
             raise ValueError("names must be an iterator of string")
+        names = list(names)
         for name in names:
-            if not name in self._column:
+            if not self._has(name):
                 raise ValueError("Column does not exist: " + repr(name))
-        new_instance = self.__class__([])
-        for name in names:
-            if name in new_instance._column:
+        positions = dict()
+        for (n, name) in enumerate(names):
+            if name in positions:
                 raise ValueError("Duplicate name: " + repr(name))
-            new_instance._column.setdefault(name, self._column[name])
-        return new_instance
+            positions[name] = n
+        return self._derive(self._Definitions(
+                                names,
+                                [self._property(name) for name in names],
+                                positions))
 
 
-    def ListInput(self, rowreader, shortrowsallowed=False, headingpolicy=None):
+    def ListInput(self, rowreader, shortrowsallowed=False, headingpolicy=None,
+                    profile=None, meter=None, filters=None, valuefilters=None):
         """
         Create reader instance to input lists of typed values.
 
@@ -626,19 +1137,54 @@ class Column(object):
         Otherwise, the column headings will be as read from the input,
         whether or not those headings match the headings defined for
         each column.
+
+        profile is an optional ConversionProfile that collects timings,
+        null counts and exception counts for the input function of each
+        column.  Without a profile the reader has no instrumentation.
+
+        meter is an optional Meter that counts the rows read, including
+        any heading row.
+
+        filters and valuefilters select the rows returned.  Each is a
+        dictionary (or an iterable of pairs) of column name and
+        predicate.  A predicate of filters is given the text of the
+        field, a predicate of valuefilters the value converted by the
+        input function of that column only.  A row is returned when
+        every predicate returns true; the other columns are converted
+        only for rows returned.  Rejected rows are counted by line_num
+        but not checked for length.  In a short row, missing fields are
+        given to the predicates as None.  An exception raised by a
+        predicate (or by the input function of a value filter) is
+        raised by the reader with the line number, like a conversion
+        error.
+
+            reader = ListInput(rowreader,
+                        filters={"state": lambda text: text == "CA"},
+                        valuefilters={"amount": lambda value: value > 100})
         """
+        if meter is not None:
+            rowreader = meter.rowreader(rowreader)
+        if profile is not None:
+            return self.__class__._ProfiledListInput(self, rowreader,
+                                shortrowsallowed, headingpolicy, profile,
+                                filters, valuefilters)
         return self.__class__._ListInput(self, rowreader, shortrowsallowed,
-                                        headingpolicy)
+                                        headingpolicy, filters, valuefilters)
 
     class _ListInput(object):
         """
         Reader to input lists of typed values from lists of strings.
         """
-        def __init__(self, column, rowreader, shortrowsallowed, headingpolicy):
-            self._headings = [column.heading(name) for name in column.names]
-            self._infunc = [column._infunc(name) for name in column.names]
+        def __init__(self, column, rowreader, shortrowsallowed, headingpolicy,
+                        filters=None, valuefilters=None):
+            (headings, infunc, outfunc) = column._propertylists()
+            self._headings = list(headings)
+            self._infunc = list(infunc)
+            self._convert = column._converter(False)
+            self._filter = column._filter(filters, valuefilters)
             self._inputlocation = column._inputlocation
             self._rowreader = rowreader
+            self._shortrowsallowed = shortrowsallowed
             self._re_whitespace = re.compile(r"\s+")
             self._line_num = 0
             if headingpolicy == None:
@@ -740,24 +1286,66 @@ class Column(object):
         def __iter__(self):
             return self
 
+        def _nextrow(self):
+            """
+            Return the next row of text that passes the filters, counting
+            the rows rejected in self._line_num.
+            """
+            check = self._filter
+            count = len(self._headings)
+            while True:
+                row = next(self._rowreader)
+                if not isinstance(row, list):
+                    row = [r for r in row]  # iterator or generator
+                if len(row) < count:
+                    # missing fields are None for the predicates; the
+                    # length is checked by __next__() if the row passes
+                    if check(row + [None] * (count - len(row))):
+                        return row
+                elif check(row):
+                    return row
+                self._line_num += 1
+
+        def _convertrow(self, data):
+            """
+            Convert a row of text, padded with None if it was short, by
+            calling the input function of every column.  The profiled
+            reader overrides this to time the functions.
+            """
+            return [f(d) for f, d in zip(self._infunc, data)]
+
         def __next__(self):
             """
             Return a line as a list of typed values.
             """
             rowvalues = None
             try:
-                row = next(self._rowreader)
+                if self._filter is None:
+                    row = next(self._rowreader)
+                else:
+                    row = self._nextrow()
                 data = [r for r in row] # convert iterator or generator to list
                 if len(data) < len(self._headings):
                     if self._shortrowsallowed:
-                        for n in range(len(data), len(self._headings)):
-                            data[n] = None
+                        data.extend(None for n
+                                    in range(len(data), len(self._headings)))
                     else:
-                        raise ValueError("Expected " + len(self._headings)
-                                    + " items, got " + len(row))
-                # Convert string values to typed internal values.
-                rowvalues = [f(d) for f, d in zip(self._infunc, data)]
+                        raise ValueError("Expected " + str(len(self._headings))
+                                    + " items, got " + str(len(data)))
+                    # padding is None, not str, so call every function
+                    rowvalues = self._convertrow(data)
+                elif self._convert is None:
+                    # no conversion, the text is the list of values
+                    if len(data) > len(self._headings):
+                        del data[len(self._headings):]
+                    rowvalues = data
+                else:
+                    # Convert string values to typed internal values.
+                    rowvalues = self._convert(data)
                 self._line_num += 1
+            except StopIteration:
+                # end of input is not an error
+                raise
             except SyntaxError as e:
                 # Syntax error: eval() or ast.literal_eval() from within
                 # self._infunc(), will be caused by an input string that does
@@ -774,8 +1362,38 @@ class Column(object):
                                  ) from e
             return rowvalues
 
+    class _ProfiledListInput(_ListInput):
+        """
+        Reader to input lists of typed values, with statistics for the
+        input function of each column kept in a ConversionProfile.
+        """
+        def __init__(self, column, rowreader, shortrowsallowed, headingpolicy,
+                        profile, filters=None, valuefilters=None):
+            profile._start(column.names)
+            self._profile = profile
+            super().__init__(column, rowreader, shortrowsallowed,
+                                headingpolicy, filters, valuefilters)
+            # every row calls every function, so all can be sampled
+            self._convert = self._convertrow
+
+        def _convertrow(self, data):
+            """
+            Convert a row of text, timing the functions of every Nth row
+            and counting exceptions.
+            """
+            profile = self._profile
+            profile.rows += 1
+            if profile.rows % profile.every:
+                try:
+                    return [f(d) for f, d in zip(self._infunc, data)]
+                except Exception:
+                    profile._attribute(self._infunc, data)
+                    raise
+            return profile._sample(self._infunc, data, False)
+
 
-    def ListOutput(self, rowwriter, headingpolicy=None):
+    def ListOutput(self, rowwriter, headingpolicy=None, profile=None,
+                    meter=None):
         """
         Create writer instance to output list (or other iterable) of
         typed values.
@@ -808,14 +1426,28 @@ class Column(object):
                 writer.write(datalist)
 
             writer.writerows(iterable_of_datalist)
+
+        profile is an optional ConversionProfile that collects timings,
+        null counts and exception counts for the output function of each
+        column.  Without a profile the writer has no instrumentation.
+
+        meter is an optional Meter that counts the rows written,
+        including any heading row.
         """
+        if meter is not None:
+            rowwriter = meter.rowwriter(rowwriter)
+        if profile is not None:
+            return self.__class__._ProfiledListOutput(self, rowwriter,
+                                                    headingpolicy, profile)
         return self.__class__._ListOutput(self, rowwriter, headingpolicy)
 
     class _ListOutput(object):
 
         def __init__(self, column, rowwriter, headingpolicy=None):
-            self._headings = [column.heading(name) for name in column.names]
-            self._outfunc = [column._outfunc(name) for name in column.names]
+            (headings, infunc, outfunc) = column._propertylists()
+            self._headings = list(headings)
+            self._outfunc = list(outfunc)
+            self._convert = column._converter(True)
             self._outputlocation = column._outputlocation
             self._rowwriter = rowwriter
             self._line_num = 0      # not intended for external use
@@ -831,6 +1463,14 @@ class Column(object):
                                 " Error writing column headings."])
                                  ) from e
 
+        def _convertrow(self, data):
+            """
+            Convert a row of values by calling the output function of
+            every column.  The profiled writer overrides this to time the
+            functions, and uses it for every row.
+            """
+            return [f(d) for (f, d) in zip(self._outfunc, data)]
+
         def writerow(self, row):
             """
             Write list of values to output, converting to string
@@ -843,10 +1483,12 @@ class Column(object):
                                      " or other iterable, but not str"]))
                 data = [r for r in row] # convert iterator or generator to list
                 if len(data) != len(self._headings):
-                    raise ValueError("Expected " + len(self.headings)
-                                    + " items, got " + len(data))
-                self._rowwriter.writerow(
-                                [f(d) for (f, d) in zip(self._outfunc, data)])
+                    raise ValueError("Expected " + str(len(self._headings))
+                                    + " items, got " + str(len(data)))
+                if self._convert is None:
+                    self._rowwriter.writerow(data)
+                else:
+                    self._rowwriter.writerow(self._convert(data))
                 self._line_num += 1
             except Exception as e:
                 raise RuntimeError(''.join([
@@ -854,15 +1496,91 @@ class Column(object):
                                  " Error writing data."])
                                  ) from e
 
+        # number of rows converted and written together by writerows()
+        batchsize = 1024
+
         def writerows(self, data):
             """
             Output zero or more lists of values as rows of text.
+
+            When the rowwriter has a writerows() method, rows are
+            converted in batches and each batch is passed to
+            rowwriter.writerows().  If any row of a batch cannot be
+            converted, the batch is written row by row so that the
+            exception identifies the line of that row.
+            """
+            writerows = getattr(self._rowwriter, "writerows", None)
+            if writerows is None:
+                for row in data:
+                    self.writerow(row)
+                return
+            convert = self._convert
+            count = len(self._headings)
+            data = iter(data)
+            while True:
+                batch = list(itertools.islice(data, self.batchsize))
+                if not batch:
+                    break
+                try:
+                    for row in batch:
+                        if isinstance(row, str) or len(row) != count:
+                            raise ValueError("Invalid row")
+                    if convert is None:
+                        converted = [list(row) for row in batch]
+                    else:
+                        converted = [convert(row) for row in batch]
+                except Exception:
+                    for row in batch:
+                        self.writerow(row)
+                    continue
+                try:
+                    writerows(converted)
+                    self._line_num += len(converted)
+                except Exception as e:
+                    raise RuntimeError(''.join([
+                                     self._outputlocation(self._line_num),
+                                     " Error writing data."])
+                                     ) from e
+
+    class _ProfiledListOutput(_ListOutput):
+        """
+        Writer to output lists of typed values, with statistics for the
+        output function of each column kept in a ConversionProfile.
+        """
+        def __init__(self, column, rowwriter, headingpolicy, profile):
+            profile._start(column.names)
+            self._profile = profile
+            super().__init__(column, rowwriter, headingpolicy)
+            # every row calls every function, so all can be sampled
+            self._convert = self._convertrow
+
+        def _convertrow(self, data):
+            """
+            Convert a row of values, timing the functions of every Nth
+            row and counting exceptions.
+            """
+            profile = self._profile
+            profile.rows += 1
+            if profile.rows % profile.every:
+                try:
+                    return [f(d) for (f, d) in zip(self._outfunc, data)]
+                except Exception:
+                    profile._attribute(self._outfunc, data)
+                    raise
+            return profile._sample(self._outfunc, data, True)
+
+        def writerows(self, data):
+            """
+            Output zero or more lists of values as rows of text, one row
+            at a time, so that the rows of a batch that fails are not
+            counted twice.
             """
             for row in data:
                 self.writerow(row)
 
 
-    def DictInput(self, rowreader, shortrowsallowed=False, headingpolicy=None):
+    def DictInput(self, rowreader, shortrowsallowed=False, headingpolicy=None,
+                    profile=None, meter=None, filters=None, valuefilters=None):
         """
         Create reader instance to input ordered dictionaries of typed
         values.
@@ -918,17 +1636,27 @@ class Column(object):
         Otherwise, the column headings will be as read from the input,
         whether or not those headings match the headings defined for
         each column.
+
+        profile is an optional ConversionProfile and meter an optional
+        Meter, filters and valuefilters select the rows returned, as for
+        ListInput().
         """
+        if meter is not None:
+            rowreader = meter.rowreader(rowreader)
         return self.__class__._DictInput(self, rowreader, shortrowsallowed,
-                                        headingpolicy)
+                                        headingpolicy, profile, filters,
+                                        valuefilters)
 
     class _DictInput(object):
 
-        def __init__(self, column, rowreader, shortrowsallowed, headingpolicy):
+        def __init__(self, column, rowreader, shortrowsallowed, headingpolicy,
+                        profile=None, filters=None, valuefilters=None):
             self._names = column.names
             self._inputlocation = column._inputlocation
             self._listinput = column.ListInput(rowreader, shortrowsallowed,
-                                                headingpolicy)
+                                                headingpolicy, profile,
+                                                filters=filters,
+                                                valuefilters=valuefilters)
             # ListInput will discard headings, so we get line count from
             # ListInput instance instead of counting lines in this instance.
             self._line_num = self._listinput.line_num
@@ -967,7 +1695,8 @@ class Column(object):
             return data
 
 
-    def DictOutput(self, rowwriter, headingpolicy=None):
+    def DictOutput(self, rowwriter, headingpolicy=None, profile=None,
+                    meter=None):
         """
         Create writer instance to output dictionaries of typed values.
 
@@ -999,15 +1728,22 @@ class Column(object):
                 writer.write(dictionary)
 
             writer.writerows(iterable_of_dictionary)
+
+        profile is an optional ConversionProfile and meter an optional
+        Meter, as for ListOutput().
         """
-        return self.__class__._DictOutput(self, rowwriter, headingpolicy)
+        if meter is not None:
+            rowwriter = meter.rowwriter(rowwriter)
+        return self.__class__._DictOutput(self, rowwriter, headingpolicy,
+                                            profile)
 
     class _DictOutput(object):
 
-        def __init__(self, column, rowwriter, hasheadings):
+        def __init__(self, column, rowwriter, hasheadings, profile=None):
             self._names = column.names
             self._outputlocation = column._outputlocation
-            self._listoutput = column.ListOutput(rowwriter, hasheadings)
+            self._listoutput = column.ListOutput(rowwriter, hasheadings,
+                                                    profile)
             # ListOutput will write headings, so we get line count from
             # ListOutput instance instead of counting lines in this instance.
             self._line_num = self._listoutput._line_num
@@ -1045,7 +1781,8 @@ class Column(object):
 
 
     def NamedInput(self, rowreader, shortrowsallowed=False,
-                    headingpolicy=None):
+                    headingpolicy=None, profile=None, meter=None, filters=None,
+                    valuefilters=None):
         """
         Create a reader instance to input namedtuples of typed values.
 
@@ -1100,17 +1837,27 @@ class Column(object):
         Otherwise, the column headings will be as read from the input,
         whether or not those headings match the headings defined for
         each column.
+
+        profile is an optional ConversionProfile and meter an optional
+        Meter, filters and valuefilters select the rows returned, as for
+        ListInput().
         """
+        if meter is not None:
+            rowreader = meter.rowreader(rowreader)
         return self.__class__._NamedInput(self, rowreader, shortrowsallowed,
-                                            headingpolicy)
+                                            headingpolicy, profile, filters,
+                                            valuefilters)
 
     class _NamedInput(object):
 
-        def __init__(self, column, rowreader, shortrowsallowed, headingpolicy):
+        def __init__(self, column, rowreader, shortrowsallowed, headingpolicy,
+                        profile=None, filters=None, valuefilters=None):
             # self._names = column.names
             self._inputlocation = column._inputlocation
             self._listinput = column.ListInput(rowreader, shortrowsallowed,
-                                                headingpolicy)
+                                                headingpolicy, profile,
+                                                filters=filters,
+                                                valuefilters=valuefilters)
             self.NamedRow = column.NamedRow
             # ListInput will discard headings, so we get line count from
             # ListInput instance instead of counting lines in this instance.
@@ -1149,7 +1896,8 @@ class Column(object):
             return data
 
 
-    def NamedOutput(self, rowwriter, headingpolicy=None):
+    def NamedOutput(self, rowwriter, headingpolicy=None, profile=None,
+                    meter=None):
         """
         Create writer instance to output namwd tuples of typed values.
 
@@ -1181,15 +1929,21 @@ class Column(object):
                 writer.write(namedtuple)
 
             writer.writerows(iterable_of_namedtuple)
+
+        profile is an optional ConversionProfile and meter an optional
+        Meter, as for ListOutput().
         """
-        return self._NamedOutput(self, rowwriter, headingpolicy)
+        if meter is not None:
+            rowwriter = meter.rowwriter(rowwriter)
+        return self._NamedOutput(self, rowwriter, headingpolicy, profile)
 
     class _NamedOutput(object):
 
-        def __init__(self, column, rowwriter, headingpolicy):
+        def __init__(self, column, rowwriter, headingpolicy, profile=None):
             self._names = column.names
             self._outputlocation = column._outputlocation
-            self._listoutput = column.ListOutput(rowwriter, headingpolicy)
+            self._listoutput = column.ListOutput(rowwriter, headingpolicy,
+                                                    profile)
             # ListOutput will write headings, so we get line count from
             # ListOutput instance instead of counting lines in this instance.
             self._line_num = self._listoutput._line_num
@@ -1225,6 +1979,832 @@ class Column(object):
             for namedtuple in namedtupleiterator:
                 self.writerow(namedtuple)
 
+    def BinaryOutput(self, binarywriter, headingpolicy=None, meter=None):
+        """
+        Create writer instance to output lists of typed values in a
+        compact binary format, for files that are read again with
+        BinaryInput().
+
+        binarywriter is an object (like a file opened in mode 'wb') with
+        a write() method that accepts bytes.
+
+        The file starts with a header holding the column spec (see
+        to_spec()) and, unless headingpolicy (default self.headingpolicy)
+        is NO_HEADING, the column headings.  Rows follow in blocks of
+        'blocksize' rows.  In each block the values of each column are
+        stored together, according to their types:
+
+            int, float      64-bit integers or floats
+            bool            one byte for each value
+            str             offset of each value, then UTF-8 text
+            other           a pickled list of the values
+
+        with a bitmap of the None values when a column has any.
+
+        The values are written as they are; the output functions are
+        not used.  Rows are kept until a block is full, so the writer
+        must be closed (or flush() called) after the last row; the
+        writer can be used as a context manager.  writerows() writes
+        any partly filled block when it finishes.
+
+        meter is an optional Meter that counts rows and bytes written.
+        """
+        return self._BinaryOutput(self, binarywriter, headingpolicy, meter)
+
+    class _BinaryOutput(object):
+
+        # number of rows in each block
+        blocksize = 4096
+
+        def __init__(self, column, binarywriter, headingpolicy, meter):
+            self._width = len(column)
+            self._outputlocation = column._outputlocation
+            self._binarywriter = binarywriter
+            self._meter = meter
+            self._rows = list()
+            self._line_num = 0      # not intended for external use
+            if headingpolicy is None:
+                headingpolicy = column.headingpolicy
+            headings = None
+            if headingpolicy != column.Policy.NO_HEADING:
+                headings = list(column._propertylists()[0])
+            header = json.dumps({"spec": column.to_spec(),
+                                "headings": headings},
+                                separators=(',', ':')).encode('utf-8')
+            try:
+                self._write(b''.join([_BINARYMAGIC,
+                                    _BINARYLENGTH.pack(len(header)), header]),
+                            0 if headings is None else 1)
+            except Exception as e:
+                raise RuntimeError(''.join([
+                                self._outputlocation(self._line_num),
+                                " Error writing column headings."])
+                                 ) from e
+            if headings is not None:
+                self._line_num += 1
+
+        def _write(self, data, rows):
+            self._binarywriter.write(data)
+            if self._meter is not None:
+                self._meter.update(rows, len(data))
+
+        def writerow(self, row):
+            """
+            Keep a list of values for output in the current block.
+            """
+            try:
+                if isinstance(row, str):
+                    raise ValueError(''.join(["Row data must be list, tuple",
+                                     " or other iterable, but not str"]))
+                data = [r for r in row] # convert iterator or generator to list
+                if len(data) != self._width:
+                    raise ValueError("Expected " + str(self._width)
+                                    + " items, got " + str(len(data)))
+            except Exception as e:
+                raise RuntimeError(''.join([
+                                 self._outputlocation(self._line_num
+                                                        + len(self._rows)),
+                                 " Error writing data."])
+                                 ) from e
+            self._rows.append(data)
+            if len(self._rows) >= self.blocksize:
+                self.flush()
+
+        def writerows(self, data):
+            """
+            Output zero or more lists of values, then write any partly
+            filled block.
+            """
+            for row in data:
+                self.writerow(row)
+            self.flush()
+
+        def flush(self):
+            """
+            Write the rows kept for the current block.
+            """
+            if not self._rows:
+                return
+            rows = self._rows
+            self._rows = list()
+            try:
+                parts = [_packcolumn(list(values)) for values in zip(*rows)]
+                payload = b''.join(parts)
+                self._write(b''.join([_BINARYBLOCK.pack(len(rows),
+                                                        len(payload)),
+                                        payload]), len(rows))
+            except Exception as e:
+                raise RuntimeError(''.join([
+                                 self._outputlocation(self._line_num),
+                                 " Error writing block of ", str(len(rows)),
+                                 " rows."])
+                                 ) from e
+            self._line_num += len(rows)
+
+        def close(self):
+            """
+            Write the rows kept for the current block.  The binarywriter
+            is not closed.
+            """
+            self.flush()
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, exc_type, exc_value, traceback):
+            if exc_type is None:
+                self.close()
+
+    def BinaryInput(self, binaryreader, headingpolicy=None, meter=None):
+        """
+        Create reader instance to input lists of typed values from the
+        binary format written by BinaryOutput().
+
+        binaryreader is an object (like a file opened in mode 'rb') with
+        a read() method that returns bytes.
+
+        The file must have as many columns as this instance.  Headings
+        are checked as by ListInput(): when headingpolicy (default
+        self.headingpolicy) is not NO_HEADING, the file must have
+        headings and they are checked according to the policy.  When it
+        is NO_HEADING, any headings in the file are ignored.
+
+        line_num and headingrow are as for ListInput(): the heading row,
+        if any, counts as line 0 and data rows follow.
+
+        meter is an optional Meter that counts rows and bytes read.
+        """
+        return self._BinaryInput(self, binaryreader, headingpolicy, meter)
+
+    class _BinaryInput(object):
+
+        def __init__(self, column, binaryreader, headingpolicy, meter):
+            self._inputlocation = column._inputlocation
+            self._binaryreader = binaryreader
+            self._meter = meter
+            self._line_num = 0
+            self._headingrow = None
+            self._rows = iter(())
+            if headingpolicy is None:
+                headingpolicy = column.headingpolicy
+            elif not isinstance(headingpolicy, column.Policy):
+                raise ValueError("Invalid heading policy: "
+                                + repr(headingpolicy))
+            try:
+                start = self._read(len(_BINARYMAGIC) + _BINARYLENGTH.size)
+                if start[:len(_BINARYMAGIC)] != _BINARYMAGIC:
+                    raise ValueError("Not a tabletext binary file")
+                (length,) = _BINARYLENGTH.unpack_from(start,
+                                                        len(_BINARYMAGIC))
+                header = json.loads(self._read(length))
+                self.spec = header["spec"]
+                if len(self.spec["columns"]) != len(column):
+                    raise ValueError(''.join(["Expected ",
+                                    str(len(column)), " columns, file has ",
+                                    str(len(self.spec["columns"]))]))
+            except Exception as e:
+                raise ValueError(self._inputlocation(self._line_num)
+                                    + " Error reading binary header") from e
+            self._width = len(column)
+            if headingpolicy == column.Policy.NO_HEADING:
+                return
+            if header["headings"] is None:
+                raise ValueError(''.join([self._inputlocation(self._line_num),
+                                " Error reading headings\nExpected ",
+                                repr([column.heading(name)
+                                        for name in column.names]),
+                                "\nReceived no headings"]))
+            # check the headings as ListInput checks headings in text
+            check = column._ListInput(column, iter([header["headings"]]),
+                                        False, headingpolicy)
+            self._headingrow = check.headingrow
+            self._line_num = check.line_num
+            if self._meter is not None:
+                self._meter.update(1, 0)
+
+        def _read(self, size):
+            """
+            Read exactly size bytes, or no bytes at end of input.
+            """
+            data = self._binaryreader.read(size)
+            while 0 < len(data) < size:
+                more = self._binaryreader.read(size - len(data))
+                if not more:
+                    break
+                data += more
+            if data and len(data) != size:
+                raise ValueError("Unexpected end of binary input")
+            return data
+
+        @property
+        def line_num(self):
+            """
+            Number of rows read, including any heading row, as for
+            ListInput.
+            """
+            return self._line_num
+
+        @property
+        def headingrow(self):
+            """
+            Headings as written to the file, or None.
+            """
+            return self._headingrow
+
+        def __iter__(self):
+            return self
+
+        def __next__(self):
+            """
+            Return a row as a list of typed values.
+            """
+            for row in self._rows:
+                self._line_num += 1
+                return row
+            try:
+                start = self._read(_BINARYBLOCK.size)
+                if not start:
+                    raise StopIteration
+                (rows, length) = _BINARYBLOCK.unpack(start)
+                payload = self._read(length)
+                if len(payload) != length:
+                    raise ValueError("Unexpected end of binary input")
+                offset = 0
+                columns = list()
+                with memoryview(payload) as view:
+                    for n in range(self._width):
+                        (values, offset) = _unpackcolumn(view, offset, rows)
+                        columns.append(values)
+                if offset != length:
+                    raise ValueError("Invalid block length")
+            except StopIteration:
+                raise
+            except Exception as e:
+                raise RuntimeError(self._inputlocation(self._line_num)
+                                 + " Error reading data."
+                                 ) from e
+            if self._meter is not None:
+                self._meter.update(rows, len(start) + length)
+            if columns:
+                self._rows = map(list, zip(*columns))
+            else:
+                self._rows = iter([list() for n in range(rows)])
+            return self.__next__()
+
+
+# Typed columnar encoding of the values of one column of a group of rows,
+# shared by Column.BinaryOutput and the snapshots of cache.ParsedCache.
+# Kinds of column:
+(_NONE, _INT, _FLOAT, _BOOL, _STR, _PICKLE) = range(6)
+# number of segments of each kind
+_COLUMNSEGMENTS = (0, 1, 1, 1, 2, 1)
+# one byte for each value to '0' or '1', for building bitmaps
+_BITCHARS = bytes.maketrans(b"\x00\x01", b"01")
+
+
+def _littleendian(values):
+    """
+    Return the bytes of an array in little-endian byte order.
+    """
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values.tobytes()
+
+
+def _encodecolumn(values):
+    """
+    Return (kind, nulls, segments) for a list of the values of one
+    column: kind is one of the kinds above, nulls a bitmap of the None
+    values or None if there are none, and segments a list of bytes:
+
+        _NONE           no segments
+        _INT            64-bit integers
+        _FLOAT          64-bit floats
+        _BOOL           one byte for each value
+        _STR            offset of each value in the text, and of the
+                            end, then the UTF-8 text
+        _PICKLE         a pickled list of the values, including None
+
+    Numbers are little-endian.
+    """
+    types = set(map(type, values))
+    nulls = None
+    if type(None) in types:
+        types.discard(type(None))
+        mask = bytes(v is None for v in values).translate(_BITCHARS)
+        nulls = int(mask[::-1], 2).to_bytes((len(values) + 7) // 8, 'little')
+    if not types:
+        return (_NONE, None, [])
+    if types == {int}:
+        try:
+            return (_INT, nulls, [_littleendian(array.array('q',
+                                [0 if v is None else v for v in values]))])
+        except OverflowError:
+            pass
+    elif types == {float}:
+        return (_FLOAT, nulls, [_littleendian(array.array('d',
+                                [0.0 if v is None else v for v in values]))])
+    elif types == {bool}:
+        return (_BOOL, nulls, [bytes(v is True for v in values)])
+    elif types == {str}:
+        if nulls is not None:
+            values = ['' if v is None else v for v in values]
+        offsets = array.array('q', itertools.accumulate(map(len, values),
+                                                        initial=0))
+        return (_STR, nulls, [_littleendian(offsets),
+                        ''.join(values).encode('utf-8', 'surrogatepass')])
+    # values of other types, or of several types, are pickled with None
+    return (_PICKLE, None, [pickle.dumps(values, pickle.HIGHEST_PROTOCOL)])
+
+
+def _decodearray(data, typecode):
+    """
+    Return the list of values of little-endian array bytes.
+    """
+    values = array.array(typecode)
+    values.frombytes(data)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values.tolist()
+
+
+def _decodecolumn(kind, nulls, segments, rows):
+    """
+    Return the list of the rows values of one column from the result of
+    _encodecolumn().  nulls and the segments can be any bytes-like
+    objects, such as memoryviews of a block or of a mapped file.
+    """
+    if kind == _NONE:
+        return [None] * rows
+    if kind == _PICKLE:
+        return pickle.loads(segments[0])
+    if kind == _INT:
+        values = _decodearray(segments[0], 'q')
+    elif kind == _FLOAT:
+        values = _decodearray(segments[0], 'd')
+    elif kind == _BOOL:
+        values = [b == 1 for b in segments[0]]
+    elif kind == _STR:
+        offsets = _decodearray(segments[0], 'q')
+        text = str(segments[1], 'utf-8', 'surrogatepass')
+        values = [text[a:b] for (a, b) in zip(offsets, offsets[1:])]
+    else:
+        raise ValueError("Unknown column kind: " + repr(kind))
+    if len(values) != rows:
+        raise ValueError("Expected " + str(rows) + " values, got "
+                            + str(len(values)))
+    if nulls is not None:
+        bits = int.from_bytes(nulls, 'little')
+        mask = format(bits, '0' + str(rows) + 'b')[::-1]
+        values = [None if m == '1' else v for (v, m) in zip(values, mask)]
+    return values
+
+
+# Binary format of Column.BinaryOutput and Column.BinaryInput: magic
+# bytes, length of the JSON header, header, then blocks, each with the
+# number of rows and the length of the block, then each column: its kind,
+# the bitmap of None values if any, and each segment after its length.
+_BINARYMAGIC = b"TTBIN002"
+_BINARYLENGTH = struct.Struct("<I")
+_BINARYBLOCK = struct.Struct("<IQ")
+_BINARYCOLUMN = struct.Struct("<BB")    # kind, 1 if None bitmap follows
+_BINARYSIZE = struct.Struct("<Q")
+
+
+def _packcolumn(values):
+    """
+    Return the values of one column of a block as bytes.
+    """
+    (kind, nulls, segments) = _encodecolumn(values)
+    parts = [_BINARYCOLUMN.pack(kind, 0 if nulls is None else 1)]
+    if nulls is not None:
+        parts.append(nulls)
+    for data in segments:
+        parts.append(_BINARYSIZE.pack(len(data)))
+        parts.append(data)
+    return b''.join(parts)
+
+
+def _unpackcolumn(view, offset, rows):
+    """
+    Return (list of values, next offset) for one column of a block, from
+    a memoryview of the block.
+    """
+    (kind, hasnulls) = _BINARYCOLUMN.unpack_from(view, offset)
+    offset += _BINARYCOLUMN.size
+    nulls = None
+    if hasnulls:
+        end = offset + (rows + 7) // 8
+        nulls = view[offset:end]
+        offset = end
+    if kind >= len(_COLUMNSEGMENTS):
+        raise ValueError("Unknown column kind: " + repr(kind))
+    segments = list()
+    for n in range(_COLUMNSEGMENTS[kind]):
+        (size,) = _BINARYSIZE.unpack_from(view, offset)
+        offset += _BINARYSIZE.size
+        segments.append(view[offset:offset + size])
+        offset += size
+    if offset > len(view):
+        raise ValueError("Unexpected end of block")
+    return (_decodecolumn(kind, nulls, segments, rows), offset)
+
+
+class ConversionProfile(object):
+    """
+    Statistics for the input or output functions of each column, kept
+    by a Column reader or writer.
+
+    Every row is counted, and every Nth row (N is 'every') is sampled:
+    the function of each column is timed separately and null values
+    are counted (None returned by an input function, or None given to
+    an output function).  Exceptions raised by the functions are
+    counted for every row, sampled or not.  When a row that is not
+    sampled fails, each function is called again on that row to find
+    the columns responsible, so the extra cost is only paid for rows
+    that fail.
+
+    Timings and null counts are for the sampled rows only.  The cost of
+    sampling is about two clock readings per column of each sampled
+    row.
+
+    Usage:
+        profile = ConversionProfile(every=100)
+        reader = column.ListInput(rowreader, profile=profile)
+        for row in reader:
+            do_something(row)
+        for (name, stats) in profile.report().items():
+            print(name, stats["mean_us"], stats["nulls"],
+                    stats["exceptions"])
+
+    One profile can be shared by several readers or writers of the same
+    columns, but not by readers or writers of different columns.
+    """
+    def __init__(self, every=100):
+        """
+        every is the sampling interval in rows, 1 to sample every row.
+        """
+        if not isinstance(every, int) or every < 1:
+            raise ValueError("Invalid sampling interval: " + repr(every))
+        self.every = every
+        self.rows = 0           # rows converted, sampled or not
+        self.sampledrows = 0
+        self._names = None
+
+    def _start(self, names):
+        """
+        Set the column names, called when a reader or writer is created.
+        """
+        if self._names is None:
+            self._names = list(names)
+            self._calls = [0] * len(self._names)
+            self._seconds = [0.0] * len(self._names)
+            self._nulls = [0] * len(self._names)
+            self._exceptions = [0] * len(self._names)
+        elif self._names != list(names):
+            raise ValueError("Profile is for different columns: "
+                                + repr(self._names))
+
+    def _sample(self, functions, data, output):
+        """
+        Convert one row with each function timed separately, return the
+        list of converted values.
+
+        output specifies whether the functions are output functions,
+        which determines whether nulls are counted before or after
+        conversion.  If any function fails, the remaining columns are
+        still converted for the statistics and the first exception is
+        raised.
+        """
+        clock = time.perf_counter
+        calls = self._calls
+        seconds = self._seconds
+        nulls = self._nulls
+        error = None
+        values = list()
+        for (n, (f, d)) in enumerate(zip(functions, data)):
+            if output and d is None:
+                nulls[n] += 1
+            start = clock()
+            try:
+                v = f(d)
+                seconds[n] += clock() - start
+            except Exception as e:
+                seconds[n] += clock() - start
+                self._exceptions[n] += 1
+                if error is None:
+                    error = e
+                v = None
+            calls[n] += 1
+            if not output and v is None:
+                nulls[n] += 1
+            values.append(v)
+        self.sampledrows += 1
+        if error is not None:
+            raise error
+        return values
+
+    def _attribute(self, functions, data):
+        """
+        Count the exceptions of a row that failed and was not sampled.
+        """
+        for (n, (f, d)) in enumerate(zip(functions, data)):
+            try:
+                f(d)
+            except Exception:
+                self._exceptions[n] += 1
+
+    def report(self):
+        """
+        Return an ordered dictionary keyed by column name.  Each value
+        is an ordered dictionary:
+
+            "calls"         number of timed calls (sampled rows)
+            "seconds"       total time of the timed calls
+            "mean_us"       mean time per call in microseconds, or None
+                                if there were no timed calls
+            "nulls"         number of null values in sampled rows
+            "exceptions"    number of exceptions in all rows
+        """
+        report = collections.OrderedDict()
+        if self._names is None:
+            return report
+        for (n, name) in enumerate(self._names):
+            calls = self._calls[n]
+            report[name] = collections.OrderedDict([
+                    ("calls", calls),
+                    ("seconds", self._seconds[n]),
+                    ("mean_us", self._seconds[n] / calls * 1e6
+                                    if calls else None),
+                    ("nulls", self._nulls[n]),
+                    ("exceptions", self._exceptions[n])])
+        return report
+
+
+class Meter(object):
+    """
+    Throughput counters for a reader or writer, with an optional
+    progress callback.
+
+    The counters are:
+
+        rows        rows (or lines of text) read or written
+        bytes       characters of text read or written, where known
+                        (equal to bytes for ASCII text)
+        elapsed     seconds since the meter was created
+        rate        rows per second over the last 'window' seconds
+        byterate    characters per second over the last 'window' seconds
+        eta         estimated seconds remaining, when 'total' (the
+                        expected number of characters) is known,
+                        otherwise None
+
+    'total' is counted in characters, like 'bytes'.  The size of a file,
+    as used by progress() and the scripts, equals the number of
+    characters only for ASCII (or other single-byte) text.  For text
+    with multi-byte characters it is larger, so the percentage stays
+    below 100 and the time remaining is too long in proportion.
+
+    callback is a function that accepts the Meter instance.  It is
+    called every 'everyrows' rows or every 'everyseconds' seconds,
+    whichever comes first, and once more by finish().  The clock is
+    only read after a number of rows chosen from the rate since the
+    last reading, so that it is read about every 'checkfraction' of
+    'everyseconds' (or of 'window'), and at most every 'checkrows'
+    rows.  The cost of a meter is a few additions per row, and slow or
+    wide rows do not hold back the callback.
+
+    A meter is given to a reader or writer when it is created:
+
+        meter = Meter(callback=lambda m: print(m.format()),
+                        everyseconds=1.0, total=os.path.getsize(path))
+        reader = column.ListInput(csv.reader(meter.textreader(f)))
+        ...
+        meter.finish()
+
+    Column readers and writers accept 'meter=' to count rows, Delim
+    readers and writers accept 'meter=' to count rows and characters,
+    and textreader() counts the text read from any text file.
+    """
+
+    # part of the callback interval between readings of the clock
+    checkfraction = 0.1
+
+    # most rows between readings of the clock
+    checkrows = 256
+
+    def __init__(self, callback=None, everyrows=None, everyseconds=None,
+                    window=10.0, total=None):
+        self.rows = 0
+        self.bytes = 0
+        self.total = total
+        self._callback = callback
+        self._everyrows = everyrows
+        self._everyseconds = everyseconds
+        self._windowseconds = window
+        self._start = time.monotonic()
+        # (time, rows, bytes) at recent readings of the clock
+        self._window = collections.deque([(self._start, 0, 0)])
+        self._nextrows = everyrows if everyrows else None
+        self._nexttime = (self._start + everyseconds if everyseconds
+                            else None)
+        # (time, rows) at the last reading of the clock; the first row
+        # reads the clock, to measure the rate
+        self._lastcheck = (self._start, 0)
+        self._nextcheck = 1
+
+    @classmethod
+    def progress(cls, path=None, everyseconds=1.0, stream=None):
+        """
+        Return a Meter that prints its counters to stream (default
+        sys.stderr) every 'everyseconds' seconds.  When path is given,
+        the size of that file is the total for the estimated time
+        remaining.
+        """
+        if stream is None:
+            stream = sys.stderr
+        return cls(callback=lambda meter: print(meter.format(), file=stream,
+                                                flush=True),
+                    everyseconds=everyseconds,
+                    total=os.path.getsize(path) if path else None)
+
+    def update(self, rows=1, nbytes=0):
+        """
+        Count rows and characters read or written.
+        """
+        self.rows += rows
+        self.bytes += nbytes
+        if self.rows >= self._nextcheck:
+            self._check()
+
+    def _check(self, callback=True):
+        """
+        Read the clock, keep the rate window, call back if due.
+        """
+        now = time.monotonic()
+        (then, rows) = self._lastcheck
+        self._lastcheck = (now, self.rows)
+        interval = (self._everyseconds or self._windowseconds
+                        ) * self.checkfraction
+        window = self._window
+        if now - window[-1][0] >= interval or not callback:
+            window.append((now, self.rows, self.bytes))
+            while (len(window) > 2
+                    and now - window[1][0] >= self._windowseconds):
+                window.popleft()
+        due = False
+        if self._nextrows is not None and self.rows >= self._nextrows:
+            due = True
+            self._nextrows = self.rows + self._everyrows
+        if self._nexttime is not None and now >= self._nexttime:
+            due = True
+            self._nexttime = now + self._everyseconds
+        # rows until the next reading, from the rate since the last one
+        if now > then:
+            budget = int((self.rows - rows) * interval / (now - then))
+        else:
+            budget = 2 * (self.rows - rows)
+        self._nextcheck = self.rows + max(1, min(budget, self.checkrows))
+        if self._nextrows is not None:
+            self._nextcheck = min(self._nextcheck, self._nextrows)
+        if due and callback and self._callback is not None:
+            self._callback(self)
+
+    def finish(self):
+        """
+        Call the callback for the final counts.
+        """
+        self._check(callback=False)
+        if self._callback is not None:
+            self._callback(self)
+
+    @property
+    def elapsed(self):
+        """
+        Seconds since the meter was created.
+        """
+        return time.monotonic() - self._start
+
+    def _windowrate(self, current, index):
+        (then, rows, nbytes) = self._window[0]
+        seconds = time.monotonic() - then
+        if seconds <= 0.0:
+            return 0.0
+        return (current - (rows, nbytes)[index]) / seconds
+
+    @property
+    def rate(self):
+        """
+        Rows per second over the recent window.
+        """
+        return self._windowrate(self.rows, 0)
+
+    @property
+    def byterate(self):
+        """
+        Characters per second over the recent window.
+        """
+        return self._windowrate(self.bytes, 1)
+
+    @property
+    def eta(self):
+        """
+        Estimated seconds remaining, or None if unknown.
+        """
+        byterate = self.byterate
+        if not self.total or byterate <= 0.0:
+            return None
+        return max(self.total - self.bytes, 0) / byterate
+
+    def format(self):
+        """
+        Return the counters as one line of text.
+        """
+        items = ["{0:,d} rows".format(self.rows)]
+        if self.bytes:
+            items.append("{0:.1f} MB".format(self.bytes / 1e6))
+        items.append("{0:,.0f} rows/sec".format(self.rate))
+        if self.total:
+            items.append("{0:.0f}%".format(
+                            min(100.0, 100.0 * self.bytes / self.total)))
+        eta = self.eta
+        if eta is not None:
+            eta = int(eta)
+            items.append("ETA {0:d}:{1:02d}:{2:02d}".format(
+                            eta // 3600, eta // 60 % 60, eta % 60))
+        return "  ".join(items)
+
+    def textreader(self, textsource):
+        """
+        Return a text source that counts the lines and characters read
+        from textsource, a file or other iterable of lines.  The
+        methods read() and readline() are also counted.
+        """
+        return self._textreader(textsource, self)
+
+    class _textreader(object):
+        """
+        Text source that counts lines and characters.
+        """
+        def __init__(self, textsource, meter):
+            self._textsource = textsource
+            self._meter = meter
+            self._lines = iter(textsource)
+
+        def __iter__(self):
+            return self
+
+        def __next__(self):
+            line = next(self._lines)
+            self._meter.update(1, len(line))
+            return line
+
+        def read(self, size=-1):
+            text = self._textsource.read(size)
+            self._meter.update(text.count('\n'), len(text))
+            return text
+
+        def readline(self, size=-1):
+            line = self._textsource.readline(size)
+            if line:
+                self._meter.update(1, len(line))
+            return line
+
+    def rowreader(self, rowreader):
+        """
+        Return an iterator over the rows of rowreader that counts rows.
+        """
+        update = self.update
+        for row in rowreader:
+            update()
+            yield row
+
+    def rowwriter(self, rowwriter):
+        """
+        Return a row writer that counts the rows given to rowwriter.
+        """
+        return self._rowwriter(rowwriter, self)
+
+    class _rowwriter(object):
+        """
+        Row writer that counts rows.
+        """
+        def __init__(self, rowwriter, meter):
+            self._rowwriter = rowwriter
+            self._meter = meter
+
+        def writerow(self, row):
+            self._rowwriter.writerow(row)
+            self._meter.update()
+
+        def writerows(self, rows):
+            if not hasattr(self._rowwriter, "writerows"):
+                for row in rows:
+                    self.writerow(row)
+                return
+            rows = list(rows)
+            self._rowwriter.writerows(rows)
+            self._meter.update(len(rows))
+
 
 class Delim(object):
     """
@@ -1287,7 +2867,7 @@ class Delim(object):
             # None implies unspecified, so default to one space
             self.delimwrite = ' '
 
-    def reader(self, textreader):
+    def reader(self, textreader, meter=None):
         """
         Create a reader that splits text lines and returns lists of str.
 
@@ -1296,7 +2876,11 @@ class Delim(object):
 
         textreader is an iterable that returns a single string at each
         iteration.
+
+        meter is an optional Meter that counts lines and characters.
         """
+        if meter is not None:
+            return self._meteredreader(textreader, self.delimread, meter)
         return self._reader(textreader, self.delimread)
 
     class _reader(object):
@@ -1327,7 +2911,22 @@ class Delim(object):
             """
             return self._line_num
 
-    def writer(self, textwriter):
+    class _meteredreader(_reader):
+        """
+        Reader for delimited text that counts lines and characters.
+        """
+        def __init__(self, textreader, delim, meter):
+            super().__init__(textreader, delim)
+            self._meter = meter
+
+        def __next__(self):
+            line = next(self.textreader)
+            row = line.rstrip("\n\r").split(self.delim)
+            self._line_num += 1
+            self._meter.update(1, len(line))
+            return row
+
+    def writer(self, textwriter, meter=None):
         """
         Create a writer that accepts lists of str and writes each list
         as a single string of fields (the list items) joined by a
@@ -1335,7 +2934,11 @@ class Delim(object):
 
         textwriter is an object with a write() method that accepts a
         single string at each invocation.
+
+        meter is an optional Meter that counts lines and characters.
         """
+        if meter is not None:
+            return self._meteredwriter(textwriter, self.delimwrite, meter)
         return self._writer(textwriter, self.delimwrite)
 
     class _writer(object):
@@ -1353,6 +2956,293 @@ class Delim(object):
             for row in rows:
                 self.writerow(row)
 
+    class _meteredwriter(_writer):
+        """
+        Writer for delimited text that counts lines and characters.
+        """
+        def __init__(self, textwriter, delim, meter):
+            super().__init__(textwriter, delim)
+            self._meter = meter
+
+        def writerow(self, row):
+            line = self.delim.join(str(r) for r in row) + "\n"
+            self.textwriter.write(line)
+            self._meter.update(1, len(line))
+
+
+class FixedWidth(object):
+    """
+    Factory to create readers and writers for fixed-width text, where
+    each field occupies the same columns of characters in every line.
+
+    FixedWidth.reader() behaves like Delim.reader() and csv.reader(): an
+    iterator that produces a list of str for each line, with a line_num
+    attribute.  FixedWidth.writer() behaves like Delim.writer(): an
+    object with writerow() and writerows() methods.  Both can be given
+    to the Column readers and writers.
+
+    Fields are defined by their widths (contiguous fields starting at
+    the beginning of the line) or by their offsets (the position of the
+    first character of each field; each field ends where the next one
+    starts and the last field continues to the end of the line).
+
+    Input is read in large blocks and each line is divided with a
+    precomputed list of slices, so the cost per field is small.  Lines
+    shorter than the layout produce empty strings for the missing
+    fields.
+
+    In binary mode the source and destination are binary files (or an
+    iterable of bytes on input) and the text is decoded and encoded in
+    blocks with a single-byte encoding such as 'ascii' or 'latin-1', so
+    widths and offsets count bytes.
+
+        Usage:
+            layout = FixedWidth(widths=[10, 6, 12])
+
+            for row in layout.reader(textsource):
+                do_something(row)
+
+            writer = layout.writer(textwriter)
+            writer.writerow(iterable_of_str)
+
+            # with a Column
+            for values in column.ListInput(layout.reader(textsource)):
+                do_something(values)
+    """
+
+    # number of characters (or bytes) read from a file at one time,
+    # or number of lines taken from another iterable
+    blocksize = 1 << 16
+
+    def __init__(self, widths=None, offsets=None, align='<', strip=True,
+                    binary=False, encoding='ascii'):
+        """
+        Initialize a factory for fixed-width reader and writer objects.
+
+        widths is a list of the number of characters in each field.
+        offsets is a list of the starting position (from 0) of each
+        field, in increasing order.  Exactly one of them is required.
+
+        align is '<' (left, padded with spaces on the right) or '>'
+        (right), or a string with one of those characters for each
+        field.  It applies to output.
+
+        strip specifies whether leading and trailing spaces are removed
+        from each field on input.
+
+        binary specifies binary mode, with the single-byte encoding
+        given by encoding.
+        """
+        if (widths is None) == (offsets is None):
+            raise ValueError("Specify either widths or offsets")
+        if widths is not None:
+            widths = list(widths)
+            if not widths or any(not isinstance(w, int) or w < 1
+                                    for w in widths):
+                raise ValueError("Invalid widths: " + repr(widths))
+            offsets = list(itertools.accumulate([0] + widths[:-1]))
+        else:
+            offsets = list(offsets)
+            if (not offsets or any(not isinstance(n, int) for n in offsets)
+                    or offsets[0] < 0
+                    or any(a >= b for (a, b) in zip(offsets, offsets[1:]))):
+                raise ValueError("Invalid offsets: " + repr(offsets))
+            widths = ([b - a for (a, b) in zip(offsets, offsets[1:])]
+                        + [None])
+        if len(align) == 1:
+            align = align * len(widths)
+        if len(align) != len(widths) or any(a not in "<>" for a in align):
+            raise ValueError("Invalid align: " + repr(align))
+        if binary and len("\u00e9".encode(encoding, 'replace')) != 1:
+            raise ValueError("Binary mode requires a single-byte encoding: "
+                                + repr(encoding))
+        self.widths = widths
+        self.offsets = offsets
+        self.align = align
+        self.strip = strip
+        self.binary = binary
+        self.encoding = encoding
+        self._slices = [slice(a, None if w is None else a + w)
+                            for (a, w) in zip(offsets, widths)]
+        # output: leading spaces, then each field padded to its width
+        self._format = ' ' * offsets[0] + ''.join(
+                            "%s" if w is None
+                            else ''.join(["%", "-" if a == '<' else "",
+                                            str(w), "s"])
+                            for (w, a) in zip(widths, align))
+        self._length = offsets[0] + sum(w for w in widths if w is not None)
+
+    def reader(self, textreader, meter=None):
+        """
+        Create a reader that divides lines of text into fields and
+        returns lists of str.
+
+        textreader is a file object with a read() method, or any
+        iterable that returns a single string (bytes in binary mode) at
+        each iteration.  Line ends are removed.
+
+        meter is an optional Meter that counts lines and characters.
+        """
+        return self._reader(textreader, self, meter)
+
+    class _reader(object):
+        """
+        Reader similar to CSV reader, but for fixed-width text.
+        """
+        def __init__(self, textreader, layout, meter):
+            self._line_num = 0
+            self.textreader = textreader
+            self._read = getattr(textreader, "read", None)
+            if self._read is None:
+                self.textreader = iter(textreader)
+            self._layout = layout
+            self._meter = meter
+            getter = operator.itemgetter(*layout._slices)
+            if len(layout._slices) == 1:
+                self._getter = lambda line: (getter(line),)
+            else:
+                self._getter = getter
+            self._rows = list()
+            self._index = 0
+            self._rest = ''     # text after the last line end of a block
+            self._eof = False
+
+        def __iter__(self):
+            return self
+
+        def _lines(self):
+            """
+            Return the next list of lines, without line ends, and the
+            number of characters they came from.  Returns an empty list
+            at end of input.
+            """
+            layout = self._layout
+            while not self._eof:
+                if self._read is None:
+                    lines = list(itertools.islice(self.textreader,
+                                                    layout.blocksize))
+                    if not lines:
+                        self._eof = True
+                        break
+                    if layout.binary:
+                        lines = [line.decode(layout.encoding)
+                                    for line in lines]
+                    return ([line.rstrip("\n\r") for line in lines],
+                            sum(len(line) for line in lines))
+                block = self._read(layout.blocksize)
+                if not block:
+                    self._eof = True
+                    break
+                if layout.binary:
+                    block = block.decode(layout.encoding)
+                text = self._rest + block
+                lines = text.split("\n")
+                self._rest = lines.pop()
+                if lines:
+                    if "\r" in text:
+                        lines = [line.rstrip("\r") for line in lines]
+                    return (lines, len(text) - len(self._rest))
+            if self._rest:
+                # last line has no line end
+                lines = [self._rest.rstrip("\r")]
+                self._rest = ''
+                return (lines, len(lines[0]))
+            return (list(), 0)
+
+        def __next__(self):
+            """
+            Get next line as list of string, and count lines.
+            """
+            if self._index >= len(self._rows):
+                (lines, size) = self._lines()
+                if not lines:
+                    raise StopIteration
+                getter = self._getter
+                if self._layout.strip:
+                    strip = str.strip
+                    self._rows = [list(map(strip, getter(line)))
+                                    for line in lines]
+                else:
+                    self._rows = [list(getter(line)) for line in lines]
+                self._index = 0
+                if self._meter is not None:
+                    self._meter.update(len(lines), size)
+            row = self._rows[self._index]
+            self._index += 1
+            self._line_num += 1
+            return row
+
+        @property
+        def line_num(self):
+            """
+            Number of lines read before current line.
+            """
+            return self._line_num
+
+    def writer(self, textwriter, meter=None):
+        """
+        Create a writer that accepts lists of str and writes each list
+        as a line with each field padded with spaces to its width.  A
+        field that is too long for its width raises ValueError.
+
+        textwriter is an object with a write() method that accepts a
+        single string (bytes in binary mode) at each invocation.
+
+        meter is an optional Meter that counts lines and characters.
+        """
+        return self._writer(textwriter, self, meter)
+
+    class _writer(object):
+        """
+        Writer similar to CSV writer, but for fixed-width text.
+        """
+        def __init__(self, textwriter, layout, meter):
+            self.textwriter = textwriter
+            self._layout = layout
+            self._meter = meter
+
+        def _line(self, row):
+            """
+            Return one row as a line of text, with line end.
+            """
+            layout = self._layout
+            fields = tuple(str(r) for r in row)
+            if len(fields) != len(layout.widths):
+                raise ValueError("Expected " + str(len(layout.widths))
+                                    + " fields, got " + str(len(fields)))
+            line = layout._format % fields
+            expected = layout._length
+            if layout.widths[-1] is None:
+                expected += len(fields[-1])
+            if len(line) != expected:
+                for (n, (field, width)) in enumerate(zip(fields,
+                                                        layout.widths)):
+                    if width is not None and len(field) > width:
+                        raise ValueError(''.join(["Field ", str(n),
+                                    " is longer than ", str(width),
+                                    " characters: ", repr(field)]))
+            return line + "\n"
+
+        def _write(self, text, rows):
+            if self._layout.binary:
+                self.textwriter.write(text.encode(self._layout.encoding))
+            else:
+                self.textwriter.write(text)
+            if self._meter is not None:
+                self._meter.update(rows, len(text))
+
+        def writerow(self, row):
+            self._write(self._line(row), 1)
+
+        def writerows(self, rows):
+            rows = iter(rows)
+            while True:
+                lines = [self._line(row) for row
+                            in itertools.islice(rows, 1024)]
+                if not lines:
+                    break
+                self._write(''.join(lines), len(lines))
+
 
 if __name__ == "__main__":
     """Run as a script when invoked from shell command line."""
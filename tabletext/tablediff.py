@@ -0,0 +1,550 @@
+#!/usr/bin/env python3
+# Find the rows added, removed and changed between two versions of a table.
+
+"""
+Find the rows added, removed and changed between two versions of a table.
+
+Class 'TableDiff' matches the rows of an old and a new version of a
+table by the values of key columns named in a table.Column, and reports
+each key that is only in the old table (removed), only in the new table
+(added), or in both with different values (changed), with the names of
+the columns whose values differ.  Rows with the same values are not
+reported.  A key that occurs twice in one table is an error.
+
+Two strategies bound the memory used:
+
+    sorted merge    When both tables are sorted by key, they are read
+                        together and one row of each is held at a time.
+                        A key out of order is an error.
+    partitioned hash
+                    Otherwise the old rows are held in a dictionary by
+                        key, up to 'maxrows' rows, and the new rows are
+                        looked up as they are read.  When the old table
+                        has more rows, or the new table more than
+                        'maxrows' added keys, the rows are divided among
+                        'partitions' temporary files for each table by
+                        the hash of the key, and each pair of files is
+                        compared in turn.
+
+The sorted merge reports keys in sorted order.  The partitioned hash
+reports added and changed keys in the order of the new table, then
+removed keys, unless the tables are divided among files, when the order
+is by file.
+
+By default the text of each field is compared, so the key order of a
+sorted table is the order of the text.  With typed comparison the fields
+are converted by the input functions of the column definition and the
+converted values are compared, so that "1.0" and "1" are the same.
+
+Method 'run' writes the differences through Column.ListOutput as a
+table with columns:
+
+    change          "added", "removed" or "changed"
+    key columns     the values of the key, in the order given
+    column          name of a changed column, one row for each changed
+                        column of a changed key, empty for added and
+                        removed keys
+    old_value       old text of the changed column
+    new_value       new text of the changed column
+
+When the module file is invoked as a script from the command line, the
+column definition comes from a file like 'examples/demo_01.columndef.csv'
+and the differences between two CSV (or other delimited) files are
+written to stdout.
+"""
+
+# Python 3
+import sys
+import collections
+import csv
+import getopt
+import operator
+import os
+import pickle
+import tempfile
+
+# application
+from tabletext import table
+from tabletext import textio
+
+
+class TableDiff(object):
+    """
+    Compare two versions of a table by key.
+    """
+
+    # partitioned hash: number of old rows (or added new keys) held in
+    # memory before dividing the tables among files
+    maxrows = 1000000
+
+    # partitioned hash: number of temporary files for each table
+    partitions = 64
+
+    # change kinds
+    ADDED = "added"
+    REMOVED = "removed"
+    CHANGED = "changed"
+
+    # input and output functions of text columns in the output
+    _textin = "lambda x: x"
+    _textout = "lambda x: '' if x is None else x"
+
+    def __init__(self, column, keys, names=None, typed=False, tempdir=None):
+        """
+        column is the table.Column instance that describes both tables.
+        keys is a list of the names of the key columns.  names is a list
+        of the names of the columns compared, default every column that
+        is not a key column.
+
+        typed specifies whether rows are lists of typed values (as from
+        Column.ListInput) rather than lists of text (as from csv.reader).
+
+        tempdir is the directory for temporary files (default the system
+        temporary directory).
+        """
+        super().__init__()
+        if isinstance(keys, str) or isinstance(names, str):
+            raise ValueError("keys and names must be iterables of str")
+        keys = list(keys)
+        if not keys:
+            raise ValueError("At least one key column is required")
+        if names is None:
+            names = [name for name in column.names if not name in keys]
+        names = list(names)
+        for name in keys + names:
+            column.index(name)          # raises ValueError if missing
+        self._incolumn = column
+        self._keys = keys
+        self._names = names
+        self._typed = typed
+        self._tempdir = tempdir
+        self._keyindexes = [column.index(name) for name in keys]
+        self._compared = [(name, column.index(name)) for name in names]
+        if len(self._keyindexes) == 1:
+            index = self._keyindexes[0]
+            self._keyfunction = lambda row: (row[index],)
+        else:
+            self._keyfunction = operator.itemgetter(*self._keyindexes)
+        # output columns: change, keys, column, old value, new value
+        if typed:
+            keycolumn = column.select(keys)
+        else:
+            keycolumn = table.Column([[column.heading(name), self._textin,
+                                        self._textout, name]
+                                        for name in keys])
+        self._column = (
+            table.Column([["Change", self._textin, self._textout, "change"]])
+            .append(keycolumn)
+            .append(table.Column([
+                ["Column", self._textin, self._textout, "column"],
+                ["Old Value", self._textin, self._textout, "old_value"],
+                ["New Value", self._textin, self._textout, "new_value"]])))
+
+    @property
+    def column(self):
+        """
+        The table.Column instance that describes the output of run().
+        """
+        return self._column
+
+    def diff(self, oldrows, newrows, sortedinput=False, oldline=1, newline=1):
+        """
+        Generate a tuple (change, key, names, oldrow, newrow) for each
+        key added, removed or changed between two iterables of rows.
+
+        change is TableDiff.ADDED, REMOVED or CHANGED, key a tuple of the
+        key values, names a list of the names of the changed columns
+        (empty for added and removed keys), and oldrow and newrow the
+        rows (None when the key is not in that table).
+
+        sortedinput specifies whether both tables are sorted by key.
+        oldline and newline are the line numbers of the first rows, for
+        error messages.
+        """
+        old = self._keyed(oldrows, "Old", oldline)
+        new = self._keyed(newrows, "New", newline)
+        if sortedinput:
+            yield from self._mergediff(old, new)
+        else:
+            yield from self._hashdiff(old, new)
+
+    def _keyed(self, rows, which, line_num):
+        """
+        Generate (key, location, row) for each row, where location is a
+        description of the line for error messages.
+        """
+        keyfunction = self._keyfunction
+        for row in rows:
+            yield (keyfunction(row), (which, line_num), row)
+            line_num += 1
+
+    @staticmethod
+    def _location(location):
+        return ''.join([location[0], " input line ", str(location[1]), ":"])
+
+    def _duplicate(self, key, location):
+        return ValueError(''.join([self._location(location),
+                                    " Duplicate key ", repr(key)]))
+
+    def _compare(self, key, oldrow, newrow):
+        """
+        Return the change tuple for a key in both tables, or None if the
+        compared values are the same.
+        """
+        names = [name for (name, n) in self._compared
+                    if oldrow[n] != newrow[n]]
+        if names:
+            return (self.CHANGED, key, names, oldrow, newrow)
+        return None
+
+    def _mergediff(self, old, new):
+        """
+        Differences between two tables sorted by key.
+        """
+        def advance(rows, previous):
+            for item in rows:
+                if previous is not None:
+                    try:
+                        inorder = previous < item[0]
+                    except TypeError as e:
+                        raise ValueError(''.join([
+                                self._location(item[1]),
+                                " Key cannot be compared: ",
+                                repr(item[0])])) from e
+                    if not inorder:
+                        if previous == item[0]:
+                            raise self._duplicate(item[0], item[1])
+                        raise ValueError(''.join([
+                                self._location(item[1]),
+                                " Key out of order: ", repr(item[0]),
+                                " after ", repr(previous)]))
+                return item
+            return None
+
+        o = advance(old, None)
+        n = advance(new, None)
+        while o is not None or n is not None:
+            if n is None or (o is not None and o[0] < n[0]):
+                yield (self.REMOVED, o[0], [], o[2], None)
+                o = advance(old, o[0])
+            elif o is None or n[0] < o[0]:
+                yield (self.ADDED, n[0], [], None, n[2])
+                n = advance(new, n[0])
+            else:
+                change = self._compare(o[0], o[2], n[2])
+                if change is not None:
+                    yield change
+                o = advance(old, o[0])
+                n = advance(new, n[0])
+
+    def _hashdiff(self, old, new):
+        """
+        Differences between two tables in any order.
+        """
+        # old rows by key; the row of a key matched by a new row is
+        # replaced by None, to detect duplicate new keys
+        rows = dict()
+        for (key, location, row) in old:
+            if key in rows:
+                raise self._duplicate(key, location)
+            rows[key] = (location, row)
+            if len(rows) >= self.maxrows:
+                break
+        else:
+            old = None
+        added = set()
+        if old is None:
+            for (key, location, row) in new:
+                entry = rows.get(key)
+                if entry is None:
+                    if key in added:
+                        raise self._duplicate(key, location)
+                    added.add(key)
+                    yield (self.ADDED, key, [], None, row)
+                    if len(added) >= self.maxrows:
+                        break
+                    continue
+                if entry[1] is None:
+                    raise self._duplicate(key, location)
+                rows[key] = (entry[0], None)
+                change = self._compare(key, entry[1], row)
+                if change is not None:
+                    yield change
+            else:
+                for (key, (location, row)) in rows.items():
+                    if row is not None:
+                        yield (self.REMOVED, key, [], row, None)
+                return
+        with tempfile.TemporaryDirectory(dir=self._tempdir,
+                                            prefix="tablediff") as directory:
+            yield from self._partitioned(directory, rows, added, old, new)
+
+    def _partitioned(self, directory, rows, added, old, new):
+        """
+        Divide the rest of both tables among files by the hash of the key
+        and compare each pair of files.  rows and added are the old rows
+        and added keys already read; old is None when the old table has
+        been read completely.
+        """
+        count = self.partitions
+        dump = lambda item, files: pickle.dump(item,
+                                            files[hash(item[0]) % count],
+                                            pickle.HIGHEST_PROTOCOL)
+        oldpaths = [os.path.join(directory, "old." + str(n))
+                        for n in range(count)]
+        newpaths = [os.path.join(directory, "new." + str(n))
+                        for n in range(count)]
+        oldfiles = [open(path, 'wb') for path in oldpaths]
+        try:
+            for (key, (location, row)) in rows.items():
+                dump((key, location, row), oldfiles)
+            rows.clear()
+            if old is not None:
+                for item in old:
+                    dump(item, oldfiles)
+        finally:
+            for f in oldfiles:
+                f.close()
+        newfiles = [open(path, 'wb') for path in newpaths]
+        try:
+            # keys already reported as added, to detect duplicates
+            for key in added:
+                dump((key, None, None), newfiles)
+            added.clear()
+            for item in new:
+                dump(item, newfiles)
+        finally:
+            for f in newfiles:
+                f.close()
+        for (oldpath, newpath) in zip(oldpaths, newpaths):
+            rows = dict()
+            with open(oldpath, 'rb') as f:
+                for (key, location, row) in self._load(f):
+                    if key in rows:
+                        raise self._duplicate(key, location)
+                    rows[key] = (location, row)
+            os.remove(oldpath)
+            keys = set()
+            with open(newpath, 'rb') as f:
+                for (key, location, row) in self._load(f):
+                    if key in keys:
+                        raise self._duplicate(key, location)
+                    keys.add(key)
+                    if row is None:
+                        continue
+                    entry = rows.pop(key, None)
+                    if entry is None:
+                        yield (self.ADDED, key, [], None, row)
+                        continue
+                    if entry[1] is None:
+                        raise self._duplicate(key, location)
+                    change = self._compare(key, entry[1], row)
+                    if change is not None:
+                        yield change
+            os.remove(newpath)
+            for (key, (location, row)) in rows.items():
+                if row is not None:
+                    yield (self.REMOVED, key, [], row, None)
+
+    @staticmethod
+    def _load(f):
+        """
+        Generate the objects pickled one after another in a file.
+        """
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+    def _rawrows(self, rowreader, line_num, shortrowsallowed):
+        """
+        Generate the rows of text of a row reader, each with at least
+        one field for each column.
+        """
+        width = len(self._incolumn)
+        for row in rowreader:
+            if len(row) < width:
+                if not shortrowsallowed:
+                    raise ValueError(''.join([
+                            self._incolumn._inputlocation(line_num),
+                            " Expected ", str(width), " items, got ",
+                            str(len(row))]))
+                row = list(row)
+                row.extend('' for i in range(len(row), width))
+            yield row
+            line_num += 1
+
+    def run(self, oldreader, newreader, rowwriter, sortedinput=False,
+            shortrowsallowed=False, inheadingpolicy=None,
+            outheadingpolicy=None):
+        """
+        Write the differences between the tables of two row readers to
+        rowwriter, return a dictionary of the number of keys added,
+        removed and changed.
+
+        oldreader and newreader are iterables (like csv.reader) that
+        produce a list of strings for each line of text.  rowwriter is an
+        object (like csv.writer) with writerow() and writerows() methods.
+
+        shortrowsallowed and inheadingpolicy are as for
+        Column.ListInput(), outheadingpolicy as for Column.ListOutput().
+        Input headings are checked against the column definition.
+        """
+        readers = list()
+        rows = list()
+        for rowreader in (oldreader, newreader):
+            reader = self._incolumn.ListInput(rowreader, shortrowsallowed,
+                                                inheadingpolicy)
+            readers.append(reader)
+            if self._typed:
+                rows.append(reader)
+            else:
+                rows.append(self._rawrows(rowreader, reader.line_num,
+                                            shortrowsallowed))
+        writer = self._column.ListOutput(rowwriter, outheadingpolicy)
+        if self._typed:
+            text = dict((name, self._incolumn._outfunc(name))
+                        for (name, n) in self._compared)
+        counts = collections.OrderedDict(
+                    (change, 0) for change in (self.ADDED, self.REMOVED,
+                                                self.CHANGED))
+        for (change, key, names, oldrow, newrow) in self.diff(
+                                rows[0], rows[1], sortedinput,
+                                readers[0].line_num, readers[1].line_num):
+            counts[change] += 1
+            if not names:
+                writer.writerow([change] + list(key) + [None, None, None])
+                continue
+            for name in names:
+                n = self._incolumn.index(name)
+                if self._typed:
+                    (old, new) = (text[name](oldrow[n]), text[name](newrow[n]))
+                else:
+                    (old, new) = (oldrow[n], newrow[n])
+                writer.writerow([change] + list(key) + [name, old, new])
+        return counts
+
+
+if __name__ == "__main__":
+    """
+    Run as a script if invoked from shell command line.
+
+    Column definition and both tables from files, output to stdout.
+    """
+
+    def printlog(text):
+        print(text, file=sys.stderr)
+
+    # Get the processing options and the file names.
+    optarg = getopt.getopt(sys.argv[1:],
+                            "h",
+                            ["help", "keys=", "columns=", "sorted", "typed",
+                             "maxrows=", "partitions=", "tempdir=",
+                             "shortrows", "noheading", "defdelim=",
+                             "indelim=", "outdelim=", "progress"])
+    opt = collections.OrderedDict(optarg[0])
+    arg = optarg[1]
+    if ("-h" in opt or "--help" in opt or len(arg) != 3
+            or not opt.get("--keys")):
+        printlog(" ".join(["Usage: ", sys.argv[0],
+                        "[-h|--help]",
+                        "--keys=a,b,...",
+                        "[--columns=c,d,...]",
+                        "[--sorted]",
+                        "[--typed]",
+                        "[--maxrows=N]",
+                        "[--partitions=N]",
+                        "[--tempdir=directory]",
+                        "[--shortrows]",
+                        "[--noheading]",
+                        "[--defdelim='w']",
+                        "[--indelim='x']",
+                        "[--outdelim='y']",
+                        "[--progress]",
+                        "columndef",
+                        "oldfile",
+                        "newfile"]))
+        printlog("       Report the rows added, removed and changed by key")
+        printlog("       -h|--help     print this message")
+        printlog("       --keys=       key column names")
+        printlog("       --columns=    names of the columns compared")
+        printlog("                     (default all but the keys)")
+        printlog("       --sorted      both files are sorted by key")
+        printlog("       --typed       compare converted values (default")
+        printlog("                     compares text)")
+        printlog("       --maxrows=    rows in memory before partitioning")
+        printlog("       --partitions= number of partitions")
+        printlog("       --tempdir=    directory for partitions")
+        printlog("       --shortrows   allow rows with missing fields")
+        printlog("       --noheading   no headings in input or output")
+        printlog("       --defdelim=   column definition field delimiter")
+        printlog("       --indelim=    input field delimiter")
+        printlog("       --outdelim=   output field delimiter")
+        printlog("       --progress    report progress on stderr")
+        printlog("       zero-length delimiters cause special handling")
+        printlog("       omit delimiters to specify CSV formatted text")
+        printlog("       See script for details")
+        exit(code=2)
+
+    def readerfactory(option):
+        if option in opt:
+            delim = opt[option]
+            if len(delim) == 0:
+                delim = None    # Delimiter is any string of consecutive spaces
+            return table.Delim(delim).reader
+        return csv.reader
+
+    defreader = readerfactory("--defdelim")
+    rowreader = readerfactory("--indelim")
+    if "--outdelim" in opt:
+        outdelim = opt["--outdelim"]
+        if len(outdelim) == 0:
+            outdelim = None     # Delimiter is a single space
+        rowwriter = table.Delim(outdelim).writer
+    else:
+        rowwriter = csv.writer
+
+    with textio.open_text(arg[0]) as textsource:
+        column = table.Column(defreader(textsource))
+
+    tablediff = TableDiff(column, opt["--keys"].split(","),
+                    names=(opt["--columns"].split(",")
+                            if "--columns" in opt else None),
+                    typed="--typed" in opt, tempdir=opt.get("--tempdir"))
+    if "--maxrows" in opt:
+        tablediff.maxrows = int(opt["--maxrows"])
+    if "--partitions" in opt:
+        tablediff.partitions = int(opt["--partitions"])
+
+    if "--noheading" in opt:
+        headingpolicy = table.Column.Policy.NO_HEADING
+    else:
+        headingpolicy = None
+
+    meter = None
+    if "--progress" in opt:
+        # no estimated time for compressed input, its size is not the text
+        meter = table.Meter.progress()
+        if not any(textio.codec(path) for path in arg[1:]):
+            meter.total = sum(os.path.getsize(path) for path in arg[1:])
+
+    oldsource = textio.open_text(arg[1])
+    newsource = textio.open_text(arg[2])
+    try:
+        sources = [oldsource, newsource]
+        if meter is not None:
+            sources = [meter.textreader(source) for source in sources]
+        counts = tablediff.run(rowreader(sources[0]), rowreader(sources[1]),
+                                rowwriter(sys.stdout),
+                                sortedinput="--sorted" in opt,
+                                shortrowsallowed="--shortrows" in opt,
+                                inheadingpolicy=headingpolicy,
+                                outheadingpolicy=headingpolicy)
+    finally:
+        oldsource.close()
+        newsource.close()
+    if meter is not None:
+        meter.finish()
+    printlog(", ".join(str(count) + " " + change
+                        for (change, count) in counts.items()))
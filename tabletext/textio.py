@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# Open plain or compressed text files for table input and output.
+
+"""
+Open plain or compressed text files for table input and output.
+
+open_text() returns a text file object that can be given to csv.reader,
+csv.writer, table.Delim readers and writers, and so to the Column
+readers and writers.  Files compressed with gzip, bzip2 or xz are
+decompressed on input and compressed on output.
+
+The codec is chosen from the file name extension:
+
+    .gz             gzip
+    .bz2            bzip2
+    .xz, .lzma      xz
+
+On input, a file without one of those extensions is also recognized
+by the magic bytes at the start of the file.
+
+Decompression and compression run in a background thread that passes
+large chunks of bytes through a bounded queue, so that they overlap
+with parsing and conversion in the calling thread.  The compression
+libraries release the interpreter lock while they work, so the overlap
+is real even though both run in one process.  The bounded queue limits
+the memory used when one side is faster than the other.
+
+paths() expands the file name arguments of a script: glob patterns and
+directories become sorted lists of files.
+
+Usage:
+    with textio.open_text("feed.csv.gz") as textsource:
+        for row in column.ListInput(csv.reader(textsource)):
+            do_something(row)
+
+    with textio.open_text("out.csv.xz", 'w') as textwriter:
+        column.ListOutput(csv.writer(textwriter)).writerows(rows)
+"""
+
+# Python 3
+import sys
+import bz2
+import glob
+import gzip
+import io
+import lzma
+import os
+import queue
+import threading
+
+
+# codec name, file name extensions, magic bytes (or a tuple of them),
+# binary file opener.  A bzip2 stream starts with "BZh", the block size
+# '1' to '9', then the magic of a block or of the end of the stream.
+_CODECS = [
+    ("gzip", (".gz",), b"\x1f\x8b", gzip.open),
+    ("bzip2", (".bz2",), tuple(b"BZh" + bytes([size]) + block
+                                for size in b"123456789"
+                                for block in (b"1AY&SY", b"\x17rE8P\x90")),
+        bz2.open),
+    ("xz", (".xz", ".lzma"), b"\xfd7zXZ\x00", lzma.open),
+]
+
+# size of the chunks passed between threads
+chunksize = 1 << 20
+
+# number of chunks held in the queue between threads
+queuesize = 8
+
+
+def codec(path, mode='r'):
+    """
+    Return the name of the codec for a file ("gzip", "bzip2" or "xz"),
+    or None for a file that is not compressed.
+
+    The extension of path is tried first.  When mode is 'r' and the
+    extension is not recognized, the first bytes of the file are read.
+    """
+    for (name, extensions, magic, opener) in _CODECS:
+        if path.endswith(extensions):
+            return name
+    if mode.startswith('r'):
+        with open(path, 'rb') as f:
+            start = f.read(10)
+        for (name, extensions, magic, opener) in _CODECS:
+            if start.startswith(magic):
+                return name
+    return None
+
+
+def paths(patterns):
+    """
+    Return a list of file paths from a list of file names, glob
+    patterns and directories.
+
+    A glob pattern (containing '*', '?' or '[') is replaced by the
+    matching paths in sorted order, and a directory by the sorted list
+    of the files in it.  Other names are kept, in their original order,
+    as is the name of an existing file that contains those characters
+    (like "part[1].csv").
+    Raises FileNotFoundError when a pattern matches nothing.
+    """
+    result = list()
+    for pattern in patterns:
+        if glob.has_magic(pattern) and not os.path.exists(pattern):
+            matches = sorted(glob.glob(pattern))
+            if not matches:
+                raise FileNotFoundError("No files match: " + repr(pattern))
+            result.extend(matches)
+        elif os.path.isdir(pattern):
+            result.extend(os.path.join(pattern, name)
+                            for name in sorted(os.listdir(pattern))
+                            if os.path.isfile(os.path.join(pattern, name)))
+        else:
+            result.append(pattern)
+    return result
+
+
+def open_text(path, mode='r', encoding=None, newline='', threaded=True):
+    """
+    Open a plain or compressed text file, return a text file object.
+
+    mode is 'r' (read), 'w' (write, replacing any existing file), 'a'
+    (append; for compressed files a new compressed stream is appended)
+    or 'x' (create a new file).  A trailing 't' is allowed.
+
+    encoding is as for open().  newline defaults to '' (no line-end
+    translation) as required by the csv module.
+
+    threaded specifies whether compressed data is decompressed or
+    compressed in a background thread.  Plain files are opened with
+    open() and never use a thread.
+    """
+    mode = mode.replace('t', '')
+    if not mode in ['r', 'w', 'a', 'x']:
+        raise ValueError("Invalid mode: " + repr(mode))
+    name = codec(path, mode)
+    if name is None:
+        return open(path, mode, encoding=encoding, newline=newline)
+    opener = [c[3] for c in _CODECS if c[0] == name][0]
+    binaryfile = opener(path, mode + 'b')
+    if not threaded:
+        return io.TextIOWrapper(binaryfile, encoding=encoding,
+                                newline=newline)
+    if mode == 'r':
+        buffered = io.BufferedReader(_ThreadedReader(binaryfile), chunksize)
+    else:
+        buffered = io.BufferedWriter(_ThreadedWriter(binaryfile), chunksize)
+    return io.TextIOWrapper(buffered, encoding=encoding, newline=newline,
+                            write_through=False)
+
+
+class _ThreadedReader(io.RawIOBase):
+    """
+    Raw binary stream of the bytes read from a binary file by a
+    background thread.
+    """
+    def __init__(self, binaryfile):
+        super().__init__()
+        self._binaryfile = binaryfile
+        self._queue = queue.Queue(queuesize)
+        self._chunk = memoryview(b'')
+        self._eof = False
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        """
+        Read chunks until end of file, an exception, or close().
+        """
+        try:
+            while not self._closing:
+                chunk = self._binaryfile.read(chunksize)
+                self._put(chunk)
+                if not chunk:
+                    break
+        except BaseException as e:
+            self._put(e)
+
+    def _put(self, item):
+        """
+        Put an item in the queue, giving up if the reader is closed.
+        """
+        while not self._closing:
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        """
+        Copy bytes from the current chunk, waiting for the next chunk
+        when the current one is used up.  Returns 0 at end of file.
+        """
+        while not len(self._chunk):
+            if self._eof:
+                return 0
+            item = self._queue.get()
+            if isinstance(item, BaseException):
+                self._eof = True
+                raise OSError("Error reading compressed input") from item
+            if not item:
+                self._eof = True
+                return 0
+            self._chunk = memoryview(item)
+        n = min(len(b), len(self._chunk))
+        b[:n] = self._chunk[:n]
+        self._chunk = self._chunk[n:]
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._closing = True
+            self._thread.join()
+            self._binaryfile.close()
+        super().close()
+
+
+class _ThreadedWriter(io.RawIOBase):
+    """
+    Raw binary stream that passes bytes to a background thread that
+    writes them to a binary file.
+    """
+    def __init__(self, binaryfile):
+        super().__init__()
+        self._binaryfile = binaryfile
+        self._queue = queue.Queue(queuesize)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        """
+        Write chunks until None is received.  After an exception, the
+        remaining chunks are discarded so that the writer never blocks.
+        """
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                break
+            if self._error is None:
+                try:
+                    self._binaryfile.write(chunk)
+                except BaseException as e:
+                    self._error = e
+
+    def _checkerror(self):
+        if self._error is not None:
+            raise OSError("Error writing compressed output") from self._error
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._checkerror()
+        self._queue.put(bytes(b))
+        return len(b)
+
+    def close(self):
+        if not self.closed:
+            self._queue.put(None)
+            self._thread.join()
+            try:
+                self._binaryfile.close()
+            finally:
+                super().close()
+            self._checkerror()
+        else:
+            super().close()
+
+
+if __name__ == "__main__":
+    """Run as a script when invoked from shell command line."""
+
+    raise NotImplementedError("'" + sys.argv[0]
+                        + "' does not currently run as a standalone script")
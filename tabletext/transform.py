@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+# Apply column operators to the data of a table.
+
+"""
+Apply column operators to the data of a table.
+
+The column operators of table.Column (append, changeheadings, rename,
+remove and select) create new column definitions.  Class 'Transform'
+applies a sequence of those operators to a column definition and
+copies the rows of a table from input to output so that the output
+has the columns of the new definition.
+
+When no conversion is requested, the text of each field is copied
+without conversion: each output field is the input field of the
+column it came from.  Columns added by append have the text that their
+output function produces for None.  Output fields are found with
+operator.itemgetter over batches of rows, so the cost per row is small.
+
+When typed conversion is requested, each row is converted to typed
+values with the input functions of the original definition and back
+to text with the output functions of the new definition, which checks
+every value.
+
+When the module file is invoked as a script from the command line, the
+column definition comes from a file like 'examples/demo_01.columndef.csv',
+operations are applied in the order given, and the table is copied
+from a file or stdin to stdout, optionally between CSV and other
+delimited formats.
+"""
+
+# Python 3
+import sys
+import collections
+import csv
+import getopt
+import itertools
+import operator
+
+# application
+from tabletext import table
+from tabletext import textio
+
+
+class Transform(object):
+    """
+    Apply column operators to a column definition and to the rows of
+    a table.
+    """
+
+    # number of rows copied together
+    batchsize = 4096
+
+    def __init__(self, column):
+        """
+        column is the table.Column instance that describes the input.
+        """
+        super().__init__()
+        self._incolumn = column
+        self._column = column
+        # output column name --> index of input field, or None for a
+        # column that was appended
+        self._sources = collections.OrderedDict(
+                            (name, n) for (n, name) in enumerate(column.names))
+
+    @property
+    def column(self):
+        """
+        The table.Column instance that describes the output.
+        """
+        return self._column
+
+    def append(self, columns):
+        """
+        Append the columns of a table.Column instance to the right.
+        """
+        self._column = self._column.append(columns)
+        for name in columns.names:
+            self._sources[name] = None
+        return self
+
+    def changeheadings(self, name_heading_pairs):
+        """
+        Change the headings of the named columns.
+        """
+        self._column = self._column.changeheadings(name_heading_pairs)
+        return self
+
+    def rename(self, name_pairs):
+        """
+        Change the names of the named columns.
+        """
+        name_pairs = list(name_pairs)
+        self._column = self._column.rename(name_pairs)
+        names = dict(name_pairs)
+        self._sources = collections.OrderedDict(
+                            (names.get(name, name), source)
+                            for (name, source) in self._sources.items())
+        return self
+
+    def remove(self, names):
+        """
+        Remove the named columns.
+        """
+        names = list(names)
+        self._column = self._column.remove(names)
+        for name in names:
+            del self._sources[name]
+        return self
+
+    def select(self, names):
+        """
+        Choose the named columns, in the order given.
+        """
+        names = list(names)
+        self._column = self._column.select(names)
+        self._sources = collections.OrderedDict(
+                            (name, self._sources[name]) for name in names)
+        return self
+
+    def _rawgetter(self):
+        """
+        Return a function that produces the output fields of one row of
+        input fields.
+        """
+        fields = list()
+        for (name, source) in self._sources.items():
+            if source is None:
+                # appended column: the text for a missing value
+                fields.append(self._column._outfunc(name)(None))
+            else:
+                fields.append(source)
+        if all(isinstance(field, int) for field in fields):
+            if len(fields) == 1:
+                index = fields[0]
+                return lambda row: (row[index],)
+            return operator.itemgetter(*fields)
+        return lambda row: [row[f] if isinstance(f, int) else f
+                                for f in fields]
+
+    def run(self, rowreader, rowwriter, typed=False, shortrowsallowed=False,
+            inheadingpolicy=None, outheadingpolicy=None):
+        """
+        Copy every row from rowreader to rowwriter with the columns of
+        self.column, return the number of rows written (not including
+        headings).
+
+        rowreader is an iterable (like csv.reader) that produces a list
+        of strings for each line of text.  rowwriter is an object (like
+        csv.writer) with writerow() and writerows() methods.
+
+        typed specifies whether each row is converted to typed values
+        and back to text.  Otherwise the text of each field is copied.
+
+        shortrowsallowed and inheadingpolicy are as for
+        Column.ListInput(), outheadingpolicy as for Column.ListOutput().
+        Input headings are checked against the original column
+        definition.
+        """
+        if typed:
+            reader = self._incolumn.ListInput(rowreader, shortrowsallowed,
+                                                inheadingpolicy)
+            writer = self._column.ListOutput(rowwriter, outheadingpolicy)
+            sources = list(self._sources.values())
+            count = 0
+            for values in reader:
+                writer.writerow([None if source is None else values[source]
+                                    for source in sources])
+                count += 1
+            return count
+        # ListInput reads and checks the headings, ListOutput writes them
+        reader = self._incolumn.ListInput(rowreader, shortrowsallowed,
+                                            inheadingpolicy)
+        writer = self._column.ListOutput(rowwriter, outheadingpolicy)
+        line_num = reader.line_num
+        width = len(self._incolumn)
+        getter = self._rawgetter()
+        rowreader = iter(rowreader)
+        count = 0
+        while True:
+            batch = list(itertools.islice(rowreader, self.batchsize))
+            if not batch:
+                break
+            try:
+                rows = [getter(row) for row in batch]
+            except IndexError:
+                rows = list()
+                for (n, row) in enumerate(batch):
+                    row = list(row)
+                    if len(row) < width:
+                        if not shortrowsallowed:
+                            raise ValueError(''.join([
+                                    self._incolumn._inputlocation(
+                                                            line_num + n),
+                                    " Expected ", str(width), " items, got ",
+                                    str(len(row))]))
+                        row.extend('' for i in range(len(row), width))
+                    rows.append(getter(row))
+            try:
+                rowwriter.writerows(rows)
+            except Exception as e:
+                raise RuntimeError(''.join([
+                        self._column._outputlocation(writer._line_num + count),
+                        " Error writing data."])) from e
+            line_num += len(batch)
+            count += len(batch)
+        return count
+
+
+if __name__ == "__main__":
+    """
+    Run as a script if invoked from shell command line.
+
+    Column definition from a file, table from a file or stdin, output
+    to stdout.
+    """
+
+    def printlog(text):
+        print(text, file=sys.stderr)
+
+    def pairs(text):
+        """
+        Split "a:b,c:d" into [("a", "b"), ("c", "d")].
+        """
+        result = list()
+        for item in text.split(","):
+            (first, sep, second) = item.partition(":")
+            if not sep:
+                raise ValueError("Expected name:value, got " + repr(item))
+            result.append((first, second))
+        return result
+
+    # Get the options, in order, and the file names.
+    optarg = getopt.getopt(sys.argv[1:],
+                            "h",
+                            ["help", "select=", "remove=", "rename=",
+                             "heading=", "append=", "typed", "shortrows",
+                             "noheading", "defdelim=", "indelim=",
+                             "outdelim=", "progress"])
+    operations = optarg[0]
+    opt = collections.OrderedDict(optarg[0])
+    arg = optarg[1]
+    if "-h" in opt or "--help" in opt or len(arg) < 1 or len(arg) > 2:
+        printlog(" ".join(["Usage: ", sys.argv[0],
+                        "[-h|--help]",
+                        "[--select=a,b,...]",
+                        "[--remove=a,b,...]",
+                        "[--rename=old:new,...]",
+                        "[--heading=name:text,...]",
+                        "[--append=columndef]",
+                        "[--typed]",
+                        "[--shortrows]",
+                        "[--noheading]",
+                        "[--defdelim='w']",
+                        "[--indelim='x']",
+                        "[--outdelim='y']",
+                        "[--progress]",
+                        "columndef",
+                        "[filename]"]))
+        printlog("       Copy a table with columns changed by operations")
+        printlog("       -h|--help     print this message")
+        printlog("       --select=     choose columns by name, in order")
+        printlog("       --remove=     remove columns by name")
+        printlog("       --rename=     change column names")
+        printlog("       --heading=    change column headings")
+        printlog("       --append=     append columns from a column")
+        printlog("                     definition file")
+        printlog("       operations are applied in the order given")
+        printlog("       --typed       convert each value to its type and")
+        printlog("                     back (default copies text)")
+        printlog("       --shortrows   allow rows with missing fields")
+        printlog("       --noheading   no headings in input or output")
+        printlog("       --defdelim=   column definition field delimiter")
+        printlog("       --indelim=    input field delimiter")
+        printlog("       --outdelim=   output field delimiter")
+        printlog("       --progress    report progress on stderr")
+        printlog("       zero-length delimiters cause special handling")
+        printlog("       omit delimiters to specify CSV formatted text")
+        printlog("       See script for details")
+        exit(code=2)
+
+    def readerfactory(option):
+        if option in opt:
+            delim = opt[option]
+            if len(delim) == 0:
+                delim = None    # Delimiter is any string of consecutive spaces
+            return table.Delim(delim).reader
+        return csv.reader
+
+    defreader = readerfactory("--defdelim")
+    rowreader = readerfactory("--indelim")
+    if "--outdelim" in opt:
+        outdelim = opt["--outdelim"]
+        if len(outdelim) == 0:
+            outdelim = None     # Delimiter is a single space
+        rowwriter = table.Delim(outdelim).writer
+    else:
+        rowwriter = csv.writer
+
+    with textio.open_text(arg[0]) as textsource:
+        column = table.Column(defreader(textsource))
+
+    # apply the operations in the order given
+    transform = Transform(column)
+    for (option, value) in operations:
+        if option == "--select":
+            transform.select(value.split(","))
+        elif option == "--remove":
+            transform.remove(value.split(","))
+        elif option == "--rename":
+            transform.rename(pairs(value))
+        elif option == "--heading":
+            transform.changeheadings(pairs(value))
+        elif option == "--append":
+            with textio.open_text(value) as textsource:
+                transform.append(table.Column(defreader(textsource)))
+
+    if "--noheading" in opt:
+        headingpolicy = table.Column.Policy.NO_HEADING
+    else:
+        headingpolicy = None
+
+    # Input data source
+    if len(arg) > 1:
+        textsource = textio.open_text(arg[1])   # no line-end translation
+    else:
+        textsource = sys.stdin
+
+    meter = None
+    if "--progress" in opt:
+        # no estimated time for compressed input, its size is not the text
+        meter = table.Meter.progress(arg[1] if len(arg) > 1
+                                        and not textio.codec(arg[1]) else None)
+
+    try:
+        source = textsource
+        if meter is not None:
+            source = meter.textreader(textsource)
+        transform.run(rowreader(source), rowwriter(sys.stdout),
+                        typed="--typed" in opt,
+                        shortrowsallowed="--shortrows" in opt,
+                        inheadingpolicy=headingpolicy,
+                        outheadingpolicy=headingpolicy)
+    finally:
+        if not textsource is sys.stdin:
+            textsource.close()
+    if meter is not None:
+        meter.finish()
@@ -0,0 +1,52 @@
+# Tests of tabletext.pipeline
+
+# Python 3
+import csv
+import io
+import unittest
+
+# application
+from tabletext import pipeline
+from tabletext import table
+
+
+def _failontwo(values):
+    if values[0] == 2:
+        raise ValueError("bad value")
+    return values
+
+
+class TestPipelineErrors(unittest.TestCase):
+
+    def setUp(self):
+        self.column = table.Column([["A", "lambda x: int(x)",
+                                        "lambda x: str(x)", "a"]])
+
+    def _run(self, text, transform=None, processes=None):
+        output = io.StringIO()
+        engine = pipeline.Pipeline(self.column, transform=transform,
+                                    processes=processes)
+        engine.run(csv.reader(io.StringIO(text, newline='')),
+                    csv.writer(output))
+        return output.getvalue()
+
+    def test_copy(self):
+        self.assertEqual(self._run("A\n1\n2\n"), "A\r\n1\r\n2\r\n")
+
+    def test_transform_error_line(self):
+        # line 0 is the heading, the row with value 2 is line 2
+        with self.assertRaisesRegex(RuntimeError, r"^Input line 2:"):
+            self._run("A\n1\n2\nbad\n4\n", transform=_failontwo)
+
+    def test_transform_error_line_processes(self):
+        with self.assertRaisesRegex(RuntimeError, r"^Input line 2:"):
+            self._run("A\n1\n2\nbad\n4\n", transform=_failontwo,
+                        processes=2)
+
+    def test_conversion_error_line(self):
+        with self.assertRaisesRegex(RuntimeError, r"^Input line 3:"):
+            self._run("A\n1\n2\nbad\n4\n")
+
+
+if __name__ == "__main__":
+    unittest.main()